@@ -1,2 +1,8 @@
-from .alice_blue import AliceBlue, TransactionType, OrderType, ProductType, LiveFeedType, Instrument, HistoricalDataType, CryptoJsAES
-__all__ = ['AliceBlue', 'TransactionType', 'OrderType', 'ProductType', 'LiveFeedType', 'Instrument', 'HistoricalDataType', 'CryptoJsAES'] 
+from .alice_blue import AliceBlue, TransactionType, OrderType, ProductType, LiveFeedType, Instrument, HistoricalDataType, HistoricalDataFormat, FeedFormat, CryptoJsAES
+from .async_alice_blue import AsyncAliceBlue
+from .bulk import BulkResult
+from .dispatcher import OverflowPolicy
+from .http_session import HttpSession
+from .search_index import SearchMatch
+from .sharding import ShardBalance
+__all__ = ['AliceBlue', 'TransactionType', 'OrderType', 'ProductType', 'LiveFeedType', 'Instrument', 'HistoricalDataType', 'HistoricalDataFormat', 'FeedFormat', 'CryptoJsAES', 'OverflowPolicy', 'AsyncAliceBlue', 'HttpSession', 'SearchMatch', 'BulkResult', 'ShardBalance'] 
@@ -1,4 +1,5 @@
-from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from time import sleep
 from urllib.parse import urlparse, parse_qs
@@ -9,14 +10,32 @@ import hashlib
 import json
 import logging
 import os
-import pytz
 import requests
 import tempfile
 import threading
+import time
 import websocket
 
-Instrument = namedtuple('Instrument', ['exchange', 'token', 'symbol',
-                                       'name', 'expiry', 'lot_size'])
+from . import codec
+from .bulk import get_batches, run_concurrently, split_batch_results
+from .conflation import Conflator
+from .contract_cache import BinaryMasterContract, open_binary_master_contract, write_binary_master_contract
+from .dispatcher import FeedDispatcher, OverflowPolicy
+from .feed import FeedDecoder
+from .journal import TickJournal, replay_journal
+from .historical import (DEFAULT_CHUNK_DAYS, BarCache, format_bars, get_chunk_bars, get_chunk_payload, get_chunks, get_columns,
+                         get_dataframe, get_panel, parse_columns, store_chunks, to_epoch)
+from .http_session import get_default_session
+from .market_state import MarketState
+from .metrics import Metrics
+from .order_book import OrderBook, is_open_status
+from .outbound import OutboundQueue
+from .positions import LOAD_ATTEMPTS, PositionsEngine, get_fill_ids
+from .search_index import SearchMatch
+from .sharding import ShardBalance, ShardedFeed
+from .subscriptions import DEFAULT_BATCH_SIZE, SubscriptionManager
+from .master_contract import Instrument, MasterContracts, instruments_from_columns, instruments_to_columns, parse_master_contract, read_master_contract_content, write_master_contract_content
+
 logger = logging.getLogger(__name__)
 
 class Requests(enum.IntEnum):
@@ -49,6 +68,16 @@ class HistoricalDataType(enum.Enum):
     Day = '1D'
     Minute = '1'
 
+class HistoricalDataFormat(enum.Enum):
+    Dict = 'dict'
+    Numpy = 'numpy'
+    DataFrame = 'dataframe'
+    Panel = 'panel'
+
+class FeedFormat(enum.Enum):
+    Dict = 'dict'
+    Struct = 'struct'
+
 class CryptoJsAES:
     @staticmethod
     def __pad(data):
@@ -91,82 +120,505 @@ class CryptoJsAES:
         aes = Cipher(algorithms.AES(key), modes.CBC(iv))
         return CryptoJsAES.__unpad(aes.decryptor.update(encrypted[16:]) + aes.decryptor().finalize())
 
+# URLs
+_host = "https://ant.aliceblueonline.com/rest/AliceBlueAPIService"
+_urls = {   "webLogin"              :   f"{_host}/customer/webLogin",
+            "twoFA"                 :   f"{_host}/sso/validAnswer",
+            "sessionID"             :   f"{_host}/sso/getUserDetails",
+            "getEncKey"             :   f"{_host}/customer/getEncryptionKey",
+            "authorizeVendor"       :   f"{_host}/sso/authorizeVendor",
+            "apiGetEncKey"          :   f"{_host}/api/customer/getAPIEncpkey",
+            "profile"               :   f"{_host}/api/customer/accountDetails",
+            "placeOrder"            :   f"{_host}/api/placeOrder/executePlaceOrder",
+            "logout"                :   f"{_host}/api/customer/logout",
+            "logoutFromAllDevices"  :   f"{_host}/api/customer/logOutFromAllDevice",
+            "fetchMWList"           :   f"{_host}/api/marketWatch/fetchMWList",
+            "fetchMWScrips"         :   f"{_host}/api/marketWatch/fetchMWScrips",
+            "addScripToMW"          :   f"{_host}/api/marketWatch/addScripToMW",
+            "deleteMWScrip"         :   f"{_host}/api/marketWatch/deleteMWScrip",
+            "scripDetails"          :   f"{_host}/api/ScripDetails/getScripQuoteDetails",
+            "positions"             :   f"{_host}/api/positionAndHoldings/positionBook",
+            "holdings"              :   f"{_host}/api/positionAndHoldings/holdings",
+            "sqrOfPosition"         :   f"{_host}/api/positionAndHoldings/sqrOofPosition",
+            "fetchOrder"            :   f"{_host}/api/placeOrder/fetchOrderBook",
+            "fetchTrade"            :   f"{_host}/api/placeOrder/fetchTradeBook",
+            "exitBracketOrder"      :   f"{_host}/api/placeOrder/exitBracketOrder",
+            "modifyOrder"           :   f"{_host}/api/placeOrder/modifyOrder",
+            "cancelOrder"           :   f"{_host}/api/placeOrder/cancelOrder",
+            "orderHistory"          :   f"{_host}/api/placeOrder/orderHistory",
+            "getRmsLimits"          :   f"{_host}/api/limits/getRmsLimits",
+            "createWsSession"       :   f"{_host}/api/ws/createSocketSess",
+            "history"               :   f"{_host}/api/chart/history",
+            "master_contract"       :   "https://v2api.aliceblueonline.com/restpy/contract_master?exch={exchange}",
+            "ws"                    :   "wss://ws2.aliceblueonline.com/NorenWS/"
+        }
+
+def _get_urls(host=None, urls=None):
+    """ URLs of all endpoints, with REST endpoints on host instead of the default host & any of them replaced by urls """
+    result = dict(_urls)
+    if(host is not None):
+        result = {name : (host.rstrip('/') + url[len(_host):] if url.startswith(_host) else url) for name, url in result.items()}
+    if(urls is not None):
+        unknown = [name for name in urls if name not in _urls]
+        if(len(unknown) > 0):
+            raise TypeError(f"Optional parameter urls has unknown endpoints {unknown}")
+        result.update(urls)
+    return result
+
+# Endpoints which only read data, safe to be retried on timeouts & dropped connections
+_read_only_endpoints = {"profile", "fetchMWList", "fetchMWScrips", "scripDetails", "positions", "holdings",
+                        "fetchOrder", "fetchTrade", "orderHistory", "getRmsLimits", "history", "master_contract"}
+
+def _get_enabled_exchanges(profile):
+    """ Exchanges enabled in profile """
+    exch_dt = {"nse_cm"    : "NSE",
+                "bse_cm"    : "BSE",
+                "nse_fo"    : "NFO",
+                "mcx_fo"    : "MCX",
+                "cde_fo"    : "CDS",
+                "mcx_sx"    : "BFO",
+                "bcs_fo"    : "BCD",
+                "nse_com"   : "NCO",
+                "bse_com"   : "BCO"}
+    x = profile['exchEnabled'].split("|")
+    return [exch_dt[i] for i in x if i in exch_dt]
+
+def _get_product_type_str(product_type, exchange):
+    prod_type = None
+    if(product_type == ProductType.Intraday):
+        prod_type = 'MIS'
+    elif(product_type == ProductType.Delivery):
+        if(exchange == 'NFO') or (exchange == 'MCX') or (exchange == 'CDS'):
+            prod_type = 'NRML'
+        else:
+            prod_type = 'CNC'
+    return prod_type
+
+def _get_complexity_str(order_type):
+    complexity = "Regular"
+    if(order_type == OrderType.BracketOrder):
+        complexity = 'BO'
+    elif(order_type == OrderType.AfterMarketOrder):
+        complexity = 'AMO'
+    return complexity
+
+def _get_place_order_payload(transaction_type, instrument, quantity, order_type,
+                                product_type, price, trigger_price, stop_loss, target,
+                                trailing_sl, disclosed_quantity, order_tag):
+    """ validate parameters of place_order and construct a single order of executePlaceOrder """
+    if transaction_type is None:
+        raise TypeError("Required parameter transaction_type not of type TransactionType")
+
+    if not isinstance(instrument, Instrument):
+        raise TypeError("Required parameter instrument not of type Instrument")
+
+    if not isinstance(quantity, int):
+        raise TypeError("Required parameter quantity not of type int")
+
+    if order_type is None:
+        raise TypeError("Required parameter order_type not of type OrderType")
+
+    if product_type is None:
+        raise TypeError("Required parameter product_type not of type ProductType")
+
+    if price is not None and not isinstance(price, float):
+        raise TypeError("Optional parameter price not of type float")
+
+    if trigger_price is not None and not isinstance(trigger_price, float):
+        raise TypeError("Optional parameter trigger_price not of type float")
+
+    prod_type = _get_product_type_str(product_type, instrument.exchange)
+    complexity = _get_complexity_str(order_type)
+    # construct order object after all required parameters are met
+    order = {   "discqty"        : quantity if disclosed_quantity == None else disclosed_quantity,
+                "exch"           : instrument.exchange,
+                "transtype"      : transaction_type.value,
+                "ret"            : "DAY",
+                "prctyp"         : order_type.value,
+                "qty"            : quantity,
+                "symbol_id"      : instrument.token,
+                "trading_symbol" : instrument.symbol,
+                "price"          : price,
+                "trigPrice"      : trigger_price,
+                "pCode"          : prod_type,
+                "complexty"      : complexity,
+                "orderTag"       : order_tag
+            }
+
+    if order_type is OrderType.BracketOrder:
+        if not isinstance(stop_loss, float):
+            raise TypeError("Required parameter stop_loss is not of type float")
+
+        if not isinstance(target, float):
+            raise TypeError("Required parameter target is not of type float")
+
+        order["stopLoss"] = stop_loss
+        order["target"] = target
+
+        if trailing_sl is not None and not isinstance(trailing_sl, int):
+            raise TypeError("Optional parameter trailing_sl not of type int")
+        elif trailing_sl is not None:
+            order["trailing_stop_loss"] = trailing_sl
+    return order
+
+def _get_modify_order_payload(transaction_type, instrument, product_type, order_id, order_type, quantity, price, trigger_price):
+    """ validate parameters of modify_order and construct modifyOrder payload """
+    if not isinstance(instrument, Instrument):
+        raise TypeError("Required parameter instrument not of type Instrument")
+
+    if not isinstance(order_id, str):
+        raise TypeError("Required parameter order_id not of type str")
+
+    if not isinstance(quantity, int):
+        raise TypeError("Optional parameter quantity not of type int")
+
+    if type(order_type) is not OrderType:
+        raise TypeError("Optional parameter order_type not of type OrderType")
+
+    if product_type is None:
+        raise TypeError("Required parameter product_type not of type ProductType")
+
+    if price is not None and not isinstance(price, float):
+        raise TypeError("Optional parameter price not of type float")
+
+    if trigger_price is not None and not isinstance(trigger_price, float):
+        raise TypeError("Optional parameter trigger_price not of type float")
+
+    prod_type = _get_product_type_str(product_type, instrument.exchange)
+    # construct order object with order id
+    return {"exch"           : instrument.exchange,
+            "nestOrderNumber": order_id,
+            "transtype"      : transaction_type.value,
+            "prctyp"         : order_type.value,
+            "qty"            : quantity,
+            "price"          : price,
+            "trigPrice"      : trigger_price,
+            "pCode"          : prod_type
+        }
+
+def _get_cancel_order_request(order_id, leg_order_id):
+    """ endpoint name and payload to cancel an order """
+    if(leg_order_id == None):
+        return 'cancelOrder', {'nestOrderNumber': order_id}
+    return 'exitBracketOrder', {"nestOrderNumber" : order_id, "symbolOrderId" : leg_order_id, "status" : "open"}
+
+def _get_square_off_payload(instrument, quantity, product_type):
+    """ validate parameters of square_off and construct sqrOfPosition payload """
+    if not isinstance(instrument, Instrument):
+        raise TypeError("Required parameter instrument not of type Instrument")
+
+    if not isinstance(quantity, int):
+        raise TypeError("Required parameter quantity not of type int")
+
+    if product_type is None:
+        raise TypeError("Required parameter product_type not of type ProductType")
+
+    prod_type = _get_product_type_str(product_type, instrument.exchange)
+    return {"exchSeg"   :   instrument.exchange,
+            "pCode"     :   prod_type,
+            "netQty"    :   quantity,
+            "tockenNo"  :   instrument.token,
+            "symbol"    :   instrument.symbol
+        }
+
+def _get_bulk_kwargs(name, items, required, defaults):
+    """ validate every item of a bulk call, a dict of parameters of the single item call each, before any is sent.
+        Returns parameters of every item with defaults filled in
+    """
+    if not isinstance(items, list):
+        raise TypeError(f"Required parameter {name} not of type list")
+    all_kwargs = []
+    for n, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise TypeError(f"Required parameter {name}[{n}] not of type dict")
+        for k in item:
+            if(k not in required and k not in defaults):
+                raise TypeError(f"Unknown parameter {k} in {name}[{n}]")
+        for k in required:
+            if(k not in item):
+                raise TypeError(f"Required parameter {k} missing in {name}[{n}]")
+        kwargs = dict(defaults)
+        kwargs.update(item)
+        all_kwargs.append(kwargs)
+    return all_kwargs
+
+def _get_bulk_payloads(name, all_kwargs, get_payload):
+    """ payload of every item of a bulk call, type errors tell which item is wrong """
+    payloads = []
+    for n, kwargs in enumerate(all_kwargs):
+        try:
+            payloads.append(get_payload(**kwargs))
+        except TypeError as e:
+            raise TypeError(f"{e} in {name}[{n}]")
+    return payloads
+
+_place_order_required = ("transaction_type", "instrument", "quantity", "order_type", "product_type")
+_place_order_defaults = {"price" : 0.0, "trigger_price" : None, "stop_loss" : None, "target" : None,
+                         "trailing_sl" : None, "disclosed_quantity" : None, "order_tag" : None}
+
+def _get_place_orders_payloads(orders, order_tag):
+    """ validate every order of place_orders before any order is sent. Returns payloads of all orders & last order tag used """
+    all_kwargs = _get_bulk_kwargs("orders", orders, _place_order_required, _place_order_defaults)
+    for kwargs in all_kwargs:
+        order_tag += 1
+        if(kwargs["order_tag"] == None):
+            kwargs["order_tag"] = order_tag
+    return _get_bulk_payloads("orders", all_kwargs, _get_place_order_payload), order_tag
+
+_modify_order_required = ("transaction_type", "instrument", "product_type", "order_id", "order_type", "quantity")
+_modify_order_defaults = {"price" : 0.0, "trigger_price" : 0.0}
+
+def _get_modify_orders_payloads(orders):
+    """ validate every order of modify_orders before any order is sent """
+    all_kwargs = _get_bulk_kwargs("orders", orders, _modify_order_required, _modify_order_defaults)
+    return _get_bulk_payloads("orders", all_kwargs, _get_modify_order_payload)
+
+def _is_open_order(order):
+    """ True if an order of order book can still be modified or cancelled """
+    return is_open_status(order.get("Status", ""))
+
+def _get_cancel_orders_requests(order_ids, order_book, filter):
+    """ (item, endpoint name, payload) to cancel given order ids, or open orders of order book which pass filter """
+    cancel_requests = []
+    if(order_ids is not None):
+        if not isinstance(order_ids, list):
+            raise TypeError("Optional parameter order_ids not of type list")
+        for order_id in order_ids:
+            if not isinstance(order_id, str):
+                raise TypeError("Optional parameter order_ids not of type list of str")
+            cancel_requests.append((order_id,) + _get_cancel_order_request(order_id, None))
+        return cancel_requests
+    for order in (order_book if isinstance(order_book, list) else []):
+        if(_is_open_order(order) and (filter is None or filter(order))):
+            leg_order_id = order.get("SyomOrderId") or None
+            cancel_requests.append((order,) + _get_cancel_order_request(order["Nstordno"], leg_order_id))
+    return cancel_requests
+
+def _get_square_off_positions_payloads(positions, filter, get_instrument_by_token):
+    """ (position, sqrOfPosition payload) of every open position of positionBook which passes filter """
+    payloads = []
+    for position in (positions if isinstance(positions, list) else []):
+        quantity = int(float(str(position.get("Netqty", "0")).replace(",", "")))
+        if(quantity == 0 or (filter is not None and not filter(position))):
+            continue
+        exchange = position["Exchange"]
+        token = int(position["Token"])
+        instrument = get_instrument_by_token(exchange, token)
+        if(instrument is None):
+            instrument = Instrument(exchange, token, position["Tsym"], None, None, None)
+        product_type = ProductType.Intraday if(position["Pcode"] == "MIS") else ProductType.Delivery
+        payload = _get_square_off_payload(instrument, quantity, product_type)
+        # Product of the position as it is, eg. NRML on BFO
+        payload["pCode"] = position["Pcode"]
+        payloads.append((position, payload))
+    return payloads
+
+def _get_historical_data_payload(instrument, ffrom, to, type):
+    """ validate parameters of historical_data and construct chart history payload """
+    if not isinstance(instrument, Instrument):
+        raise TypeError("Required parameter instrument is not of type Instrument")
+    if not isinstance(ffrom, datetime.datetime):
+        raise TypeError("Required parameter 'ffrom' is not of type datetime")
+    if not isinstance(to, datetime.datetime):
+        raise TypeError("Required parameter 'to' is not of type datetime")
+    if not isinstance(type, HistoricalDataType):
+        raise TypeError("Required parameter 'type' is not of type HistoricalDataType")
+    return {"token"     : instrument.token,
+            "resolution": type.value,
+            "from"      : int(datetime.datetime.timestamp(ffrom) * 1000),
+            "to"        : int(datetime.datetime.timestamp(to) * 1000),
+            "exchange"  : instrument.exchange}
+
+def _get_historical_chunks_args(instrument, ffrom, to, type, chunk_days):
+    """ validate parameters of load_historical_data, returns (instruments, start, end, chunk seconds) """
+    instruments = instrument if(isinstance(instrument, list)) else [instrument]
+    for _instrument in instruments:
+        _get_historical_data_payload(_instrument, ffrom, to, type)
+    if(chunk_days is None):
+        chunk_days = DEFAULT_CHUNK_DAYS.get(type.value, 30)
+    if(not isinstance(chunk_days, int) or chunk_days < 1):
+        raise TypeError("Optional parameter chunk_days not of type positive int")
+    return instruments, to_epoch(ffrom), to_epoch(to), chunk_days * 86400
+
+def _check_historical_data_format(instrument, output):
+    if not isinstance(output, HistoricalDataFormat):
+        raise TypeError("Optional parameter 'output' is not of type HistoricalDataFormat")
+    if(output == HistoricalDataFormat.Panel and not isinstance(instrument, list)):
+        raise TypeError("Required parameter instrument is not a list of Instrument, for HistoricalDataFormat.Panel")
+
+def _get_historical_data_result(response, output):
+    """ historical_data response in the requested format """
+    if(output == HistoricalDataFormat.Dict):
+        return response
+    columns = parse_columns(get_chunk_bars(response))
+    return get_dataframe(columns) if(output == HistoricalDataFormat.DataFrame) else columns
+
+def _get_historical_chunks_result(instrument, bars, results, output):
+    """ Bars of load_historical_data in the requested format, raises if any chunk couldn't be downloaded """
+    errors = [r.error for r in results if r.error is not None]
+    if(len(errors) > 0):
+        raise Exception(f"Couldn't download {len(errors)} of {len(results)} chunks of historical data, {errors[0]}")
+    if(output == HistoricalDataFormat.Dict):
+        convert = format_bars
+    elif(output == HistoricalDataFormat.DataFrame):
+        convert = lambda data: get_dataframe(get_columns(data))
+    else:
+        convert = get_columns
+    if(output == HistoricalDataFormat.Panel):
+        return get_panel({i : convert(bars[i]) for i in instrument})
+    if(isinstance(instrument, list)):
+        return {i : convert(bars[i]) for i in instrument}
+    return convert(bars[instrument])
+
+# Subscribe message type of a feed type
+_subscribe_types = {LiveFeedType.TICK_DATA   : 't',
+                    LiveFeedType.DEPTH_DATA  : 'd'}
+
+def _get_subscription_string(instrument):
+    """ '#' separated exchange|token string of an instrument or list of instruments """
+    if (isinstance(instrument, list)):
+        subscribe_string = ""
+        for _instrument in instrument:
+            if not isinstance(_instrument, Instrument):
+                raise TypeError("Required parameter instrument is not of type Instrument")
+            subscribe_string += f"#{_instrument.exchange}|{int(_instrument.token)}"
+        return subscribe_string[1:] # remove the first '#' symbol
+    if not isinstance(instrument, Instrument):
+        raise TypeError("Required parameter instrument is not of type Instrument")
+    return f"{instrument.exchange}|{int(instrument.token)}"
+
+def _get_websocket_connect_payload(username, session_id):
+    """ First message to be sent after websocket connection """
+    return {"susertoken": hashlib.sha256(hashlib.sha256(session_id.encode('utf-8')).hexdigest().encode('utf-8')).hexdigest(),
+            "t": "c",
+            "actid": username + "_API",
+            "uid": username + "_API",
+            "source": "API"
+            }
+
+def _get_order_updates_payload(username):
+    """ Message to subscribe to order updates of the account """
+    return {"t": "o", "actid": username + "_API"}
+
+def _parse_master_contract(exchange, content, binary, columns=False):
+    """ Parse a downloaded master contract, runs in a worker process with parallel loading.
+        Returns (instruments, instrument columns or path of binary copy, seconds taken)
+    """
+    start = time.perf_counter()
+    body = codec.loads(content)
+    result = None
+    if(binary == True):
+        try:
+            result = write_binary_master_contract(exchange, body)
+        except OSError as e:
+            logger.warning(f"Couldn't write binary master contracts for exchange: {exchange}, {e}")
+    if(result is None):
+        result = parse_master_contract(body)
+        if(columns == True):
+            result = instruments_to_columns(result)
+    return result, time.perf_counter() - start
+
+def _get_parse_executor(exchanges):
+    """ Worker processes for parsing master contracts, threads if processes can't be used on this platform """
+    try:
+        return ProcessPoolExecutor(min(exchanges, os.cpu_count() or 1))
+    except (OSError, NotImplementedError) as e:
+        logger.warning(f"Couldn't start worker processes, parsing master contracts in threads, {e}")
+        return ThreadPoolExecutor(1)
+
 class AliceBlue:
     """ AliceBlue Class for all operations related to AliceBlue Server"""
 
     # URLs
-    host = "https://ant.aliceblueonline.com/rest/AliceBlueAPIService"
-    __urls = {  "webLogin"              :   f"{host}/customer/webLogin",
-                "twoFA"                 :   f"{host}/sso/validAnswer",
-                "sessionID"             :   f"{host}/sso/getUserDetails",
-                "getEncKey"             :   f"{host}/customer/getEncryptionKey",
-                "authorizeVendor"       :   f"{host}/sso/authorizeVendor",
-                "apiGetEncKey"          :   f"{host}/api/customer/getAPIEncpkey",
-                "profile"               :   f"{host}/api/customer/accountDetails",
-                "placeOrder"            :   f"{host}/api/placeOrder/executePlaceOrder",
-                "logout"                :   f"{host}/api/customer/logout",
-                "logoutFromAllDevices"  :   f"{host}/api/customer/logOutFromAllDevice",
-                "fetchMWList"           :   f"{host}/api/marketWatch/fetchMWList",
-                "fetchMWScrips"         :   f"{host}/api/marketWatch/fetchMWScrips",
-                "addScripToMW"          :   f"{host}/api/marketWatch/addScripToMW",
-                "deleteMWScrip"         :   f"{host}/api/marketWatch/deleteMWScrip",
-                "scripDetails"          :   f"{host}/api/ScripDetails/getScripQuoteDetails",
-                "positions"             :   f"{host}/api/positionAndHoldings/positionBook",
-                "holdings"              :   f"{host}/api/positionAndHoldings/holdings",
-                "sqrOfPosition"         :   f"{host}/api/positionAndHoldings/sqrOofPosition",
-                "fetchOrder"            :   f"{host}/api/placeOrder/fetchOrderBook",
-                "fetchTrade"            :   f"{host}/api/placeOrder/fetchTradeBook",
-                "exitBracketOrder"      :   f"{host}/api/placeOrder/exitBracketOrder",
-                "modifyOrder"           :   f"{host}/api/placeOrder/modifyOrder",
-                "cancelOrder"           :   f"{host}/api/placeOrder/cancelOrder",
-                "orderHistory"          :   f"{host}/api/placeOrder/orderHistory",
-                "getRmsLimits"          :   f"{host}/api/limits/getRmsLimits",
-                "createWsSession"       :   f"{host}/api/ws/createSocketSess",
-                "history"               :   f"{host}/api/chart/history",
-                "master_contract"       :   "https://v2api.aliceblueonline.com/restpy/contract_master?exch={exchange}",
-                "ws"                    :   "wss://ws2.aliceblueonline.com/NorenWS/"
-            }
-
-    def __init__(self, username, session_id, master_contracts_to_download = None):
-        """ Create Alice Blue object, get enabled exchanges and products for user """
+    host = _host
+    __urls = _urls
+
+    def __init__(self, username, session_id, master_contracts_to_download = None, http_session = None,
+                 binary_master_contracts = False, lazy_master_contracts = False, parallel_master_contracts = False,
+                 ngram_search_index = False, historical_cache_dir = None, host = None, urls = None):
+        """ Create Alice Blue object, get enabled exchanges and products for user.
+            REST calls are made over http_session (HttpSession), a session shared by all objects is used if not given.
+            With binary_master_contracts master contracts are memory mapped from a binary copy written once a day.
+            With lazy_master_contracts an exchange's master contracts are loaded when it's looked up for the first time.
+            With parallel_master_contracts all exchanges are downloaded concurrently & parsed in worker processes.
+            With ngram_search_index substring searches use a trigram index, which takes longer to build & more memory.
+            Bars downloaded by load_historical_data are cached in historical_cache_dir, a temp directory if not given.
+            REST calls go to host instead of alice blue server if given, & any endpoint's URL can be replaced by urls,
+            a dict of endpoint name (as in AliceBlue._AliceBlue__urls) to URL, eg. to use a local Simulator.
+            Master contracts of servers other than alice blue's are not stored in local files.
+        """
+        self.__urls = _get_urls(host, urls)
+        if(host is not None):
+            self.host = host
+        # Local copies of master contracts are only of alice blue server
+        local_master_contracts = (self.__urls["master_contract"] == _urls["master_contract"])
+        self.__local_master_contracts = local_master_contracts
         self.__username = username
         self.__session_id = session_id
+        self.__http_session = get_default_session() if(http_session is None) else http_session
+        self.__binary_master_contracts = (binary_master_contracts == True and local_master_contracts)
+        self.__master_contract_timings = {}
+        self.__bar_cache = BarCache(historical_cache_dir)
         self.__websocket = None
         self.__websocket_connected = False
         self.__ws_mutex = threading.Lock()
+        self.__outbound = None
+        self.__shards = None
+        self.__subscriptions = None
+        # Frames of all websocket shards are handled one at a time, so they make one stream
+        self.__shard_lock = threading.Lock()
         self.__on_error = None
         self.__on_disconnect = None
         self.__on_open = None
         self.__subscribe_callback = None
+        self.__dispatcher = None
+        self.__conflator = None
+        self.__journal = None
         self.__order_tag = 1
         self.__order_update_callback = None
+        self.__order_book = None
+        self.__order_updates_subscribed = False
+        self.__positions_engine = None
+        self.__positions_subscribe = False
+        self.__positions_reconciler = None
         self.__market_status_messages_callback = None
         self.__exchange_messages_callback = None
+        self.__feed_structs = False
+        # Latency instrumentation, off unless metrics() is called
+        self.__metrics = None
+        self.__frame_received = None
+        self.__frame_ft = None
         self.__subscribers = {}
         self.__market_status_messages = []
         self.__exchange_messages = []
-        # Initialize Depth data
-        self.__depth_data = {} 
-        self.__tick_data = {} 
+        # Latest tick & depth data of every token received in websocket
+        self.__feed_decoder = FeedDecoder(self.get_instrument_by_token)
+        self.__market_state = None
 
         try:
             self.get_profile()
         except Exception as e:
             raise Exception(f"Couldn't get profile info with credentials provided '{e}'")
-        self.__master_contracts_by_token = {}
-        self.__master_contracts_by_symbol = {}
-        self.__get_master_contract("INDICES")
         if(master_contracts_to_download == None):
-            for e in self.__enabled_exchanges:
-                self.__get_master_contract(e)
+            self.__master_contract_exchanges = list(self.__enabled_exchanges)
         else:
-            for e in master_contracts_to_download:
-                self.__get_master_contract(e)
+            self.__master_contract_exchanges = list(master_contracts_to_download)
+        if(lazy_master_contracts == True):
+            self.__master_contracts = MasterContracts(loader=self.__load_master_contract, ngram_index=ngram_search_index)
+        else:
+            self.__master_contracts = MasterContracts(ngram_index=ngram_search_index)
+            if(parallel_master_contracts == True):
+                self.__get_master_contracts_parallel(["INDICES"] + self.__master_contract_exchanges)
+            else:
+                self.__get_master_contract("INDICES")
+                for e in self.__master_contract_exchanges:
+                    self.__get_master_contract(e)
         self.ws_thread = None
 
     @staticmethod
-    def login_and_get_sessionID(username, password, twoFA, app_id, api_secret):
+    def login_and_get_sessionID(username, password, twoFA, app_id, api_secret, http_session = None):
         """ Login and get Session ID """
+        session = get_default_session() if(http_session is None) else http_session
         header = {"Content-Type" : "application/json"}
         try:
             dr = tempfile.gettempdir()
@@ -180,7 +632,7 @@ class AliceBlue:
                     data = {"userId" : username}
                     hdr = { "Content-Type" : "application/json",
                             "Authorization" : f"Bearer {username} {d['session_id']}"}
-                    r = requests.get(AliceBlue.__urls["profile"], headers=hdr, data=json.dumps(data))
+                    r = session.get(AliceBlue.__urls["profile"], headers=hdr, data=json.dumps(data))
                     logging.info(f"Get Account details response {r.text}")
                     if(r.status_code == 200):
                         if("stat" not in r.json()):
@@ -193,7 +645,7 @@ class AliceBlue:
             logging.warn(f"Getting session_id from temp file ended in exception {e}")
         # Get Encryption Key
         data = {"userId" : username}
-        r = requests.post(AliceBlue.__urls['getEncKey'], headers=header, json=data)
+        r = session.post(AliceBlue.__urls['getEncKey'], headers=header, json=data)
         logging.info(f"Get Encryption Key response {r.text}")
         encKey = r.json()["encKey"]
 
@@ -202,7 +654,7 @@ class AliceBlue:
         checksum = checksum.decode("utf-8")
         data = {"userId" : username,
                 "userData" : checksum}
-        r = requests.post(AliceBlue.__urls["webLogin"], json=data)
+        r = session.post(AliceBlue.__urls["webLogin"], json=data)
         logging.info(f"Web Login response {r.text}")
 
         # Web Login 2FA
@@ -211,7 +663,7 @@ class AliceBlue:
                 "sIndex" : "1",
                 "userId" : username,
                 "vendor" : app_id}
-        r = requests.post(AliceBlue.__urls["twoFA"], json=data)
+        r = session.post(AliceBlue.__urls["twoFA"], json=data)
         logging.info(f"Web Login 2FA response {r.text}")
         isAuthorized = r.json()['isAuthorized']
         authCode = parse_qs(urlparse(r.json()["redirectUrl"]).query)['authCode'][0]
@@ -220,13 +672,13 @@ class AliceBlue:
 
         # Get API Encryption Key
         data = {"userId" : username}
-        r = requests.post(AliceBlue.__urls["apiGetEncKey"], headers=header, data=json.dumps(data))
+        r = session.post(AliceBlue.__urls["apiGetEncKey"], headers=header, data=json.dumps(data))
         logging.info(f"Get API Encryption Key response {r.text}")
 
         # Get User Details/Session ID
         checksum = hashlib.sha256(f"{username}{authCode}{api_secret}".encode()).hexdigest()
         data = {"checkSum" : checksum}
-        r = requests.post(AliceBlue.__urls["sessionID"], headers=header, data=json.dumps(data))
+        r = session.post(AliceBlue.__urls["sessionID"], headers=header, data=json.dumps(data))
         logging.info(f"Session ID response {r.text}")
         session_id = r.json()['userSession']
         logging.info(f"Session ID is {session_id}")
@@ -236,7 +688,7 @@ class AliceBlue:
             data = {"userId" : username,
                     "vendor" : app_id}
             print("Authorizing vendor app")
-            r = requests.post(AliceBlue.__urls["authorizeVendor"], headers=header, data=json.dumps(data))
+            r = session.post(AliceBlue.__urls["authorizeVendor"], headers=header, data=json.dumps(data))
 
         # Write session_id in temp file for next time usage
         with open(tmp_file, 'w') as fo:
@@ -245,199 +697,26 @@ class AliceBlue:
         return session_id
 
     def __extract_tick_data(self, data):
-        if("tk" in data):               # Token
-            data["instrument"] = self.get_instrument_by_token(data.pop("e"), int(data.pop("tk")))
-        if("ts" in data):               # Symbol
-            data.pop("ts")
-        if(data["instrument"].symbol not in self.__tick_data):
-            self.__tick_data[data["instrument"].symbol] = {}
-            self.__tick_data[data["instrument"].symbol]["ltp"] = 0
-            self.__tick_data[data["instrument"].symbol]["percent_change"] = 0
-            self.__tick_data[data["instrument"].symbol]["change_value"] = 0
-            self.__tick_data[data["instrument"].symbol]["volume"] = 0
-            self.__tick_data[data["instrument"].symbol]["open"] = 0
-            self.__tick_data[data["instrument"].symbol]["high"] = 0
-            self.__tick_data[data["instrument"].symbol]["low"] = 0
-            self.__tick_data[data["instrument"].symbol]["close"] = 0
-            self.__tick_data[data["instrument"].symbol]["exchange_time_stamp"] = None
-            self.__tick_data[data["instrument"].symbol]["atp"] = 0
-            self.__tick_data[data["instrument"].symbol]["tick_increment"] = 0
-            self.__tick_data[data["instrument"].symbol]["lot_size"] = 0
-            self.__tick_data[data["instrument"].symbol]["price_precision"] = 0
-            self.__tick_data[data["instrument"].symbol]["total_open_interest"] = 0
-        if("lp" in data):               # Last Traded Price
-            self.__tick_data[data["instrument"].symbol]["ltp"] = float(data.pop("lp"))
-        if("pc" in data):               # percentage change
-            self.__tick_data[data["instrument"].symbol]["percent_change"] = float(data.pop("pc"))
-        if("cv" in data):               # change value (absolute change in price)
-            self.__tick_data[data["instrument"].symbol]["change_value"] = float(data.pop("cv"))
-        if("v" in data):                # Volume
-            self.__tick_data[data["instrument"].symbol]["volume"] = int(data.pop("v"))
-        if("o" in data):                # Open
-            self.__tick_data[data["instrument"].symbol]["open"] = float(data.pop("o"))
-        if("h" in data):                # High
-            self.__tick_data[data["instrument"].symbol]["high"] = float(data.pop("h"))
-        if("l" in data):                # Low
-            self.__tick_data[data["instrument"].symbol]["low"] = float(data.pop("l"))
-        if("c" in data):                # Close
-            self.__tick_data[data["instrument"].symbol]["close"] = float(data.pop("c"))
-        if("ft" in data):               # Feed Time
-            self.__tick_data[data["instrument"].symbol]["exchange_time_stamp"] = datetime.datetime.fromtimestamp(int(data.pop("ft")))
-        if("ap" in data):               # Average Price
-            self.__tick_data[data["instrument"].symbol]["atp"] = float(data.pop("ap"))
-        if("ti" in data):               # Tick Increment
-            self.__tick_data[data["instrument"].symbol]["tick_increment"] = float(data.pop("ti"))
-        if("ls" in data):               # Lot Size
-            self.__tick_data[data["instrument"].symbol]["lot_size"] = int(data.pop("ls"))
-        if(data["instrument"].symbol not in self.__depth_data):                # Initialize depth data
-            self.__depth_data[data["instrument"].symbol] = {}
-            self.__depth_data[data["instrument"].symbol]["bid_prices"]          = [None, None, None, None, None]
-            self.__depth_data[data["instrument"].symbol]["ask_prices"]          = [None, None, None, None, None]
-            self.__depth_data[data["instrument"].symbol]["bid_quantities"]      = [None, None, None, None, None]
-            self.__depth_data[data["instrument"].symbol]["ask_quantities"]      = [None, None, None, None, None]
-            self.__depth_data[data["instrument"].symbol]["buy_orders"]          = [None, None, None, None, None]
-            self.__depth_data[data["instrument"].symbol]["sell_orders"]         = [None, None, None, None, None]
-            self.__depth_data[data["instrument"].symbol]["open_interest"]       = 0
-            self.__depth_data[data["instrument"].symbol]["last_traded_quantity"]= 0
-            self.__depth_data[data["instrument"].symbol]["last_traded_time"]    = None
-            self.__depth_data[data["instrument"].symbol]["total_buy_quantity"]  = 0
-            self.__depth_data[data["instrument"].symbol]["total_sell_quantity"] = 0
-            self.__depth_data[data["instrument"].symbol]["upper_circuit"]       = 0
-            self.__depth_data[data["instrument"].symbol]["lower_circuit"]       = 0
-
-        if("bp1" in data):               # Best Bid
-            self.__depth_data[data["instrument"].symbol]["bid_prices"][0] = float(data.pop("bp1"))
-        if("sp1" in data):               # Best Ask
-            self.__depth_data[data["instrument"].symbol]["ask_prices"][0] = float(data.pop("sp1"))
-        if("bq1" in data):               # Best Bid Quantity
-            self.__depth_data[data["instrument"].symbol]["bid_quantities"][0] = int(data.pop("bq1"))
-        if("sq1" in data):               # Best Ask Quantity
-            self.__depth_data[data["instrument"].symbol]["ask_quantities"][0] = int(data.pop("sq1"))
-        if("pp" in data):                # Price Precision
-            self.__tick_data[data["instrument"].symbol]["price_precision"] = int(data.pop("pp"))
-        if("toi" in data):               # Total Open Interest
-            self.__tick_data[data["instrument"].symbol]["total_open_interest"] = int(data.pop("toi"))
-        data["ltp"]                 = self.__tick_data[data["instrument"].symbol]["ltp"]
-        data["percent_change"]      = self.__tick_data[data["instrument"].symbol]["percent_change"]
-        data["change_value"]        = self.__tick_data[data["instrument"].symbol]["change_value"]
-        data["volume"]              = self.__tick_data[data["instrument"].symbol]["volume"]
-        data["open"]                = self.__tick_data[data["instrument"].symbol]["open"]
-        data["high"]                = self.__tick_data[data["instrument"].symbol]["high"]
-        data["low"]                 = self.__tick_data[data["instrument"].symbol]["low"]
-        data["close"]               = self.__tick_data[data["instrument"].symbol]["close"]
-        data["exchange_time_stamp"] = self.__tick_data[data["instrument"].symbol]["exchange_time_stamp"]
-        data["atp"]                 = self.__tick_data[data["instrument"].symbol]["atp"]
-        data["tick_increment"]      = self.__tick_data[data["instrument"].symbol]["tick_increment"]
-        data["lot_size"]            = self.__tick_data[data["instrument"].symbol]["lot_size"]
-        data["best_bid_price"]      = self.__depth_data[data["instrument"].symbol]["bid_prices"][0]
-        data["best_ask_price"]      = self.__depth_data[data["instrument"].symbol]["ask_prices"][0]
-        data["best_bid_quantity"]   = self.__depth_data[data["instrument"].symbol]["bid_quantities"][0]
-        data["best_ask_quantity"]   = self.__depth_data[data["instrument"].symbol]["ask_quantities"][0]
-        data["price_precision"]     = self.__tick_data[data["instrument"].symbol]["price_precision"]
-        data["total_open_interest"] = self.__tick_data[data["instrument"].symbol]["total_open_interest"]
-        return data
-    
+        decode = self.__feed_decoder.decode if(self.__feed_structs == True) else self.__feed_decoder.decode_tick
+        if(self.__metrics is None):
+            return decode(data)
+        self.__frame_ft = data.get("ft")
+        start = time.perf_counter()
+        tick = decode(data)
+        self.__metrics.observe("extract", time.perf_counter() - start, "tick")
+        return tick
+
     def __extract_depth_data(self, data):
         """ example depth frame 
         message - {"t":"dk","pp":"2","ml":"1","e":"NSE","tk":"1594","ts":"INFY-EQ","ls":"1","ti":"0.05","c":"1461.75","lp":"1489.90","pc":"1.93","o":"1473.10","h":"1496.10","l":"1466.00","uc":"1607.90","lc":"1315.60","toi":"53068800","ft":"1661853600","ltq":"10","ltt":"15:29:59","v":"6724948","tbq":"308293","tsq":"177491","bp1":"1489.55","sp1":"1489.90","bp2":"1489.45","sp2":"1489.95","bp3":"1489.40","sp3":"1490.00","bp4":"1489.10","sp4":"1490.80","bp5":"1489.00","sp5":"1491.00","bq1":"1","sq1":"25","bq2":"5","sq2":"1358","bq3":"468","sq3":"2221","bq4":"500","sq4":"600","bq5":"30","sq5":"258","bo1":"1","so1":"1","bo2":"1","so2":"2","bo3":"2","so3":"5","bo4":"1","so4":"1","bo5":"3","so5":"6","ap":"1485.71"}"""
-        # Extract tick data first
-        data = self.__extract_tick_data(data)
-
-        # Bid Prices
-        if("bp2" in data):
-            self.__depth_data[data["instrument"].symbol]["bid_prices"][1] = float(data.pop("bp2"))
-        if("bp3" in data):
-            self.__depth_data[data["instrument"].symbol]["bid_prices"][2] = float(data.pop("bp3"))
-        if("bp4" in data):
-            self.__depth_data[data["instrument"].symbol]["bid_prices"][3] = float(data.pop("bp4"))
-        if("bp5" in data):
-            self.__depth_data[data["instrument"].symbol]["bid_prices"][4] = float(data.pop("bp5"))
-
-        # Ask Prices
-        if("sp2" in data):
-            self.__depth_data[data["instrument"].symbol]["ask_prices"][1] = float(data.pop("sp2"))
-        if("sp3" in data):
-            self.__depth_data[data["instrument"].symbol]["ask_prices"][2] = float(data.pop("sp3"))
-        if("sp4" in data):
-            self.__depth_data[data["instrument"].symbol]["ask_prices"][3] = float(data.pop("sp4"))
-        if("sp5" in data):
-            self.__depth_data[data["instrument"].symbol]["ask_prices"][4] = float(data.pop("sp5"))
-
-        # Bid Quantities
-        if("bq2" in data):
-            self.__depth_data[data["instrument"].symbol]["bid_quantities"][1] = int(data.pop("bq2"))
-        if("bq3" in data):
-            self.__depth_data[data["instrument"].symbol]["bid_quantities"][2] = int(data.pop("bq3"))
-        if("bq4" in data):
-            self.__depth_data[data["instrument"].symbol]["bid_quantities"][3] = int(data.pop("bq4"))
-        if("bq5" in data):
-            self.__depth_data[data["instrument"].symbol]["bid_quantities"][4] = int(data.pop("bq5"))
-
-        # Ask Quantities
-        if("sq2" in data):
-            self.__depth_data[data["instrument"].symbol]["ask_quantities"][1] = int(data.pop("sq2"))
-        if("sq3" in data):
-            self.__depth_data[data["instrument"].symbol]["ask_quantities"][2] = int(data.pop("sq3"))
-        if("sq4" in data):
-            self.__depth_data[data["instrument"].symbol]["ask_quantities"][3] = int(data.pop("sq4"))
-        if("sq5" in data):
-            self.__depth_data[data["instrument"].symbol]["ask_quantities"][4] = int(data.pop("sq5"))
-
-        # Buy Orders
-        if("bo1" in data):
-            self.__depth_data[data["instrument"].symbol]["buy_orders"][1] = int(data.pop("bo1"))
-        if("bo2" in data):
-            self.__depth_data[data["instrument"].symbol]["buy_orders"][1] = int(data.pop("bo2"))
-        if("bo3" in data):
-            self.__depth_data[data["instrument"].symbol]["buy_orders"][2] = int(data.pop("bo3"))
-        if("bo4" in data):
-            self.__depth_data[data["instrument"].symbol]["buy_orders"][3] = int(data.pop("bo4"))
-        if("bo5" in data):
-            self.__depth_data[data["instrument"].symbol]["buy_orders"][4] = int(data.pop("bo5"))
-
-        # Sell Orders
-        if("so1" in data):
-            self.__depth_data[data["instrument"].symbol]["sell_orders"][1] = int(data.pop("so1"))
-        if("so2" in data):
-            self.__depth_data[data["instrument"].symbol]["sell_orders"][1] = int(data.pop("so2"))
-        if("so3" in data):
-            self.__depth_data[data["instrument"].symbol]["sell_orders"][2] = int(data.pop("so3"))
-        if("so4" in data):
-            self.__depth_data[data["instrument"].symbol]["sell_orders"][3] = int(data.pop("so4"))
-        if("so5" in data):
-            self.__depth_data[data["instrument"].symbol]["sell_orders"][4] = int(data.pop("so5"))
-
-        # Update depth data in dict
-        data["bid_prices"] = self.__depth_data[data["instrument"].symbol]["bid_prices"].copy()
-        data["ask_prices"] = self.__depth_data[data["instrument"].symbol]["ask_prices"].copy()
-        data["bid_quantities"] = self.__depth_data[data["instrument"].symbol]["bid_quantities"].copy()
-        data["ask_quantities"] = self.__depth_data[data["instrument"].symbol]["ask_quantities"].copy()
-        data["buy_orders"] = self.__depth_data[data["instrument"].symbol]["buy_orders"].copy()
-        data["sell_orders"] = self.__depth_data[data["instrument"].symbol]["sell_orders"].copy()
-
-        if("oi" in data):               # Open Interest
-            self.__depth_data[data["instrument"].symbol]["open_interest"] = int(data.pop("oi"))
-        if("ltq" in data):               # Last Traded Quantity
-            self.__depth_data[data["instrument"].symbol]["last_traded_quantity"] = int(data.pop("ltq"))
-        if("ltt" in data):               # Last Traded Time
-            self.__depth_data[data["instrument"].symbol]["last_traded_time"] = datetime.datetime.strptime(data.pop("ltt"), "%H:%M:%S").time()
-        if("tbq" in data):               # Total Buy Quantity
-            self.__depth_data[data["instrument"].symbol]["total_buy_quantity"] = int(data.pop("tbq"))
-        if("tsq" in data):               # Total Sell Quantity
-            self.__depth_data[data["instrument"].symbol]["total_sell_quantity"] = int(data.pop("tsq"))
-        if("uc" in data):               # Upper Circuit
-            self.__depth_data[data["instrument"].symbol]["upper_circuit"] = float(data.pop("uc"))
-        if("lc" in data):               # Lower Circuit
-            self.__depth_data[data["instrument"].symbol]["lower_circuit"] = float(data.pop("lc"))
-
-        data["open_interest"]           = self.__depth_data[data["instrument"].symbol]["open_interest"]
-        data["last_traded_quantity"]    = self.__depth_data[data["instrument"].symbol]["last_traded_quantity"]
-        data["last_traded_time"]        = self.__depth_data[data["instrument"].symbol]["last_traded_time"] 
-        data["total_buy_quantity"]      = self.__depth_data[data["instrument"].symbol]["total_buy_quantity"]
-        data["total_sell_quantity"]     = self.__depth_data[data["instrument"].symbol]["total_sell_quantity"]
-        data["upper_circuit"]           = self.__depth_data[data["instrument"].symbol]["upper_circuit"]
-        data["lower_circuit"]           = self.__depth_data[data["instrument"].symbol]["lower_circuit"]
-        return data
+        decode = self.__feed_decoder.decode if(self.__feed_structs == True) else self.__feed_decoder.decode_depth
+        if(self.__metrics is None):
+            return decode(data)
+        self.__frame_ft = data.get("ft")
+        start = time.perf_counter()
+        depth = decode(data)
+        self.__metrics.observe("extract", time.perf_counter() - start, "depth")
+        return depth
 
     def __on_data_callback(self, ws=None, message=None, data_type=None, continue_flag=None):
         # Sample messages 
@@ -449,41 +728,143 @@ class AliceBlue:
         # logging.info(f"message - {message}")
         if(type(ws) is not websocket.WebSocketApp): # This workaround is to solve the websocket_client's compatiblity issue of older versions. ie.0.40.0 which is used in upstox. Now this will work in both 0.40.0 & newer version of websocket_client
             message = ws
-        data = json.loads(message)
+        self.__on_data(message)
+
+    def __on_shard_data(self, shard, message):
+        with self.__shard_lock:
+            self.__on_data(message, shard.index == 0)
+
+    def __on_data(self, message, primary=True):
+        if(self.__journal is not None):
+            self.__journal.write(message)
+        metrics = self.__metrics
+        if(metrics is None):
+            self.__on_message(message, primary)
+            return
+        self.__frame_received = time.time()
+        self.__frame_ft = None
+        start = time.perf_counter()
+        self.__on_message(message, primary)
+        metrics.observe("on_data", time.perf_counter() - start)
+
+    def __on_message(self, message, primary=True):
+        data = codec.loads(message)
         if(data["t"] == "ck"):           # Connection acknowledgment
-            pass                            # Ignore Connection acknowledgment, nothing to extract from it
+            if(primary == True):         # order updates are subscribed on the first websocket shard only
+                self.__subscribe_order_updates()
+        elif(data["t"] == "ok"):         # Order updates subscription acknowledgment
+            pass
+        elif(data["t"] == "om"):         # Order update
+            self.__on_order_update(data)
         elif(data["t"] == "tk"):         # tick data acknowledgment
-            if(self.__subscribe_callback is not None):
-                data.pop("t")
-                data = self.__extract_tick_data(data)
-                self.__subscribe_callback(data)
+            data.pop("t")
+            if(self.__subscriptions is not None):
+                self.__subscriptions.acknowledge(data["e"], data["tk"], 't')
+            data = self.__extract_tick_data(data)
+            self.__deliver_feed(data)
         elif(data["t"] == "dk"):         # depth data acknowledgment
-            if(self.__subscribe_callback is not None):
-                data.pop("t")
-                data = self.__extract_depth_data(data)
-                self.__subscribe_callback(data)
+            data.pop("t")
+            if(self.__subscriptions is not None):
+                self.__subscriptions.acknowledge(data["e"], data["tk"], 'd')
+            data = self.__extract_depth_data(data)
+            self.__deliver_feed(data)
         elif(data["t"] == "tf"):         # tick data feed
-            if(self.__subscribe_callback is not None):
-                data.pop("t")
-                data = self.__extract_tick_data(data)
-                self.__subscribe_callback(data)
+            data.pop("t")
+            data = self.__extract_tick_data(data)
+            self.__deliver_feed(data)
         elif(data["t"] == "df"):         # depth data feed
-            if(self.__subscribe_callback is not None):
-                data.pop("t")
-                data = self.__extract_depth_data(data)
-                self.__subscribe_callback(data)
-         
+            data.pop("t")
+            data = self.__extract_depth_data(data)
+            self.__deliver_feed(data)
+
+    def __deliver_feed(self, data):
+        metrics = self.__metrics
+        start = time.perf_counter() if(metrics is not None) else None
+        # Frames are always decoded, so feed snapshots & market state are updated even without a consumer
+        if(self.__positions_engine is not None and data["instrument"] is not None):
+            self.__positions_engine.update_ltp(data["instrument"].exchange, int(data["instrument"].token), data["ltp"])
+        if(self.__shards is not None):
+            self.__shards.count(data["instrument"])
+        if(self.__conflator is not None):
+            self.__conflator.put(data["instrument"], data)
+        elif(self.__dispatcher is not None):
+            self.__dispatcher.dispatch(data["instrument"], data)
+        elif(self.__subscribe_callback is not None):
+            self.__subscribe_callback(data)
+        if(metrics is not None):
+            self.__observe_delivery(metrics, start)
+
+    def __observe_delivery(self, metrics, start):
+        # With dispatcher or conflation, callback time is the time to hand the data over
+        metrics.observe("callback", time.perf_counter() - start)
+        received = self.__frame_received
+        if(received is None):                       # replayed frames have no receive time
+            return
+        now = time.time()
+        metrics.observe("receive_to_callback", now - received)
+        if(self.__frame_ft is not None):
+            # ft is in whole seconds, so these are up to a second more than the actual lag
+            ft = int(self.__frame_ft)
+            metrics.observe("exchange_to_receive", received - ft)
+            metrics.observe("exchange_to_callback", now - ft)
+
+    def __on_order_update(self, data):
+        if(self.__order_book is not None):
+            self.__order_book.update(data)
+        if(self.__positions_engine is not None):
+            positions = len(self.__positions_engine)
+            self.__positions_engine.apply_fill(data)
+            if(len(self.__positions_engine) != positions):
+                self.__subscribe_positions()
+        if(self.__order_update_callback is not None):
+            self.__order_update_callback(data)
+
+    def __subscribe_order_updates(self):
+        # Order updates are sent only if someone needs them, subscription is lost on reconnection
+        if(self.__order_update_callback is None and self.__order_book is None and self.__positions_engine is None):
+            return
+        if(self.__websocket is None):               # replaying a journal without websocket
+            return
+        self.__order_updates_subscribed = True
+        self.__ws_send(_get_order_updates_payload(self.__username))
+
     def __on_close_callback(self, *arguments, **keywords):
         self.__websocket_connected = False
+        self.__order_updates_subscribed = False
+        if(self.__outbound is not None):
+            self.__outbound.set_connected(False)
+        if(self.__subscriptions is not None):
+            self.__subscriptions.set_connected(False)
         if self.__on_disconnect:
             self.__on_disconnect()
 
     def __on_open_callback(self, ws=None):
         self.__websocket_connected = True
-        self.__resubscribe()
+        # Connect message goes first on every connection, server forgets subscriptions of a closed one
+        self.__outbound.set_connected(True, _get_websocket_connect_payload(self.__username, self.__session_id))
+        if(self.__subscriptions is not None):
+            self.__subscriptions.set_connected(True)
         if self.__on_open:
             self.__on_open()
 
+    def __on_shard_open(self, shard):
+        # Connect message & subscriptions of the shard are sent by ShardedFeed
+        if(shard.index == 0):
+            self.__websocket_connected = True
+        if self.__on_open:
+            self.__on_open()
+
+    def __on_shard_close(self, shard):
+        if(shard.index == 0):
+            self.__websocket_connected = False
+            self.__order_updates_subscribed = False
+        if self.__on_disconnect:
+            self.__on_disconnect()
+
+    def __on_shard_error(self, shard, error):
+        if self.__on_error:
+            self.__on_error(error)
+
     def __on_error_callback(self, ws=None, error=None):
         if(type(ws) is not websocket.WebSocketApp): # This workaround is to solve the websocket_client's compatiblity issue of older versions. ie.0.40.0 which is used in upstox. Now this will work in both 0.40.0 & newer version of websocket_client
             error = ws
@@ -498,11 +879,18 @@ class AliceBlue:
                 logger.warning(f"websocket run forever ended in exception, {e}")
             sleep(0.1) # Sleep for 100ms between reconnection.
 
-    def __ws_send(self, data):
-        while self.__websocket_connected == False:
-            sleep(0.05)  # sleep for 50ms if websocket is not connected, wait for reconnection
+    def __ws_send(self, data, timeout=None):
+        # Sent by the writer thread when connected, the Future is done when it's sent
+        return self.__outbound.put(data, timeout)
+
+    def __ws_write(self, message):
         with self.__ws_mutex:
-            self.__websocket.send(json.dumps(data))
+            self.__websocket.send(message)
+
+    def __on_ws_sent(self, message_type, seconds):
+        metrics = self.__metrics
+        if(metrics is not None):
+            metrics.observe("ws_send_wait", seconds, message_type)
 
     def start_websocket(self, subscribe_callback = None, 
                                 order_update_callback = None,
@@ -512,8 +900,50 @@ class AliceBlue:
                                 market_status_messages_callback = None,
                                 exchange_messages_callback = None,
                                 oi_callback = None,
-                                dpr_callback = None):
-        """ Start a websocket connection for getting live data """
+                                dpr_callback = None,
+                                dispatcher_workers = None,
+                                dispatcher_queue_size = 10000,
+                                dispatcher_overflow_policy = OverflowPolicy.Block,
+                                conflate_updates = False,
+                                journal_dir = None,
+                                journal_segment_size = 64 * 1024 * 1024,
+                                feed_format = FeedFormat.Dict,
+                                websocket_shards = None,
+                                shard_balance = ShardBalance.Count,
+                                subscription_batch_size = DEFAULT_BATCH_SIZE,
+                                subscription_debounce = 0):
+        """ Start a websocket connection for getting live data.
+            If dispatcher_workers is given, subscribe_callback is called from that many worker threads
+            instead of the websocket thread. Data of an instrument is always given to the same worker.
+            If conflate_updates is True, subscribe_callback is not used. Only the latest data of every
+            instrument is kept till it is read with get_conflated_updates().
+            If journal_dir is given, every frame received is recorded in rotating segment files of
+            journal_segment_size bytes in that directory, which can be replayed with replay_journal().
+            With feed_format FeedFormat.Struct, tick & depth data is given as the instrument's FeedSnapshot instead of
+            a new dict per frame. Fields are attributes (snapshot.ltp) or keys (snapshot['ltp']). It's the same object
+            for every frame of an instrument, updated in place, use snapshot.copy() to keep the values of a frame.
+            As the websocket thread changes it in place, it can't be used with dispatcher_workers or conflate_updates.
+            Keys of frames which aren't snapshot fields (eg. send times of the simulator) are not given.
+            With websocket_shards, subscriptions are spread over that many websocket connections, each read by its own
+            thread, balanced by instrument count or observed frame rate (shard_balance). Frames of all of them are
+            decoded & given to the callbacks one at a time, as if from one connection. When a connection is opened
+            again, subscriptions are rebalanced over the connected ones. Order updates come on the first connection.
+            subscribe() & unsubscribe() send only changes of subscriptions, subscription_batch_size instruments per
+            message. With subscription_debounce, changes are sent that many seconds after the first of them, so
+            an instrument subscribed & unsubscribed in between isn't sent at all.
+            Messages are queued & sent by a writer thread of each connection, so no call waits for the connection.
+        """
+        if not isinstance(feed_format, FeedFormat):
+            raise TypeError("Optional parameter feed_format not of type FeedFormat")
+        if(websocket_shards is not None and (not isinstance(websocket_shards, int) or websocket_shards < 1)):
+            raise TypeError("Optional parameter websocket_shards not a positive int")
+        if not isinstance(shard_balance, ShardBalance):
+            raise TypeError("Optional parameter shard_balance not of type ShardBalance")
+        if(conflate_updates == True and dispatcher_workers is not None):
+            raise ValueError("conflate_updates can't be used along with dispatcher_workers")
+        if(feed_format == FeedFormat.Struct and (conflate_updates == True or dispatcher_workers is not None)):
+            # other threads would read snapshots while the websocket thread changes them
+            raise ValueError("feed_format FeedFormat.Struct can't be used along with dispatcher_workers or conflate_updates")
         self.__on_open = socket_open_callback
         self.__on_disconnect = socket_close_callback
         self.__on_error = socket_error_callback
@@ -523,6 +953,18 @@ class AliceBlue:
         self.__exchange_messages_callback = exchange_messages_callback
         self.__oi_callback = oi_callback
         self.__dpr_callback = dpr_callback
+        self.__feed_structs = feed_format == FeedFormat.Struct
+        if(self.__dispatcher is not None):
+            self.__dispatcher.stop()
+            self.__dispatcher = None
+        if(dispatcher_workers is not None and subscribe_callback is not None):
+            self.__dispatcher = FeedDispatcher(subscribe_callback, dispatcher_workers,
+                                                dispatcher_queue_size, dispatcher_overflow_policy)
+            self.__dispatcher.start()
+        self.__conflator = Conflator() if(conflate_updates == True) else None
+        if(self.__journal is not None):
+            self.__journal.close()
+        self.__journal = None if(journal_dir is None) else TickJournal(journal_dir, journal_segment_size)
         
         # Create websocket session
         data = {"loginType" : "API"}
@@ -530,38 +972,232 @@ class AliceBlue:
 
         # Create websocket connection
         self.__websocket_connected = False
+        if(self.__shards is not None):
+            self.__shards.stop()
+            self.__shards = None
+        if(self.__outbound is not None):
+            self.__outbound.stop()
+            self.__outbound = None
+        if(self.__subscriptions is not None):
+            self.__subscriptions.stop()
+        # Subscriptions made before are sent when the connection opens
+        subscriptions = SubscriptionManager(self.__send_subscriptions, subscription_batch_size, subscription_debounce)
+        subscriptions.set_connected(False)
+        for live_feed_type in LiveFeedType:
+            subscriptions.subscribe([i for i, t in self.__subscribers.items() if t == live_feed_type], _subscribe_types[live_feed_type])
+        self.__subscriptions = subscriptions
+        if(websocket_shards is not None):
+            shards = ShardedFeed(self.__urls['ws'], websocket_shards,
+                                 _get_websocket_connect_payload(self.__username, self.__session_id),
+                                 self.__on_shard_data, self.__on_shard_open, self.__on_shard_close, self.__on_shard_error,
+                                 shard_balance, self.__ws_mutex, subscription_batch_size)
+            self.__websocket = shards.get_shard(0).websocket
+            self.__outbound = shards.get_shard(0).outbound
+            self.__shards = shards
+            # ShardedFeed keeps subscriptions of closed connections itself
+            subscriptions.set_connected(True)
+            shards.start()
+            return
         self.__websocket = websocket.WebSocketApp(self.__urls['ws'],
                                                     on_data=self.__on_data_callback,
                                                     on_error=self.__on_error_callback,
                                                     on_close=self.__on_close_callback,
                                                     on_open=self.__on_open_callback)
+        self.__outbound = OutboundQueue(self.__ws_write, self.__on_ws_sent)
+        self.__outbound.start()
         self.__ws_thread = threading.Thread(target=self.__ws_run_forever)
         self.__ws_thread.daemon = True
         self.__ws_thread.start()
 
-        # Send initial data 
-        data = {"susertoken": hashlib.sha256(hashlib.sha256(self.__session_id.encode('utf-8')).hexdigest().encode('utf-8')).hexdigest(),
-                "t": "c",
-                "actid": self.__username + "_API",
-                "uid": self.__username + "_API",
-                "source": "API"
-                }
-        self.__ws_send(data)
+    def get_journal(self):
+        """ Get the TickJournal recording websocket frames, None if websocket is not started with journal_dir """
+        return self.__journal
+
+    def replay_journal(self, path, subscribe_callback=None, order_update_callback=None, speed=None, feed_format=FeedFormat.Dict):
+        """ Replay frames recorded with journal_dir, decoded as live frames into tick & depth data given to
+            subscribe_callback, and order updates given to order_update_callback only if it's given.
+            Frames are decoded into their own snapshots, so feed snapshots, market state, order book & positions
+            of this object are not changed, and connection frames are skipped. Can't be used while websocket is started.
+            path is a journal directory or a segment file. With speed frames are paced by their receive times
+            (1.0 is wall-clock speed), as fast as possible if speed is None. Returns number of frames replayed.
+        """
+        if not isinstance(feed_format, FeedFormat):
+            raise TypeError("Optional parameter feed_format not of type FeedFormat")
+        if(self.__websocket is not None):
+            raise Exception("Can't replay a journal while websocket is started")
+        decoder = FeedDecoder(self.get_instrument_by_token)
+        structs = feed_format == FeedFormat.Struct
+        decoders = {"tk" : decoder.decode if(structs) else decoder.decode_tick,
+                    "tf" : decoder.decode if(structs) else decoder.decode_tick,
+                    "dk" : decoder.decode if(structs) else decoder.decode_depth,
+                    "df" : decoder.decode if(structs) else decoder.decode_depth}
+        def _on_frame(message):
+            data = codec.loads(message)
+            t = data.pop("t", None)
+            decode = decoders.get(t)
+            if(decode is not None):
+                if(subscribe_callback is not None):
+                    subscribe_callback(decode(data))
+            elif(t == "om" and order_update_callback is not None):
+                data["t"] = t
+                order_update_callback(data)
+        return replay_journal(path, _on_frame, speed)
+
+    def get_dispatcher_stats(self):
+        """ Get queue depth, lag & counters of the feed dispatcher, None if dispatcher is not used """
+        if(self.__dispatcher is None):
+            return None
+        return self.__dispatcher.get_stats()
+
+    def get_subscription_stats(self):
+        """ Get number of desired, sent, acknowledged & pending subscriptions and counts of subscription messages sent,
+            None if websocket is not started
+        """
+        if(self.__subscriptions is None):
+            return None
+        return self.__subscriptions.get_stats()
+
+    def get_outbound_stats(self):
+        """ Get counts of websocket messages queued, sent, dropped on disconnection & timed out and the
+            queue depth of the writer (of the first connection with websocket_shards), None if websocket is not started
+        """
+        if(self.__outbound is None):
+            return None
+        return self.__outbound.get_stats()
+
+    def get_shard_stats(self):
+        """ Get connection state, instruments, frames & frame rate of every websocket shard, None if websocket is not sharded """
+        if(self.__shards is None):
+            return None
+        return self.__shards.get_stats()
+
+    def get_conflated_updates(self, timeout=None):
+        """ Get latest data of every instrument updated since last call, in websocket conflate_updates mode.
+            Waits up to timeout seconds (forever if None) for at least one update.
+        """
+        if(self.__conflator is None):
+            raise Exception("Websocket is not started with conflate_updates=True")
+        return self.__conflator.drain(timeout)
+
+    def get_conflation_stats(self):
+        """ Get number of frames received, coalesced & drained in conflate_updates mode, None if not used """
+        if(self.__conflator is None):
+            return None
+        return self.__conflator.get_stats()
+
+    def order_book(self):
+        """ Get the local order book, created & seeded from get_order_history() & get_trade_book() on first call.
+            With websocket started, it's kept up to date by order updates, so orders can be read without REST calls.
+        """
+        if(self.__order_book is None):
+            order_book = OrderBook()
+            order_book.begin_load()
+            self.__order_book = order_book
+            if(self.__websocket_connected == True and self.__order_updates_subscribed == False):
+                self.__subscribe_order_updates()
+            try:
+                order_book.load(self.get_order_history(), self.get_trade_book())
+            except Exception:
+                self.__order_book = None
+                raise
+        return self.__order_book
+
+    def refresh_order_book(self):
+        """ Reload the local order book from get_order_history() & get_trade_book() """
+        order_book = self.order_book()
+        order_book.begin_load()
+        try:
+            orders = self.get_order_history()
+            trades = self.get_trade_book()
+        except Exception:
+            order_book.cancel_load()
+            raise
+        order_book.load(orders, trades)
+        return order_book
+
+    def live_positions(self, reconcile_interval=None, subscribe=False):
+        """ Get the local positions engine, created & loaded from get_netwise_positions() on first call.
+            With websocket started, fills of order updates are applied to it & MTM is updated by ticks.
+            If reconcile_interval is given, positions are fetched again every reconcile_interval seconds.
+            With subscribe, ticks of instruments of all positions are subscribed, so MTM follows their ltp.
+        """
+        if(self.__positions_engine is None):
+            engine = PositionsEngine()
+            engine.begin_load()
+            self.__positions_engine = engine
+            if(self.__websocket_connected == True and self.__order_updates_subscribed == False):
+                self.__subscribe_order_updates()
+            try:
+                self.__load_positions(engine)
+            except Exception:
+                self.__positions_engine = None
+                raise
+        self.__positions_subscribe = subscribe
+        self.__subscribe_positions()
+        if(self.__positions_reconciler is not None):
+            self.__positions_reconciler.set()
+            self.__positions_reconciler = None
+        if(reconcile_interval is not None):
+            self.__positions_reconciler = threading.Event()
+            thread = threading.Thread(target=self.__reconcile_positions_forever,
+                                      args=(reconcile_interval, self.__positions_reconciler))
+            thread.daemon = True
+            thread.start()
+        return self.__positions_engine
+
+    def reconcile_positions(self):
+        """ Reload the local positions engine from get_netwise_positions(), fills in get_trade_book() aren't applied again """
+        engine = self.live_positions() if(self.__positions_engine is None) else self.__positions_engine
+        engine.begin_load()
+        try:
+            self.__load_positions(engine)
+        except Exception:
+            engine.cancel_load()
+            raise
+        self.__subscribe_positions()
+        return engine
+
+    def __load_positions(self, engine):
+        """ Load engine from get_netwise_positions() with get_trade_book() having the same fills before & after it,
+            fetched again when a fill lands in between, so that fills held back are applied only if positions don't have them
+        """
+        trades = self.get_trade_book()
+        for attempt in range(1, LOAD_ATTEMPTS + 1):
+            positions = self.get_netwise_positions()
+            trades_after = self.get_trade_book()
+            if(get_fill_ids(trades_after) == get_fill_ids(trades)):
+                break
+            if(attempt == LOAD_ATTEMPTS):
+                logger.warning(f"Fills landed while positions were fetched {attempt} times, they may be counted twice till positions are reconciled")
+                break
+            trades = trades_after
+        engine.load(positions, trades)
+
+    def __reconcile_positions_forever(self, interval, stopped):
+        while(not stopped.wait(interval)):
+            try:
+                self.reconcile_positions()
+            except Exception as e:
+                logger.warning(f"Reconciling positions ended in exception, {e}")
+
+    def __subscribe_positions(self):
+        if(self.__positions_subscribe == False or self.__websocket is None):
+            return
+        instruments = []
+        for exchange, token in self.__positions_engine.get_tokens():
+            try:
+                instrument = self.get_instrument_by_token(exchange, token)
+            except Exception:
+                instrument = None
+            if(instrument is not None and instrument not in self.__subscribers):
+                instruments.append(instrument)
+        if(len(instruments) > 0):
+            self.subscribe(instruments, LiveFeedType.TICK_DATA)
 
     def get_profile(self):
         """ Get profile """
-        exch_dt = {"nse_cm"    : "NSE",
-                    "bse_cm"    : "BSE",
-                    "nse_fo"    : "NFO",
-                    "mcx_fo"    : "MCX",
-                    "cde_fo"    : "CDS",
-                    "mcx_sx"    : "BFO",
-                    "bcs_fo"    : "BCD",
-                    "nse_com"   : "NCO",
-                    "bse_com"   : "BCO"}
         profile = self.__api_call_helper('profile', Requests.GET)
-        x = profile['exchEnabled'].split("|")
-        self.__enabled_exchanges = [exch_dt[i] for i in x if i in exch_dt]
+        self.__enabled_exchanges = _get_enabled_exchanges(profile)
         return profile
 
     def get_balance(self):
@@ -600,25 +1236,6 @@ class AliceBlue:
         """ Get enabled exchanges """
         return self.__enabled_exchanges
 
-    def __get_product_type_str(self, product_type, exchange):
-        prod_type = None
-        if(product_type == ProductType.Intraday):
-            prod_type = 'MIS'
-        elif(product_type == ProductType.Delivery):
-            if(exchange == 'NFO') or (exchange == 'MCX') or (exchange == 'CDS'):
-                prod_type = 'NRML'
-            else:
-                prod_type = 'CNC'
-        return prod_type
-
-    def __get_complexity_str(self, order_type):
-        complexity = "Regular"
-        if(order_type == OrderType.BracketOrder):
-            complexity = 'BO'
-        elif(order_type == OrderType.AfterMarketOrder):
-            complexity = 'AMO'
-        return complexity
-
     def place_order(self, transaction_type, instrument, quantity, order_type,
                     product_type, price=0.0, trigger_price=None,
                     stop_loss=None, target=None, trailing_sl=None,
@@ -627,129 +1244,78 @@ class AliceBlue:
         """ placing an order, many fields are optional and are not required
             for all order types
         """
-        if transaction_type is None:
-            raise TypeError("Required parameter transaction_type not of type TransactionType")
-
-        if not isinstance(instrument, Instrument):
-            raise TypeError("Required parameter instrument not of type Instrument")
-
-        if not isinstance(quantity, int):
-            raise TypeError("Required parameter quantity not of type int")
-
-        if order_type is None:
-            raise TypeError("Required parameter order_type not of type OrderType")
-
-        if product_type is None:
-            raise TypeError("Required parameter product_type not of type ProductType")
-
-        if price is not None and not isinstance(price, float):
-            raise TypeError("Optional parameter price not of type float")
-
-        if trigger_price is not None and not isinstance(trigger_price, float):
-            raise TypeError("Optional parameter trigger_price not of type float")
-
-        prod_type = self.__get_product_type_str(product_type, instrument.exchange)
-        complexity = self.__get_complexity_str(order_type)
-        # construct order object after all required parameters are met
         self.__order_tag += 1
-        order = [{  "discqty"        : quantity if disclosed_quantity == None else disclosed_quantity,
-                    "exch"           : instrument.exchange,
-                    "transtype"      : transaction_type.value, 
-                    "ret"            : "DAY",
-                    "prctyp"         : order_type.value,
-                    "qty"            : quantity,
-                    "symbol_id"      : instrument.token,
-                    "trading_symbol" : instrument.symbol,
-                    "price"          : price,
-                    "trigPrice"      : trigger_price,
-                    "pCode"          : prod_type,
-                    "complexty"      : complexity,
-                    "orderTag"       : self.__order_tag if(order_tag == None) else order_tag
-                }]
-
-        if order_type is OrderType.BracketOrder:
-            if not isinstance(stop_loss, float):
-                raise TypeError("Required parameter stop_loss is not of type float")
-
-            if not isinstance(target, float):
-                raise TypeError("Required parameter target is not of type float")
-            
-            order["stopLoss"] = stop_loss
-            order["target"] = target
-
-            if trailing_sl is not None and not isinstance(trailing_sl, int):
-                raise TypeError("Optional parameter trailing_sl not of type int")
-            elif trailing_sl is not None:
-                order["trailing_stop_loss"] = trailing_sl
-
-        return self.__api_call_helper("placeOrder", Requests.POST, order)
+        order = _get_place_order_payload(transaction_type, instrument, quantity, order_type,
+                                            product_type, price, trigger_price, stop_loss, target,
+                                            trailing_sl, disclosed_quantity,
+                                            self.__order_tag if(order_tag == None) else order_tag)
+        return self.__api_call_helper("placeOrder", Requests.POST, [order])
+
+    def place_orders(self, orders, batch_size=None, concurrency=10):
+        """ Place a basket of orders, each order is a dict of place_order parameters.
+            All orders are validated before any is sent. Orders are sent batch_size orders per request
+            (all in one request if None) & requests are sent concurrently, concurrency at a time.
+            Returns BulkResult(item, response, error) of every order in the same order
+        """
+        payloads, self.__order_tag = _get_place_orders_payloads(orders, self.__order_tag)
+        def _send(batch):
+            return self.__api_call_helper("placeOrder", Requests.POST, [payloads[i] for i in batch])
+        return split_batch_results(orders, run_concurrently(_send, get_batches(len(payloads), batch_size), concurrency))
 
     def modify_order(self, transaction_type, instrument, product_type, order_id, order_type, quantity, price=0.0,
                      trigger_price=0.0):
         """ modify an order, transaction_type, instrument, product_type, order_id, order_type & quantity is required, 
             rest are optional, use only when when you want to change that attribute.
         """
-        if not isinstance(instrument, Instrument):
-            raise TypeError("Required parameter instrument not of type Instrument")
-
-        if not isinstance(order_id, str):
-            raise TypeError("Required parameter order_id not of type str")
-
-        if not isinstance(quantity, int):
-            raise TypeError("Optional parameter quantity not of type int")
-
-        if type(order_type) is not OrderType:
-            raise TypeError("Optional parameter order_type not of type OrderType")
-
-        if product_type is None:
-            raise TypeError("Required parameter product_type not of type ProductType")
-
-        if price is not None and not isinstance(price, float):
-            raise TypeError("Optional parameter price not of type float")
-
-        if trigger_price is not None and not isinstance(trigger_price, float):
-            raise TypeError("Optional parameter trigger_price not of type float")
-
-        prod_type = self.__get_product_type_str(product_type, instrument.exchange)
-        # construct order object with order id
-        order = {   "exch"           : instrument.exchange,
-                    "nestOrderNumber": order_id,
-                    "transtype"      : transaction_type.value, 
-                    "prctyp"         : order_type.value,
-                    "qty"            : quantity,
-                    "price"          : price,
-                    "trigPrice"      : trigger_price,
-                    "pCode"          : prod_type
-                }
+        order = _get_modify_order_payload(transaction_type, instrument, product_type, order_id,
+                                            order_type, quantity, price, trigger_price)
         return self.__api_call_helper('modifyOrder', Requests.POST, order)
 
     def cancel_order(self, order_id, leg_order_id=None):
         """ Cancel single order """
-        if(leg_order_id == None):
-            return self.__api_call_helper('cancelOrder', Requests.POST, {'nestOrderNumber': order_id})
-        else:
-            return self.__api_call_helper('exitBracketOrder', Requests.POST, {"nestOrderNumber" : order_id, "symbolOrderId" : leg_order_id, "status" : "open"})
+        name, data = _get_cancel_order_request(order_id, leg_order_id)
+        return self.__api_call_helper(name, Requests.POST, data)
 
     def square_off(self, instrument, quantity, product_type):
         """ Square Off positions """
-        if not isinstance(instrument, Instrument):
-            raise TypeError("Required parameter instrument not of type Instrument")
-
-        if not isinstance(quantity, int):
-            raise TypeError("Required parameter quantity not of type int")
-
-        if product_type is None:
-            raise TypeError("Required parameter product_type not of type ProductType")
-
-        prod_type = self.__get_product_type_str(product_type, instrument.exchange)
-        order = {   "exchSeg"   :   instrument.exchange,
-                    "pCode"     :   prod_type,
-                    "netQty"    :   quantity,
-                    "tockenNo"  :   instrument.token,
-                    "symbol"    :   instrument.symbol
-                }
+        order = _get_square_off_payload(instrument, quantity, product_type)
         return self.__api_call_helper('sqrOfPosition', Requests.POST, order)
         
+    def modify_orders(self, orders, concurrency=10):
+        """ Modify many orders, each order is a dict of modify_order parameters. All orders are validated before any is sent.
+            Returns BulkResult(item, response, error) of every order in the same order
+        """
+        payloads = _get_modify_orders_payloads(orders)
+        def _send(n):
+            return self.__api_call_helper('modifyOrder', Requests.POST, payloads[n])
+        results = run_concurrently(_send, list(range(len(orders))), concurrency)
+        return [r._replace(item=orders[r.item]) for r in results]
+
+    def cancel_orders(self, order_ids=None, filter=None, concurrency=10):
+        """ Cancel given order ids, or all open orders of order book if order_ids is None.
+            filter(order) can select open orders of order book to be cancelled.
+            Returns BulkResult(item, response, error) of every order, item is the order id or the order of order book
+        """
+        order_book = self.get_order_history() if(order_ids is None) else None
+        cancel_requests = _get_cancel_orders_requests(order_ids, order_book, filter)
+        def _send(r):
+            return self.__api_call_helper(r[1], Requests.POST, r[2])
+        results = run_concurrently(_send, cancel_requests, concurrency)
+        return [r._replace(item=r.item[0]) for r in results]
+
+    def square_off_positions(self, positions=None, filter=None, concurrency=10):
+        """ Square off all open netwise positions, or the given positions of positionBook.
+            filter(position) can select positions to be squared off.
+            Returns BulkResult(item, response, error) of every position squared off, item is the position
+        """
+        if(positions is None):
+            positions = self.get_netwise_positions()
+        payloads = _get_square_off_positions_payloads(positions, filter, self.get_instrument_by_token)
+        def _send(p):
+            return self.__api_call_helper('sqrOfPosition', Requests.POST, p[1])
+        results = run_concurrently(_send, payloads, concurrency)
+        return [r._replace(item=r.item[0]) for r in results]
+
     def subscribe_market_status_messages(self):
         """ Subscribe to market messages @TODO need to update after alice implements market status messages """
         pass
@@ -766,249 +1332,281 @@ class AliceBlue:
         """ Get stored exchange messages """
         return self.__exchange_messages
     
-    def subscribe(self, instrument, live_feed_type):
-        """ subscribe to the current feed of an instrument or multiple instruments """
+    def subscribe(self, instrument, live_feed_type, acknowledgment=False, timeout=None):
+        """ subscribe to the current feed of an instrument or multiple instruments.
+            Only instruments not already subscribed with live_feed_type are sent, in batched messages.
+            Returns right away. With acknowledgment, returns a concurrent.futures.Future which is done when the
+            server acknowledged all the instruments, or fails with TimeoutError if it didn't in timeout seconds.
+        """
         if(type(live_feed_type) is not LiveFeedType):
             raise TypeError("Required parameter live_feed_type is not of type LiveFeedType")
-        subscribe_string = ""
-        if (isinstance(instrument, list)):
-            for _instrument in instrument:
-                if not isinstance(_instrument, Instrument):
-                    raise TypeError("Required parameter instrument is not of type Instrument")
-                subscribe_string += f"#{_instrument.exchange}|{int(_instrument.token)}"
-                self.__subscribers[_instrument] = live_feed_type
-        else:
-            if not isinstance(instrument, Instrument):
+        instruments = instrument if(isinstance(instrument, list)) else [instrument]
+        for _instrument in instruments:
+            if not isinstance(_instrument, Instrument):
                 raise TypeError("Required parameter instrument is not of type Instrument")
-            subscribe_string = f"#{instrument.exchange}|{int(instrument.token)}"
-            self.__subscribers[instrument] = live_feed_type
-        if(live_feed_type == LiveFeedType.TICK_DATA):
-            tick_type = 't' 
-        elif(live_feed_type == LiveFeedType.DEPTH_DATA):
-            tick_type = 'd' 
-        subscribe_string = subscribe_string[1:] # remove the first '#' symbol
-        data = {'k' : subscribe_string, 't' : tick_type}
-        self.__ws_send(data)
+        if(acknowledgment == True and self.__subscriptions is None):
+            raise ValueError("acknowledgment of subscriptions needs websocket started with start_websocket()")
+        for _instrument in instruments:
+            self.__subscribers[_instrument] = live_feed_type
+            if(self.__market_state is not None):
+                self.__market_state.add(_instrument.exchange, _instrument.token, _instrument)
+        if(self.__subscriptions is not None):       # else subscribed when websocket is started
+            return self.__subscriptions.subscribe(instruments, _subscribe_types[live_feed_type], acknowledgment, timeout)
 
     def unsubscribe(self, instrument, live_feed_type):
         """ unsubscribe to the current feed of an instrument or multiple instruments """
         if(type(live_feed_type) is not LiveFeedType):
             raise TypeError("Required parameter live_feed_type is not of type LiveFeedType")
-        subscribe_string = ""
-        if (isinstance(instrument, list)):
-            for _instrument in instrument:
-                if not isinstance(_instrument, Instrument):
-                    raise TypeError("Required parameter instrument is not of type Instrument")
-                subscribe_string = f"#{_instrument.exchange}|{int(_instrument.token)}"
-                if(_instrument in self.__subscribers): del self.__subscribers[_instrument]
-        else:
-            if not isinstance(instrument, Instrument):
+        instruments = instrument if(isinstance(instrument, list)) else [instrument]
+        for _instrument in instruments:
+            if not isinstance(_instrument, Instrument):
                 raise TypeError("Required parameter instrument is not of type Instrument")
-            subscribe_string = f"#{instrument.exchange}|{int(instrument.token)}"
-            if(instrument in self.__subscribers): del self.__subscribers[instrument]
-        if(live_feed_type == LiveFeedType.TICK_DATA):
-            tick_type = 'u' 
-        elif(live_feed_type == LiveFeedType.DEPTH_DATA):
-            tick_type = 'ud' 
-        subscribe_string = subscribe_string[1:] # remove the first '#' symbol
-        data = {'k' : subscribe_string, 't' : tick_type}
-        self.__ws_send(data)
+        for _instrument in instruments:
+            if(_instrument in self.__subscribers): del self.__subscribers[_instrument]
+        if(self.__subscriptions is not None):
+            self.__subscriptions.unsubscribe(instruments)
+
+    def __send_subscriptions(self, message_type, instruments):
+        # called by SubscriptionManager with the changes to send
+        if(self.__shards is not None):
+            if(message_type in ('t', 'd')):
+                self.__shards.subscribe(instruments, message_type)
+            else:
+                self.__shards.unsubscribe(instruments, message_type)
+            return
+        self.__ws_send({'k' : _get_subscription_string(instruments), 't' : message_type})
 
     def get_all_subscriptions(self):
         """ get the all subscribed instruments """
         return self.__subscribers
-    
-    def __resubscribe(self):
-        tick = []
-        depth = []
-        for key, value in self.get_all_subscriptions().items():
-            if(value == LiveFeedType.TICK_DATA):
-                tick.append(key) 
-            elif(value == LiveFeedType.DEPTH_DATA):
-                depth.append(key) 
-        if(len(tick) > 0):
-            self.subscribe(tick, LiveFeedType.TICK_DATA)
-        if(len(depth) > 0):
-            self.subscribe(depth, LiveFeedType.DEPTH_DATA)
+
+    def get_feed_snapshot(self, instrument):
+        """ get the latest merged tick & depth data of an instrument, None if no data received yet """
+        if not isinstance(instrument, Instrument):
+            raise TypeError("Required parameter instrument is not of type Instrument")
+        return self.__feed_decoder.get_snapshot(instrument.exchange, instrument.token)
+
+    def metrics(self):
+        """ Get the Metrics of this object, created on first call, which turns on latency instrumentation of
+            websocket frames (on_data, extract, callback, exchange time to receive & callback), ws sends & REST calls.
+            Use metrics().snapshot() to read it & metrics().add_exporter() to export it, eg. PrometheusFileExporter.
+        """
+        if(self.__metrics is None):
+            self.__metrics = Metrics()
+        return self.__metrics
+
+    def disable_metrics(self):
+        """ Turn off latency instrumentation, returns the Metrics collected so far, None if it was off """
+        metrics = self.__metrics
+        self.__metrics = None
+        self.__frame_received = None
+        if(metrics is not None):
+            metrics.stop_exporting()
+        return metrics
+
+    def market_state(self, capacity=1024):
+        """ get the columnar live market state of all subscribed instruments, needs numpy.
+            It is created on first call, capacity is the number of instruments preallocated.
+        """
+        if(self.__market_state is None):
+            market_state = MarketState(capacity)
+            for _instrument in self.__subscribers:
+                market_state.add(_instrument.exchange, _instrument.token, _instrument)
+            self.__feed_decoder.attach_market_state(market_state)
+            self.__market_state = market_state
+        return self.__market_state
 
     def get_instrument_by_symbol(self, exchange, symbol):
         """ get instrument by providing symbol """
-        # get instrument given exchange and symbol
-        exchange = exchange.upper()
-        # check if master contract exists
-        if exchange not in self.__master_contracts_by_symbol:
-            logger.warning(f"Cannot find exchange {exchange} in master contract. "
-                            "Please ensure if that exchange is enabled in your profile and downloaded the master contract for the same")
-            return None
-        master_contract = self.__master_contracts_by_symbol[exchange]
-        if symbol not in master_contract:
-            logger.warning(f"Cannot find symbol {symbol} in master contract {exchange}")
-            return None
-        return master_contract[symbol]
-    
+        return self.__master_contracts.get_instrument_by_symbol(exchange, symbol)
+
     def get_instrument_for_fno(self, symbol, expiry_date, is_fut=False, strike=None, is_CE = False, exchange = 'NFO'):
         """ get instrument for FNO """
-        res = self.search_instruments(exchange, symbol)
-        if(res == None):
-            return
-        matches = []
-        for i in res:
-            sp = i.name.split(' ')
-            if(sp[0] == symbol):
-                if(i.expiry == expiry_date):
-                    matches.append(i)
-        for i in matches:
-            if(is_fut == True):
-                if('FUT' in i.symbol):
-                    return i
-            else:
-                sp = i.name.split(' ')
-                if((sp[-1] == 'CE') or (sp[-1] == 'PE')):           # Only option scrips 
-                    if(float(sp[-2]) == float(strike)):
-                        if(is_CE == True):
-                            if(sp[-1] == 'CE'):
-                                return i
-                        else:
-                            if(sp[-1] == 'PE'):
-                                return i
-                            
-    def search_instruments(self, exchange, symbol):
-        """ Search instrument by symbol match """
-        # search instrument given exchange and symbol
-        exchange = exchange.upper()
-        matches = []
-        # check if master contract exists
-        if exchange not in self.__master_contracts_by_token:
-            logger.warning(f"Cannot find exchange {exchange} in master contract. "
-                "Please ensure if that exchange is enabled in your profile and downloaded the master contract for the same")
-            return None
-        master_contract = self.__master_contracts_by_token[exchange]
-        for contract in master_contract:
-            if (isinstance(symbol, list)):
-                for sym in symbol:
-                    if sym.lower() in master_contract[contract].symbol.split(' ')[0].lower():
-                        matches.append(master_contract[contract])
-            else:
-                if symbol.lower() in master_contract[contract].symbol.split(' ')[0].lower():
-                    matches.append(master_contract[contract])
-        return matches
+        return self.__master_contracts.get_instrument_for_fno(symbol, expiry_date, is_fut, strike, is_CE, exchange)
+
+    def get_option_chain(self, symbol, expiry_date, spot=None, strikes=None, exchange='NFO'):
+        """ Option chain of an underlying for an expiry as a list of OptionChainRow(strike, call, put) sorted by strike.
+            If spot & strikes are given, only that many strikes nearest to spot are returned
+        """
+        return self.__master_contracts.get_option_chain(symbol, expiry_date, spot, strikes, exchange)
+
+    def get_expiries(self, symbol, exchange='NFO'):
+        """ Sorted expiry dates of futures & options of an underlying """
+        return self.__master_contracts.get_expiries(symbol, exchange)
+
+    def search_instruments(self, exchange, symbol, match=SearchMatch.Contains):
+        """ Search instrument by symbol match, symbol can be a list of symbols. Substring matches take a few milliseconds
+            on large exchanges unless the trigram index is built, see MasterContracts.search_instruments()
+        """
+        return self.__master_contracts.search_instruments(exchange, symbol, match)
 
     def get_instrument_by_token(self, exchange, token):
         """ Get instrument by providing token """
-        # get instrument given exchange and token
-        exchange = exchange.upper()
-        token = int(token)
-        # check if master contract exists
-        if exchange not in self.__master_contracts_by_symbol:
-            logger.warning(f"Cannot find exchange {exchange} in master contract. "
-                            "Please ensure if that exchange is enabled in your profile and downloaded the master contract for the same")
-            return None
-        master_contract = self.__master_contracts_by_token[exchange]
-        if token not in master_contract:
-            logger.warning(f"Cannot find symbol {exchange} {token} in master contract")
-            return None
-        return master_contract[token]
+        return self.__master_contracts.get_instrument_by_token(exchange, token)
 
-    def historical_data(self, instrument, ffrom, to, type):
-        """ Get Historical Data """
-        if not isinstance(instrument, Instrument):
-            raise TypeError("Required parameter instrument is not of type Instrument")
-        if not isinstance(ffrom, datetime.datetime):
-            raise TypeError("Required parameter 'ffrom' is not of type datetime")
-        if not isinstance(to, datetime.datetime):
-            raise TypeError("Required parameter 'to' is not of type datetime")
-        if not isinstance(type, HistoricalDataType):
-            raise TypeError("Required parameter 'type' is not of type HistoricalDataType")
-        data = {"token"     : instrument.token,
-                "resolution": type.value, 
-                "from"      : int(datetime.datetime.timestamp(ffrom) * 1000), 
-                "to"        : int(datetime.datetime.timestamp(to) * 1000),
-                "exchange"  : instrument.exchange}
-        return self.__api_call_helper('history', Requests.POST, data)
+    def historical_data(self, instrument, ffrom, to, type, output=HistoricalDataFormat.Dict):
+        """ Get Historical Data. With output HistoricalDataFormat.Numpy, bars are returned as a dict of numpy columns,
+            with HistoricalDataFormat.DataFrame as a pandas DataFrame
+        """
+        data = _get_historical_data_payload(instrument, ffrom, to, type)
+        _check_historical_data_format(instrument, output)
+        return _get_historical_data_result(self.__api_call_helper('history', Requests.POST, data), output)
+
+    def load_historical_data(self, instrument, ffrom, to, type, concurrency=10, chunk_days=None, use_cache=True,
+                             output=HistoricalDataFormat.Dict):
+        """ Get historical bars of an instrument or a list of instruments, raises if any chunk couldn't be downloaded.
+            The range is downloaded in chunks of chunk_days, concurrency chunks at a time across all instruments.
+            With use_cache, bars are kept on disk and only ranges not downloaded before are requested.
+            With output HistoricalDataFormat.Dict bars are a list of bar dicts (time, open, high, low, close & volume,
+            as in the "result" of historical_data()), not the whole response. For a list of instruments, a dict of
+            bars by instrument is returned.
+            With output HistoricalDataFormat.Numpy or DataFrame bars are numpy columns or a pandas DataFrame,
+            with HistoricalDataFormat.Panel bars of all instruments are aligned on time in 2-D numpy arrays.
+        """
+        _check_historical_data_format(instrument, output)
+        instruments, start, end, chunk_seconds = _get_historical_chunks_args(instrument, ffrom, to, type, chunk_days)
+        cache = self.__bar_cache if(use_cache == True) else None
+        chunks = get_chunks(cache, instruments, start, end, type.value, chunk_seconds)
+        def _fetch(chunk):
+            data = get_chunk_payload(chunk[0], chunk[1], chunk[2], type.value)
+            return get_chunk_bars(self.__api_call_helper('history', Requests.POST, data))
+        results = run_concurrently(_fetch, chunks, concurrency)
+        bars = store_chunks(cache, instruments, start, end, type.value, results)
+        return _get_historical_chunks_result(instrument, bars, results, output)
 
     def get_master_contract(self, exchange):
         """ Get master contract """
-        return self.__master_contracts_by_symbol[exchange]
+        return self.__master_contracts.get_master_contract(exchange)
+
+    def __load_master_contract(self, exchange):
+        """ Loader of lazy master contracts, INDICES are loaded with the first exchange as they add to other exchanges """
+        if(exchange != "INDICES"):
+            self.__master_contracts.ensure_loaded("INDICES")
+        if(exchange == "INDICES" or exchange in (e.upper() for e in self.__master_contract_exchanges)):
+            self.__get_master_contract(exchange)
 
     def __get_master_contract(self, exchange):
-        """ returns all the tradable contracts of an exchange
-            placed in an OrderedDict and the key is the token
+        """ Load all the tradable contracts of an exchange """
+        timing = {"download" : 0.0, "parse" : 0.0, "index" : 0.0}
+        start = time.perf_counter()
+        result = self.__fetch_master_contract(exchange)
+        timing["download"] = time.perf_counter() - start
+        if(isinstance(result, bytes)):
+            result, timing["parse"] = _parse_master_contract(exchange, result, self.__binary_master_contracts)
+        self.__index_master_contract(exchange, result, timing)
+        self.__master_contract_timings[exchange] = timing
+
+    def __get_master_contracts_parallel(self, exchanges):
+        """ Download master contracts of all exchanges concurrently, parse them in worker processes as they arrive
+            & index them in the given order, so that later exchanges take precedence as in serial loading
         """
+        exchanges = list(dict.fromkeys(exchanges))
+        timings = {e : {"download" : 0.0, "parse" : 0.0, "index" : 0.0} for e in exchanges}
+        results = {}
+        def _fetch(exchange):
+            start = time.perf_counter()
+            result = self.__fetch_master_contract(exchange)
+            timings[exchange]["download"] = time.perf_counter() - start
+            return result
+        with ThreadPoolExecutor(len(exchanges)) as downloads, _get_parse_executor(len(exchanges)) as parsers:
+            fetches = {downloads.submit(_fetch, e) : e for e in exchanges}
+            parses = {}
+            for f in as_completed(fetches):
+                e = fetches[f]
+                result = f.result()
+                if(isinstance(result, bytes)):
+                    parses[e] = (result, parsers.submit(_parse_master_contract, e, result, self.__binary_master_contracts, True))
+                else:
+                    results[e] = result
+            for e, (content, f) in parses.items():
+                try:
+                    results[e], timings[e]["parse"] = f.result()
+                    if(isinstance(results[e], dict)):
+                        start = time.perf_counter()
+                        results[e] = instruments_from_columns(results[e])
+                        timings[e]["parse"] += time.perf_counter() - start
+                except BrokenProcessPool:
+                    logger.warning(f"Worker process parsing master contracts of {e} failed, parsing in this process")
+                    results[e], timings[e]["parse"] = _parse_master_contract(e, content, self.__binary_master_contracts)
+        for e in exchanges:
+            self.__index_master_contract(e, results[e], timings[e])
+        self.__master_contract_timings.update(timings)
+
+    def __fetch_master_contract(self, exchange):
+        """ Master contract of an exchange from local copies or alice server, a BinaryMasterContract or unparsed bytes """
+        if(self.__binary_master_contracts == True):
+            contract = open_binary_master_contract(exchange)
+            if(contract is not None):
+                return contract
         # See if master contracts are present in local.
-        present = False
-        dr = tempfile.gettempdir()
-        tmp_file = os.path.join(dr, f"alice_blue_master_contract_{exchange}.json")
-        if(os.path.isfile(tmp_file) == True):
-            with open(tmp_file, 'r') as fo:
-                d = json.loads(fo.read())
-                if(datetime.datetime.now(pytz.timezone("Asia/Kolkata")).date() == datetime.datetime.strptime(d["contract_date"], "%d-%m-%Y").date()):
-                    logger.info(f'Took master contracts from local for exchange: {exchange}')
-                    body = d
-                    present = True
+        content = read_master_contract_content(exchange) if(self.__local_master_contracts == True) else None
         # if not download from alice server
-        if(present == False):
+        if(content is None):
             logger.info(f'Downloading master contracts for exchange: {exchange}')
-            body = self.__api_call_helper('master_contract', Requests.GET, params={'exchange': exchange})
+            content = self.__api_call_helper('master_contract', Requests.GET, params={'exchange': exchange}, raw=True)
             # Write to temp file
-            with open(tmp_file, 'w') as fo:
-                fo.write(json.dumps(body))
-        for exch in body:
-            if(exch != "contract_date"):
-                for scrip in body[exch]:
-                    # convert token
-                    token = int(scrip["token"])
-        
-                    # convert symbol to upper
-                    if("trading_symbol" in scrip):
-                        symbol = scrip["trading_symbol"]
-                    else:
-                        symbol = scrip["symbol"]
-        
-                    # convert expiry to none if it's non-existent
-                    if("expiry_date" in scrip):
-                        expiry = datetime.datetime.fromtimestamp(scrip['expiry_date']/1000, tz=pytz.utc).date()
-                    else:
-                        expiry = None
-        
-                    # convert lot size to int
-                    lot_size = None
-                    if("lot_size" in scrip):
-                        lot_size = scrip["lot_size"]
-                        
-                    # Name  
-                    name = None
-                    if("formatted_ins_name" in scrip):
-                        name = scrip["formatted_ins_name"]
-                    
-                    instrument = Instrument(exch, token, symbol, name, expiry, lot_size)
-                    if(exch not in self.__master_contracts_by_token):
-                        self.__master_contracts_by_token[exch] = {}
-                    if(exch not in self.__master_contracts_by_symbol):
-                        self.__master_contracts_by_symbol[exch] = {}
-                    self.__master_contracts_by_token[exch][token] = instrument
-                    self.__master_contracts_by_symbol[exch][symbol] = instrument
-
-    def __api_call_helper(self, name, http_method, data=None, params=None):
+            if(self.__local_master_contracts == True):
+                write_master_contract_content(exchange, content)
+        return content
+
+    def __index_master_contract(self, exchange, result, timing):
+        """ Add parsed master contract of an exchange to lookups """
+        start = time.perf_counter()
+        if(isinstance(result, str)):
+            result = BinaryMasterContract(result)
+        if(isinstance(result, BinaryMasterContract)):
+            self.__master_contracts.load_binary(result)
+        else:
+            self.__master_contracts.load_instruments(result)
+        timing["index"] = time.perf_counter() - start
+
+    def get_master_contract_timings(self):
+        """ Seconds taken to download (or read local copy), parse & index master contracts of every exchange """
+        return {e : dict(t) for e, t in self.__master_contract_timings.items()}
+
+    def __api_call_helper(self, name, http_method, data=None, params=None, raw=False):
         # helper formats the url and reads error codes nicely
         url = self.__urls[name]
         if params is not None:
             url = url.format(**params)
-        response = self.__api_call(url, http_method, data)
+        metrics = self.__metrics
+        if(metrics is None):
+            response = self.__api_call(url, http_method, data, name in _read_only_endpoints)
+        else:
+            # Latency of successful calls only, failures are counted in api_errors
+            start = time.perf_counter()
+            try:
+                response = self.__api_call(url, http_method, data, name in _read_only_endpoints)
+            except Exception:
+                metrics.increment("api_errors", label=name)
+                raise
+            if response.status_code == 200:
+                metrics.observe("api_call", time.perf_counter() - start, name)
+            else:
+                metrics.increment("api_errors", label=name)
         if response.status_code != 200:
             raise requests.HTTPError(response.text)
-        return response.json()
+        if(raw == True):
+            return response.content
+        return codec.loads(response.content)
 
-    def __api_call(self, url, http_method, data):
+    def __api_call(self, url, http_method, data, idempotent=False):
         # Update header with Session ID
         headers = { "Content-Type"  : "application/json",
                     "Authorization" : f"Bearer {self.__username} {self.__session_id}"}
+        # Payload is encoded here rather than with json= of requests, which always uses the stdlib encoder
+        body = None if(data is None) else codec.dumps_bytes(data)
         r = None
         if http_method is Requests.POST:
-            r = requests.post(url, json=data, headers=headers)
+            r = self.__http_session.post(url, data=body, headers=headers, idempotent=idempotent)
         elif http_method is Requests.DELETE:
-            r = requests.delete(url, headers=headers)
+            r = self.__http_session.delete(url, headers=headers, idempotent=idempotent)
         elif http_method is Requests.PUT:
-            r = requests.put(url, json=data, headers=headers)
+            r = self.__http_session.put(url, data=body, headers=headers, idempotent=idempotent)
         elif http_method is Requests.GET:
-            r = requests.get(url, headers=headers)
+            r = self.__http_session.get(url, headers=headers, idempotent=idempotent)
         return r
+
+    def warm_up(self, connections=2):
+        """ Open connections to alice blue servers before they are needed, eg. before market opens """
+        self.__http_session.warm_up([self.__urls["placeOrder"], self.__urls["master_contract"]], connections)
@@ -0,0 +1,591 @@
+import asyncio
+import logging
+import requests
+import time
+
+try:
+    import aiohttp
+except ImportError:            # aiohttp is an optional dependency, only needed for AsyncAliceBlue
+    aiohttp = None
+
+from . import codec
+from .alice_blue import (FeedFormat, HistoricalDataFormat, Instrument, LiveFeedType, Requests, _urls, _get_urls, _get_enabled_exchanges,
+                         _get_place_order_payload, _get_place_orders_payloads, _get_modify_order_payload,
+                         _get_modify_orders_payloads, _get_cancel_order_request, _get_cancel_orders_requests,
+                         _get_square_off_payload, _get_square_off_positions_payloads, _get_historical_data_payload,
+                         _get_websocket_connect_payload, _get_order_updates_payload,
+                         _get_historical_chunks_args, _get_historical_chunks_result, _check_historical_data_format,
+                         _get_historical_data_result)
+from .bulk import get_batches, run_concurrently_async, split_batch_results
+from .feed import FeedDecoder
+from .historical import BarCache, get_chunk_bars, get_chunk_payload, get_chunks, store_chunks
+from .master_contract import MasterContracts, read_master_contract_file, write_master_contract_file
+from .metrics import Metrics
+from .order_book import OrderBook
+from .positions import LOAD_ATTEMPTS, PositionsEngine, get_fill_ids
+from .search_index import SearchMatch
+from .subscriptions import get_subscription_frames
+
+logger = logging.getLogger(__name__)
+
+_http_methods = {   Requests.PUT    : "PUT",
+                    Requests.DELETE : "DELETE",
+                    Requests.GET    : "GET",
+                    Requests.POST   : "POST"}
+
+class AsyncAliceBlue:
+    """ asyncio version of AliceBlue. All REST calls and the websocket share one aiohttp connection pool.
+
+        alice = await AsyncAliceBlue.create(username, session_id)
+    """
+
+    def __init__(self, username, session_id, master_contracts_to_download = None,
+                    pool_size = 100, feed_queue_size = 10000, historical_cache_dir = None, host = None, urls = None,
+                    ngram_search_index = False):
+        """ Create object, nothing is fetched till connect() is awaited. ngram_search_index, host & urls are as in AliceBlue.
+            feed() holds at most feed_queue_size ticks, the oldest is dropped when it's full, so that a slow or
+            missing feed() reader never holds up order updates.
+        """
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for AsyncAliceBlue, install it with 'pip install aiohttp'")
+        self.__urls = _get_urls(host, urls)
+        # Local copies of master contracts are only of alice blue server
+        self.__local_master_contracts = (self.__urls["master_contract"] == _urls["master_contract"])
+        self.__username = username
+        self.__session_id = session_id
+        self.__master_contracts_to_download = master_contracts_to_download
+        self.__pool_size = pool_size
+        self.__feed_queue_size = feed_queue_size
+        self.__bar_cache = BarCache(historical_cache_dir)
+        self.__session = None
+        self.__enabled_exchanges = []
+        self.__order_tag = 1
+        self.__master_contracts = MasterContracts(ngram_index=ngram_search_index)
+        self.__feed_decoder = FeedDecoder(self.get_instrument_by_token)
+        self.__subscribers = {}
+        self.__websocket = None
+        self.__ws_task = None
+        self.__ws_connected = None
+        self.__ws_lock = None
+        self.__feed_queue = None
+        self.__feed_dropped = 0
+        self.__feed_structs = False
+        self.__metrics = None
+        self.__order_book = None
+        self.__positions_engine = None
+        self.__positions_task = None
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        """ Create object and connect """
+        alice = cls(*args, **kwargs)
+        await alice.connect()
+        return alice
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def connect(self):
+        """ Open connection pool, get enabled exchanges and master contracts """
+        headers = { "Content-Type"  : "application/json",
+                    "Authorization" : f"Bearer {self.__username} {self.__session_id}"}
+        self.__session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.__pool_size),
+                                                headers=headers, json_serialize=codec.dumps)
+        try:
+            await self.get_profile()
+        except Exception as e:
+            await self.close()
+            raise Exception(f"Couldn't get profile info with credentials provided '{e}'")
+        exchanges = ["INDICES"]
+        if(self.__master_contracts_to_download == None):
+            exchanges += self.__enabled_exchanges
+        else:
+            exchanges += list(self.__master_contracts_to_download)
+        # Download concurrently, parse in a thread so the event loop is not held up
+        bodies = await asyncio.gather(*[self.__get_master_contract(e) for e in exchanges])
+        await asyncio.get_running_loop().run_in_executor(None, self.__load_master_contracts, bodies)
+
+    async def close(self):
+        """ Stop websocket and close connection pool """
+        if(self.__positions_task is not None):
+            self.__positions_task.cancel()
+            self.__positions_task = None
+        if(self.__ws_task is not None):
+            self.__ws_task.cancel()
+            try:
+                await self.__ws_task
+            except asyncio.CancelledError:
+                pass
+            self.__ws_task = None
+        if(self.__session is not None):
+            await self.__session.close()
+            self.__session = None
+
+    async def __get_master_contract(self, exchange):
+        # See if master contracts are present in local, if not download from alice server
+        # Local files are read, parsed & written in a thread, they are several MB
+        loop = asyncio.get_running_loop()
+        body = None
+        if(self.__local_master_contracts == True):
+            body = await loop.run_in_executor(None, read_master_contract_file, exchange)
+        if(body is None):
+            logger.info(f'Downloading master contracts for exchange: {exchange}')
+            body = await self.__api_call_helper('master_contract', Requests.GET, params={'exchange': exchange})
+            if(self.__local_master_contracts == True):
+                await loop.run_in_executor(None, write_master_contract_file, exchange, body)
+        return body
+
+    def __load_master_contracts(self, bodies):
+        for body in bodies:
+            self.__master_contracts.load(body)
+
+    async def __api_call_helper(self, name, http_method, data=None, params=None):
+        # helper formats the url and reads error codes nicely
+        url = self.__urls[name]
+        if params is not None:
+            url = url.format(**params)
+        json_data = data if(http_method is Requests.POST or http_method is Requests.PUT) else None
+        metrics = self.__metrics
+        start = time.perf_counter() if(metrics is not None) else None
+        try:
+            async with self.__session.request(_http_methods[http_method], url, json=json_data) as response:
+                if response.status != 200:
+                    raise requests.HTTPError(await response.text())
+                result = await response.json(loads=codec.loads, content_type=None)
+        except Exception:
+            if(metrics is not None):
+                metrics.increment("api_errors", label=name)
+            raise
+        # Latency of successful calls only, as in AliceBlue
+        if(metrics is not None):
+            metrics.observe("api_call", time.perf_counter() - start, name)
+        return result
+
+    def metrics(self):
+        """ Get the Metrics of this object, created on first call, which turns on latency instrumentation
+            of websocket frames (on_data) & REST calls (api_call by endpoint)
+        """
+        if(self.__metrics is None):
+            self.__metrics = Metrics()
+        return self.__metrics
+
+    def disable_metrics(self):
+        """ Turn off latency instrumentation, returns the Metrics collected so far, None if it was off """
+        metrics = self.__metrics
+        self.__metrics = None
+        if(metrics is not None):
+            metrics.stop_exporting()
+        return metrics
+
+    async def get_profile(self):
+        """ Get profile """
+        profile = await self.__api_call_helper('profile', Requests.GET)
+        self.__enabled_exchanges = _get_enabled_exchanges(profile)
+        return profile
+
+    async def get_balance(self):
+        """ Get balance/margins """
+        return await self.__api_call_helper('getRmsLimits', Requests.GET)
+
+    async def get_daywise_positions(self):
+        """ Get daywise positions """
+        return await self.__api_call_helper('positions', Requests.POST, {"ret" : "DAY"})
+
+    async def get_netwise_positions(self):
+        """ Get netwise positions """
+        return await self.__api_call_helper('positions', Requests.POST, {"ret" : "NET"})
+
+    async def get_holding_positions(self):
+        """ Get holdings positions """
+        return await self.__api_call_helper('holdings', Requests.GET)
+
+    async def get_order_history(self, order_id=None):
+        """ Get order history """
+        if(order_id == None):
+            return await self.__api_call_helper('fetchOrder', Requests.GET)
+        else:
+            return await self.__api_call_helper('orderHistory', Requests.POST, {'nestOrderNumber': order_id})
+
+    async def get_scrip_info(self, instrument):
+        """ Get scrip information """
+        data = {'exch': instrument.exchange, 'symbol': instrument.token}
+        return await self.__api_call_helper('scripDetails', Requests.POST, data)
+
+    async def get_trade_book(self):
+        """ get all trades """
+        return await self.__api_call_helper('fetchTrade', Requests.GET)
+
+    def get_exchanges(self):
+        """ Get enabled exchanges """
+        return self.__enabled_exchanges
+
+    async def place_order(self, transaction_type, instrument, quantity, order_type,
+                            product_type, price=0.0, trigger_price=None,
+                            stop_loss=None, target=None, trailing_sl=None,
+                            disclosed_quantity = None,
+                            order_tag = None):
+        """ placing an order, many fields are optional and are not required
+            for all order types
+        """
+        self.__order_tag += 1
+        order = _get_place_order_payload(transaction_type, instrument, quantity, order_type,
+                                            product_type, price, trigger_price, stop_loss, target,
+                                            trailing_sl, disclosed_quantity,
+                                            self.__order_tag if(order_tag == None) else order_tag)
+        return await self.__api_call_helper("placeOrder", Requests.POST, [order])
+
+    async def place_orders(self, orders, batch_size=None, concurrency=10):
+        """ Place a basket of orders, each order is a dict of place_order parameters.
+            All orders are validated before any is sent. Orders are sent batch_size orders per request
+            (all in one request if None) & requests are sent concurrently, concurrency at a time.
+            Returns BulkResult(item, response, error) of every order in the same order
+        """
+        payloads, self.__order_tag = _get_place_orders_payloads(orders, self.__order_tag)
+        async def _send(batch):
+            return await self.__api_call_helper("placeOrder", Requests.POST, [payloads[i] for i in batch])
+        return split_batch_results(orders, await run_concurrently_async(_send, get_batches(len(payloads), batch_size), concurrency))
+
+    async def modify_order(self, transaction_type, instrument, product_type, order_id, order_type, quantity, price=0.0,
+                            trigger_price=0.0):
+        """ modify an order, transaction_type, instrument, product_type, order_id, order_type & quantity is required,
+            rest are optional, use only when when you want to change that attribute.
+        """
+        order = _get_modify_order_payload(transaction_type, instrument, product_type, order_id,
+                                            order_type, quantity, price, trigger_price)
+        return await self.__api_call_helper('modifyOrder', Requests.POST, order)
+
+    async def cancel_order(self, order_id, leg_order_id=None):
+        """ Cancel single order """
+        name, data = _get_cancel_order_request(order_id, leg_order_id)
+        return await self.__api_call_helper(name, Requests.POST, data)
+
+    async def square_off(self, instrument, quantity, product_type):
+        """ Square Off positions """
+        order = _get_square_off_payload(instrument, quantity, product_type)
+        return await self.__api_call_helper('sqrOfPosition', Requests.POST, order)
+
+    async def modify_orders(self, orders, concurrency=10):
+        """ Modify many orders, each order is a dict of modify_order parameters. All orders are validated before any is sent.
+            Returns BulkResult(item, response, error) of every order in the same order
+        """
+        payloads = _get_modify_orders_payloads(orders)
+        async def _send(n):
+            return await self.__api_call_helper('modifyOrder', Requests.POST, payloads[n])
+        results = await run_concurrently_async(_send, list(range(len(orders))), concurrency)
+        return [r._replace(item=orders[r.item]) for r in results]
+
+    async def cancel_orders(self, order_ids=None, filter=None, concurrency=10):
+        """ Cancel given order ids, or all open orders of order book if order_ids is None.
+            filter(order) can select open orders of order book to be cancelled.
+            Returns BulkResult(item, response, error) of every order, item is the order id or the order of order book
+        """
+        order_book = await self.get_order_history() if(order_ids is None) else None
+        cancel_requests = _get_cancel_orders_requests(order_ids, order_book, filter)
+        async def _send(r):
+            return await self.__api_call_helper(r[1], Requests.POST, r[2])
+        results = await run_concurrently_async(_send, cancel_requests, concurrency)
+        return [r._replace(item=r.item[0]) for r in results]
+
+    async def square_off_positions(self, positions=None, filter=None, concurrency=10):
+        """ Square off all open netwise positions, or the given positions of positionBook.
+            filter(position) can select positions to be squared off.
+            Returns BulkResult(item, response, error) of every position squared off, item is the position
+        """
+        if(positions is None):
+            positions = await self.get_netwise_positions()
+        payloads = _get_square_off_positions_payloads(positions, filter, self.get_instrument_by_token)
+        async def _send(p):
+            return await self.__api_call_helper('sqrOfPosition', Requests.POST, p[1])
+        results = await run_concurrently_async(_send, payloads, concurrency)
+        return [r._replace(item=r.item[0]) for r in results]
+
+    async def historical_data(self, instrument, ffrom, to, type, output=HistoricalDataFormat.Dict):
+        """ Get Historical Data, as a dict of numpy columns or a pandas DataFrame with output """
+        data = _get_historical_data_payload(instrument, ffrom, to, type)
+        _check_historical_data_format(instrument, output)
+        return _get_historical_data_result(await self.__api_call_helper('history', Requests.POST, data), output)
+
+    async def load_historical_data(self, instrument, ffrom, to, type, concurrency=10, chunk_days=None, use_cache=True,
+                                   output=HistoricalDataFormat.Dict):
+        """ Get historical bars of an instrument or a list of instruments, downloaded in chunks & cached on disk.
+            Same as AliceBlue.load_historical_data, cache files are read & written in a thread.
+        """
+        _check_historical_data_format(instrument, output)
+        instruments, start, end, chunk_seconds = _get_historical_chunks_args(instrument, ffrom, to, type, chunk_days)
+        cache = self.__bar_cache if(use_cache == True) else None
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor(None, get_chunks, cache, instruments, start, end, type.value, chunk_seconds)
+        async def _fetch(chunk):
+            data = get_chunk_payload(chunk[0], chunk[1], chunk[2], type.value)
+            return get_chunk_bars(await self.__api_call_helper('history', Requests.POST, data))
+        results = await run_concurrently_async(_fetch, chunks, concurrency)
+        bars = await loop.run_in_executor(None, store_chunks, cache, instruments, start, end, type.value, results)
+        return _get_historical_chunks_result(instrument, bars, results, output)
+
+    def get_master_contract(self, exchange):
+        """ Get master contract """
+        return self.__master_contracts.get_master_contract(exchange)
+
+    def get_instrument_by_symbol(self, exchange, symbol):
+        """ get instrument by providing symbol """
+        return self.__master_contracts.get_instrument_by_symbol(exchange, symbol)
+
+    def get_instrument_for_fno(self, symbol, expiry_date, is_fut=False, strike=None, is_CE = False, exchange = 'NFO'):
+        """ get instrument for FNO """
+        return self.__master_contracts.get_instrument_for_fno(symbol, expiry_date, is_fut, strike, is_CE, exchange)
+
+    def get_option_chain(self, symbol, expiry_date, spot=None, strikes=None, exchange='NFO'):
+        """ Option chain of an underlying for an expiry as a list of OptionChainRow(strike, call, put) sorted by strike.
+            If spot & strikes are given, only that many strikes nearest to spot are returned
+        """
+        return self.__master_contracts.get_option_chain(symbol, expiry_date, spot, strikes, exchange)
+
+    def get_expiries(self, symbol, exchange='NFO'):
+        """ Sorted expiry dates of futures & options of an underlying """
+        return self.__master_contracts.get_expiries(symbol, exchange)
+
+    def search_instruments(self, exchange, symbol, match=SearchMatch.Contains):
+        """ Search instrument by symbol match, symbol can be a list of symbols. Substring matches take a few milliseconds
+            on large exchanges unless the trigram index is built, see MasterContracts.search_instruments()
+        """
+        return self.__master_contracts.search_instruments(exchange, symbol, match)
+
+    def get_instrument_by_token(self, exchange, token):
+        """ Get instrument by providing token """
+        return self.__master_contracts.get_instrument_by_token(exchange, token)
+
+    async def start_websocket(self, feed_format=FeedFormat.Dict):
+        """ Start a websocket connection for getting live data, read the data with feed().
+            With feed_format FeedFormat.Struct, feed() gives the instrument's FeedSnapshot, see AliceBlue.start_websocket()
+        """
+        if not isinstance(feed_format, FeedFormat):
+            raise TypeError("Optional parameter feed_format not of type FeedFormat")
+        self.__feed_structs = feed_format == FeedFormat.Struct
+        await self.__api_call_helper('createWsSession', Requests.POST, {"loginType" : "API"})
+        self.__ws_connected = asyncio.Event()
+        self.__ws_lock = asyncio.Lock()
+        self.__feed_queue = asyncio.Queue(self.__feed_queue_size)
+        self.__ws_task = asyncio.ensure_future(self.__ws_run_forever())
+
+    async def __ws_run_forever(self):
+        while True:
+            try:
+                async with self.__session.ws_connect(self.__urls['ws']) as ws:
+                    self.__websocket = ws
+                    await ws.send_str(codec.dumps(_get_websocket_connect_payload(self.__username, self.__session_id)))
+                    # subscribe() calls from now on send their own frames, those made before are sent here
+                    self.__ws_connected.set()
+                    if(self.__order_book is not None or self.__positions_engine is not None):
+                        await self.__ws_send(_get_order_updates_payload(self.__username))
+                    await self.__resubscribe()
+                    ping_task = asyncio.ensure_future(self.__ws_ping(ws))
+                    try:
+                        async for message in ws:
+                            if(message.type == aiohttp.WSMsgType.TEXT):
+                                await self.__on_data(message.data)
+                            elif(message.type == aiohttp.WSMsgType.ERROR):
+                                logger.warning(f"websocket error, {ws.exception()}")
+                                break
+                    finally:
+                        ping_task.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"websocket connection ended in exception, {e}")
+            finally:
+                self.__ws_connected.clear()
+                self.__websocket = None
+            await asyncio.sleep(0.1) # Sleep for 100ms between reconnection.
+
+    async def __ws_ping(self, ws):
+        while True:
+            await asyncio.sleep(3)
+            await ws.ping(b'{"t":"h"}')
+
+    async def __on_data(self, message):
+        metrics = self.__metrics
+        if(metrics is None):
+            await self.__on_message(message)
+            return
+        start = time.perf_counter()
+        await self.__on_message(message)
+        metrics.observe("on_data", time.perf_counter() - start)
+
+    async def __on_message(self, message):
+        data = codec.loads(message)
+        t = data.get("t")
+        if(t == "tk" or t == "tf"):         # tick data acknowledgment / feed
+            self.__put_feed(self.__feed_decoder.decode(data) if(self.__feed_structs == True) else self.__feed_decoder.decode_tick(data))
+        elif(t == "dk" or t == "df"):       # depth data acknowledgment / feed
+            self.__put_feed(self.__feed_decoder.decode(data) if(self.__feed_structs == True) else self.__feed_decoder.decode_depth(data))
+        elif(t == "om"):                    # order update
+            if(self.__order_book is not None):
+                self.__order_book.update(data)
+            if(self.__positions_engine is not None):
+                self.__positions_engine.apply_fill(data)
+
+    def __put_feed(self, data):
+        if(self.__positions_engine is not None and data["instrument"] is not None):
+            self.__positions_engine.update_ltp(data["instrument"].exchange, int(data["instrument"].token), data["ltp"])
+        # The websocket reader never waits for feed(), order updates would stop coming otherwise
+        if(self.__feed_queue.full()):
+            self.__feed_queue.get_nowait()
+            self.__feed_dropped += 1
+        self.__feed_queue.put_nowait(data)
+
+    def get_feed_stats(self):
+        """ Get the number of ticks waiting for feed() & dropped as feed() didn't keep up, None if websocket is not started """
+        if(self.__feed_queue is None):
+            return None
+        return {"queue_depth" : self.__feed_queue.qsize(), "dropped" : self.__feed_dropped}
+
+    async def feed(self):
+        """ async iterator of tick & depth data of subscribed instruments
+
+            async for tick in alice.feed():
+                print(tick['instrument'].symbol, tick['ltp'])
+        """
+        if(self.__feed_queue is None):
+            raise Exception("Websocket is not started, call start_websocket() first")
+        while True:
+            yield await self.__feed_queue.get()
+
+    async def order_book(self):
+        """ Get the local order book, created & seeded from get_order_history() & get_trade_book() on first call.
+            With websocket started, it's kept up to date by order updates. Wait for an order with
+            await order_book.wait_for_status_async(order_id)
+        """
+        if(self.__order_book is None):
+            order_book = OrderBook()
+            order_book.begin_load()
+            self.__order_book = order_book
+            if(self.__websocket is not None):
+                await self.__ws_send(_get_order_updates_payload(self.__username))
+            try:
+                order_book.load(await self.get_order_history(), await self.get_trade_book())
+            except Exception:
+                self.__order_book = None
+                raise
+        return self.__order_book
+
+    async def live_positions(self, reconcile_interval=None):
+        """ Get the local positions engine, created & loaded from get_netwise_positions() on first call.
+            With websocket started, fills of order updates are applied to it & MTM is updated by ticks.
+            If reconcile_interval is given, positions are fetched again every reconcile_interval seconds.
+        """
+        if(self.__positions_engine is None):
+            engine = PositionsEngine()
+            engine.begin_load()
+            self.__positions_engine = engine
+            if(self.__websocket is not None and self.__order_book is None):
+                await self.__ws_send(_get_order_updates_payload(self.__username))
+            try:
+                await self.__load_positions(engine)
+            except Exception:
+                self.__positions_engine = None
+                raise
+        if(self.__positions_task is not None):
+            self.__positions_task.cancel()
+            self.__positions_task = None
+        if(reconcile_interval is not None):
+            self.__positions_task = asyncio.ensure_future(self.__reconcile_positions_forever(reconcile_interval))
+        return self.__positions_engine
+
+    async def reconcile_positions(self):
+        """ Reload the local positions engine from get_netwise_positions(), fills in get_trade_book() aren't applied again """
+        engine = await self.live_positions() if(self.__positions_engine is None) else self.__positions_engine
+        engine.begin_load()
+        try:
+            await self.__load_positions(engine)
+        except Exception:
+            engine.cancel_load()
+            raise
+        return engine
+
+    async def __load_positions(self, engine):
+        """ Load engine from get_netwise_positions() with get_trade_book() having the same fills before & after it,
+            fetched again when a fill lands in between, so that fills held back are applied only if positions don't have them
+        """
+        trades = await self.get_trade_book()
+        for attempt in range(1, LOAD_ATTEMPTS + 1):
+            positions = await self.get_netwise_positions()
+            trades_after = await self.get_trade_book()
+            if(get_fill_ids(trades_after) == get_fill_ids(trades)):
+                break
+            if(attempt == LOAD_ATTEMPTS):
+                logger.warning(f"Fills landed while positions were fetched {attempt} times, they may be counted twice till positions are reconciled")
+                break
+            trades = trades_after
+        engine.load(positions, trades)
+
+    async def __reconcile_positions_forever(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reconcile_positions()
+            except Exception as e:
+                logger.warning(f"Reconciling positions ended in exception, {e}")
+
+    async def __ws_send(self, data):
+        # Not sent if websocket is not connected, everything is sent again on connection
+        if(self.__ws_connected is None or not self.__ws_connected.is_set()):
+            return
+        async with self.__ws_lock:
+            websocket = self.__websocket
+            if(websocket is None):
+                return
+            try:
+                await websocket.send_str(codec.dumps(data))
+            except Exception as e:      # closed in between
+                logger.warning(f"Couldn't send to websocket, {e}")
+
+    async def subscribe(self, instrument, live_feed_type):
+        """ subscribe to the current feed of an instrument or multiple instruments.
+            Before start_websocket() or while reconnecting, it's sent when the websocket connects.
+        """
+        if(type(live_feed_type) is not LiveFeedType):
+            raise TypeError("Required parameter live_feed_type is not of type LiveFeedType")
+        instruments = instrument if isinstance(instrument, list) else [instrument]
+        for _instrument in instruments:
+            if not isinstance(_instrument, Instrument):
+                raise TypeError("Required parameter instrument is not of type Instrument")
+        for _instrument in instruments:
+            self.__subscribers[_instrument] = live_feed_type
+        tick_type = 't' if(live_feed_type == LiveFeedType.TICK_DATA) else 'd'
+        for frame in get_subscription_frames(instruments, tick_type):
+            await self.__ws_send(frame)
+
+    async def unsubscribe(self, instrument, live_feed_type):
+        """ unsubscribe to the current feed of an instrument or multiple instruments """
+        if(type(live_feed_type) is not LiveFeedType):
+            raise TypeError("Required parameter live_feed_type is not of type LiveFeedType")
+        instruments = instrument if isinstance(instrument, list) else [instrument]
+        for _instrument in instruments:
+            if not isinstance(_instrument, Instrument):
+                raise TypeError("Required parameter instrument is not of type Instrument")
+        for _instrument in instruments:
+            if(_instrument in self.__subscribers): del self.__subscribers[_instrument]
+        tick_type = 'u' if(live_feed_type == LiveFeedType.TICK_DATA) else 'ud'
+        for frame in get_subscription_frames(instruments, tick_type):
+            await self.__ws_send(frame)
+
+    def get_all_subscriptions(self):
+        """ get the all subscribed instruments """
+        return self.__subscribers
+
+    def get_feed_snapshot(self, instrument):
+        """ get the latest merged tick & depth data of an instrument, None if no data received yet """
+        if not isinstance(instrument, Instrument):
+            raise TypeError("Required parameter instrument is not of type Instrument")
+        return self.__feed_decoder.get_snapshot(instrument.exchange, instrument.token)
+
+    async def __resubscribe(self):
+        # Called from websocket task right after connecting, subscriptions made before are sent
+        for live_feed_type, tick_type in ((LiveFeedType.TICK_DATA, 't'), (LiveFeedType.DEPTH_DATA, 'd')):
+            instruments = [i for i, v in self.__subscribers.items() if v == live_feed_type]
+            for frame in get_subscription_frames(instruments, tick_type):
+                await self.__ws_send(frame)
@@ -0,0 +1,58 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+
+# Result of one item of a bulk call, error is None if the item succeeded
+BulkResult = namedtuple('BulkResult', ['item', 'response', 'error'])
+
+def get_bulk_result(item, response=None, error=None):
+    """ BulkResult of an item, a response with stat other than Ok is a failure """
+    if(error is None and isinstance(response, dict) and "stat" in response and str(response["stat"]).lower() != "ok"):
+        error = Exception(response.get("emsg") or str(response))
+    return BulkResult(item, response, error)
+
+def run_concurrently(fn, items, concurrency):
+    """ Call fn for every item with at most concurrency calls at a time, BulkResult of each item in the same order """
+    def _call(item):
+        try:
+            return get_bulk_result(item, fn(item))
+        except Exception as e:
+            return get_bulk_result(item, error=e)
+    if(len(items) <= 1 or concurrency <= 1):
+        return [_call(item) for item in items]
+    with ThreadPoolExecutor(min(concurrency, len(items))) as executor:
+        return list(executor.map(_call, items))
+
+async def run_concurrently_async(fn, items, concurrency):
+    """ Await fn for every item with at most concurrency calls at a time, BulkResult of each item in the same order """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    async def _call(item):
+        async with semaphore:
+            try:
+                return get_bulk_result(item, await fn(item))
+            except Exception as e:
+                return get_bulk_result(item, error=e)
+    return list(await asyncio.gather(*[_call(item) for item in items]))
+
+def get_batches(count, batch_size):
+    """ Indexes of count items split into batches of batch_size, a single batch if batch_size is None """
+    batch_size = count if(batch_size is None) else batch_size
+    if(not isinstance(batch_size, int) or batch_size < 1):
+        raise TypeError("Optional parameter batch_size not of type positive int")
+    return [list(range(i, min(i + batch_size, count))) for i in range(0, count, batch_size)]
+
+def split_batch_results(items, batch_results):
+    """ BulkResult of every item from BulkResult of the batches they were sent in.
+        The response of a batch is a list with one response per item, in the same order
+    """
+    results = [None] * len(items)
+    for batch in batch_results:
+        for k, i in enumerate(batch.item):
+            if(batch.error is not None):
+                results[i] = BulkResult(items[i], None, batch.error)
+            elif(isinstance(batch.response, list) and k < len(batch.response)):
+                results[i] = get_bulk_result(items[i], batch.response[k])
+            else:
+                # Not sent again, it may have been placed
+                results[i] = BulkResult(items[i], batch.response, Exception("No response for this order in response of its batch"))
+    return results
@@ -0,0 +1,77 @@
+""" JSON encoding & decoding of websocket frames, REST payloads & responses and master contract files.
+    orjson or msgspec is used if installed (pip install orjson), else the standard library json.
+    Callers use codec.loads / codec.dumps through this module, so set_codec() takes effect everywhere.
+"""
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:             # orjson is an optional dependency, only for faster JSON
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:             # msgspec is an optional dependency, only for faster JSON
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+# Codec names in order of preference
+CODECS = ("orjson", "msgspec", "json")
+
+def _json_dumps_bytes(obj):
+    return json.dumps(obj).encode()
+
+def _orjson_default(obj):
+    # namedtuples (eg. Instrument) are lists in stdlib json, orjson doesn't serialize them by itself
+    if(isinstance(obj, tuple)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+if(orjson is not None):
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+    def _orjson_dumps_bytes(obj):
+        return orjson.dumps(obj, default=_orjson_default, option=_ORJSON_OPTIONS)
+
+    def _orjson_dumps(obj):
+        return orjson.dumps(obj, default=_orjson_default, option=_ORJSON_OPTIONS).decode()
+
+if(msgspec is not None):
+    _msgspec_encoder = msgspec.json.Encoder()
+    _msgspec_decoder = msgspec.json.Decoder()
+    def _msgspec_dumps(obj):
+        return _msgspec_encoder.encode(obj).decode()
+
+def get_available_codecs():
+    """ Names of the codecs which can be used here, in order of preference """
+    return [name for name, module in zip(CODECS, (orjson, msgspec, json)) if module is not None]
+
+def _get_functions(name):
+    """ (loads, dumps, dumps_bytes) of a codec """
+    if(name == "orjson"):
+        return orjson.loads, _orjson_dumps, _orjson_dumps_bytes
+    if(name == "msgspec"):
+        return _msgspec_decoder.decode, _msgspec_dumps, _msgspec_encoder.encode
+    return json.loads, json.dumps, _json_dumps_bytes
+
+def set_codec(name=None):
+    """ Use codec of name ('orjson', 'msgspec' or 'json'), the fastest installed one if name is None """
+    global loads, dumps, dumps_bytes, codec_name
+    if(name is None):
+        name = get_available_codecs()[0]
+    if(name not in CODECS):
+        raise ValueError(f"Unknown JSON codec {name}, use one of {CODECS}")
+    if(name not in get_available_codecs()):
+        raise ImportError(f"JSON codec {name} is not installed, run 'pip install {name}'")
+    loads, dumps, dumps_bytes = _get_functions(name)
+    codec_name = name
+    logger.debug(f"Using JSON codec {name}")
+
+def get_codec():
+    """ Name of the codec in use """
+    return codec_name
+
+# loads(str or bytes) -> object, dumps(object) -> str, dumps_bytes(object) -> bytes
+loads = dumps = dumps_bytes = codec_name = None
+set_codec()
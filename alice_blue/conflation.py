@@ -0,0 +1,61 @@
+from collections import OrderedDict
+import threading
+import time
+
+class Conflator:
+    """ Keeps only the latest pending data of every instrument till the consumer drains it.
+        Memory is bounded by the number of instruments, not by the message rate.
+    """
+
+    def __init__(self):
+        self.__condition = threading.Condition()
+        # instrument -> latest data, in the order instruments became dirty
+        self.__pending = OrderedDict()
+        self.__frames = 0
+        self.__coalesced = 0
+        self.__drained = 0
+        self.__drains = 0
+        self.__max_pending = 0
+
+    def put(self, key, data):
+        """ Store the latest data of an instrument, replacing its pending data if any """
+        with self.__condition:
+            self.__frames += 1
+            if(key in self.__pending):
+                self.__coalesced += 1
+                self.__pending[key] = data
+                return
+            self.__pending[key] = data
+            if(len(self.__pending) > self.__max_pending):
+                self.__max_pending = len(self.__pending)
+            self.__condition.notify_all()
+
+    def drain(self, timeout=None):
+        """ Get latest data of all dirty instruments and mark them clean.
+            Waits for at least one update, up to timeout seconds (forever if None). Returns a list.
+        """
+        deadline = None if(timeout is None) else time.monotonic() + timeout
+        with self.__condition:
+            while(len(self.__pending) == 0):
+                if(deadline is None):
+                    self.__condition.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if(remaining <= 0):
+                        return []
+                    self.__condition.wait(remaining)
+            updates = list(self.__pending.values())
+            self.__pending.clear()
+            self.__drained += len(updates)
+            self.__drains += 1
+            return updates
+
+    def get_stats(self):
+        """ Frames received, frames coalesced into a pending slot, updates drained and pending """
+        with self.__condition:
+            return {"frames"        : self.__frames,
+                    "coalesced"     : self.__coalesced,
+                    "drained"       : self.__drained,
+                    "drains"        : self.__drains,
+                    "pending"       : len(self.__pending),
+                    "max_pending"   : self.__max_pending}
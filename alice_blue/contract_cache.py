@@ -0,0 +1,271 @@
+from array import array
+from collections.abc import Mapping, ValuesView, ItemsView
+import bisect
+import datetime
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import pytz
+from . import codec
+from .master_contract import Instrument, parse_scrip
+
+logger = logging.getLogger(__name__)
+
+# File layout, native byte order (files are local to the machine)
+#   header      : magic, version, contract date ordinal, number of sections
+#   section[]   : exchange, count, number of symbols, offset of section data, blob length
+#   section data: tokens        int64[count]    in master contract order
+#                 expiries      int32[count]    date ordinal, 0 if none
+#                 offsets       uint32[count+1] record boundaries in blob
+#                 sorted tokens int64[count]
+#                 token index   uint32[count]   record of every sorted token
+#                 symbol index  uint32[symbols] records sorted by symbol
+#                 blob          utf-8 records "symbol \x1f name \x1f lot size as json"
+_MAGIC = b"ABMC"
+_VERSION = 1
+_HEADER = struct.Struct("=4sIII")
+_SECTION = struct.Struct("=16sIIQQ")
+_SEP = "\x1f"
+_NONE = "\x1e"
+
+def get_binary_master_contract_file(exchange):
+    """ Path of the binary copy of an exchange's master contract """
+    return os.path.join(tempfile.gettempdir(), f"alice_blue_master_contract_{exchange}_{sys.byteorder}.bin")
+
+def _align(n):
+    return (n + 7) & ~7
+
+def _build_section(exch, scrips):
+    # Same precedence as dicts in MasterContracts.load(), first position & last value of a token wins
+    records = []
+    position = {}
+    last_by_symbol = {}
+    for scrip in scrips:
+        instrument = parse_scrip(exch, scrip)
+        if(instrument.token in position):
+            records[position[instrument.token]] = instrument
+        else:
+            position[instrument.token] = len(records)
+            records.append(instrument)
+        last_by_symbol[instrument.symbol] = instrument.token
+    count = len(records)
+    tokens = array("q", (i.token for i in records))
+    expiries = array("i", ((i.expiry.toordinal() if i.expiry else 0) for i in records))
+    offsets = array("I", [0])
+    blob = []
+    length = 0
+    for i in records:
+        record = _SEP.join((i.symbol, _NONE if i.name is None else i.name, codec.dumps(i.lot_size))).encode("utf-8")
+        blob.append(record)
+        length += len(record)
+        offsets.append(length)
+    blob = b"".join(blob)
+    token_index = array("I", sorted(range(count), key=tokens.__getitem__))
+    sorted_tokens = array("q", (tokens[i] for i in token_index))
+    symbol_index = array("I", sorted((position[t] for s, t in last_by_symbol.items() if records[position[t]].symbol == s),
+                                     key=lambda i: records[i].symbol.encode("utf-8")))
+    data = b""
+    for part in (tokens, expiries, offsets, sorted_tokens, token_index, symbol_index):
+        part = part.tobytes()
+        data += part + b"\0" * (_align(len(part)) - len(part))
+    return count, len(symbol_index), data + blob, len(blob)
+
+def write_binary_master_contract(exchange, body):
+    """ Convert a master contract response to the binary format & store it, returns path of the file """
+    contract_date = datetime.datetime.strptime(body["contract_date"], "%d-%m-%Y").date()
+    sections = []
+    for exch in body:
+        if(exch != "contract_date"):
+            sections.append((exch,) + _build_section(exch, body[exch]))
+    offset = _align(_HEADER.size + _SECTION.size * len(sections))
+    table = _HEADER.pack(_MAGIC, _VERSION, contract_date.toordinal(), len(sections))
+    for exch, count, symbols, data, blob_length in sections:
+        table += _SECTION.pack(exch.encode("utf-8"), count, symbols, offset, blob_length)
+        offset += _align(len(data))
+    path = get_binary_master_contract_file(exchange)
+    # Write & rename, so that other processes never map a partial file
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as fo:
+        fo.write(table + b"\0" * (_align(len(table)) - len(table)))
+        for exch, count, symbols, data, blob_length in sections:
+            fo.write(data + b"\0" * (_align(len(data)) - len(data)))
+    os.replace(tmp_file, path)
+    return path
+
+def open_binary_master_contract(exchange):
+    """ Memory map binary copy of master contract if it's of today, else None """
+    path = get_binary_master_contract_file(exchange)
+    if(os.path.isfile(path) == False):
+        return None
+    try:
+        contract = BinaryMasterContract(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Couldn't read {path}, {e}")
+        return None
+    if(datetime.datetime.now(pytz.timezone("Asia/Kolkata")).date() != contract.contract_date):
+        contract.close()
+        return None
+    logger.info(f'Took master contracts from local binary file for exchange: {exchange}')
+    return contract
+
+class _Section:
+    """ Contracts of one exchange in a mapped file, instruments are created on first access """
+
+    def __init__(self, exch, mv, count, symbols, offset, blob_length):
+        self.exchange = exch
+        self.count = count
+        self.symbols = symbols
+        def _take(fmt, n):
+            nonlocal offset
+            view = mv[offset:offset + n * struct.calcsize(fmt)].cast(fmt)
+            offset += _align(view.nbytes)
+            return view
+        self.tokens = _take("q", count)
+        self.expiries = _take("i", count)
+        self.offsets = _take("I", count + 1)
+        self.sorted_tokens = _take("q", count)
+        self.token_index = _take("I", count)
+        self.symbol_index = _take("I", symbols)
+        self.blob = mv[offset:offset + blob_length]
+        self.__instruments = {}
+
+    def instrument(self, i):
+        instrument = self.__instruments.get(i)
+        if(instrument is None):
+            symbol, name, lot_size = bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8").split(_SEP)
+            expiry = self.expiries[i]
+            instrument = Instrument(self.exchange, self.tokens[i], symbol, None if name == _NONE else name,
+                                    datetime.date.fromordinal(expiry) if expiry else None, codec.loads(lot_size))
+            self.__instruments[i] = instrument
+        return instrument
+
+    def symbol(self, i):
+        record = bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+        return record[:record.index(b"\x1f")]
+
+    def find_token(self, token):
+        i = bisect.bisect_left(self.sorted_tokens, token)
+        if(i < self.count and self.sorted_tokens[i] == token):
+            return self.token_index[i]
+        return None
+
+    def find_symbol(self, symbol):
+        symbol = symbol.encode("utf-8")
+        lo, hi = 0, self.symbols
+        while(lo < hi):
+            mid = (lo + hi) // 2
+            if(self.symbol(self.symbol_index[mid]) < symbol):
+                lo = mid + 1
+            else:
+                hi = mid
+        if(lo < self.symbols and self.symbol(self.symbol_index[lo]) == symbol):
+            return self.symbol_index[lo]
+        return None
+
+class _Values(ValuesView):
+    def __iter__(self):
+        return self._mapping.iter_values()
+
+class _Items(ItemsView):
+    def __iter__(self):
+        return self._mapping.iter_items()
+
+class ContractsByToken(Mapping):
+    """ Read only token -> Instrument mapping over a mapped section, iterates in master contract order """
+
+    def __init__(self, section):
+        self.__section = section
+
+    def __getitem__(self, token):
+        i = self.__section.find_token(token) if isinstance(token, int) else None
+        if(i is None):
+            raise KeyError(token)
+        return self.__section.instrument(i)
+
+    def __contains__(self, token):
+        return isinstance(token, int) and self.__section.find_token(token) is not None
+
+    def __iter__(self):
+        return iter(self.__section.tokens)
+
+    def __len__(self):
+        return self.__section.count
+
+    def values(self):
+        return _Values(self)
+
+    def items(self):
+        return _Items(self)
+
+    def iter_values(self):
+        instrument = self.__section.instrument
+        return (instrument(i) for i in range(self.__section.count))
+
+    def iter_items(self):
+        return zip(self.__section.tokens, self.iter_values())
+
+class ContractsBySymbol(Mapping):
+    """ Read only symbol -> Instrument mapping over a mapped section, iterates in symbol order """
+
+    def __init__(self, section):
+        self.__section = section
+
+    def __getitem__(self, symbol):
+        i = self.__section.find_symbol(symbol) if isinstance(symbol, str) else None
+        if(i is None):
+            raise KeyError(symbol)
+        return self.__section.instrument(i)
+
+    def __contains__(self, symbol):
+        return isinstance(symbol, str) and self.__section.find_symbol(symbol) is not None
+
+    def __iter__(self):
+        return (self.__section.symbol(i).decode("utf-8") for i in self.__section.symbol_index)
+
+    def __len__(self):
+        return self.__section.symbols
+
+    def values(self):
+        return _Values(self)
+
+    def items(self):
+        return _Items(self)
+
+    def iter_values(self):
+        instrument = self.__section.instrument
+        return (instrument(i) for i in self.__section.symbol_index)
+
+    def iter_items(self):
+        return ((i.symbol, i) for i in self.iter_values())
+
+class BinaryMasterContract:
+    """ Memory mapped binary master contract, pages are read by the OS only when looked up """
+
+    def __init__(self, path):
+        with open(path, "rb") as fo:
+            self.__mm = mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ)
+        mv = memoryview(self.__mm)
+        magic, version, contract_date, n = _HEADER.unpack_from(mv, 0)
+        if(magic != _MAGIC or version != _VERSION):
+            mv.release()
+            self.__mm.close()
+            raise ValueError("Not a binary master contract file of this version")
+        self.contract_date = datetime.date.fromordinal(contract_date)
+        self.sections = {}
+        for k in range(n):
+            exch, count, symbols, offset, blob_length = _SECTION.unpack_from(mv, _HEADER.size + k * _SECTION.size)
+            exch = exch.rstrip(b"\0").decode("utf-8")
+            section = _Section(exch, mv, count, symbols, offset, blob_length)
+            self.sections[exch] = (ContractsByToken(section), ContractsBySymbol(section))
+
+    def close(self):
+        """ Unmap the file, mappings of this file must not be used after this """
+        self.sections = {}
+        try:
+            self.__mm.close()
+        except BufferError:
+            # views of the map are still referenced, it's unmapped when they are collected
+            pass
@@ -0,0 +1,160 @@
+from collections import deque, OrderedDict
+import enum
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class OverflowPolicy(enum.Enum):
+    Block = 'block'                 # websocket thread waits for room in the queue
+    DropOldest = 'drop_oldest'      # oldest queued message of the worker is discarded
+    Conflate = 'conflate'           # only the newest pending message of an instrument is kept, never waits
+                                    # as there is at most one message per instrument, queue_size isn't applied
+
+class _Worker:
+    """ One delivery thread with its own bounded queue """
+
+    def __init__(self, index, callback, queue_size, overflow_policy):
+        self.index = index
+        self.callback = callback
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.condition = threading.Condition()
+        # Conflate keeps one slot per key, in the order the key first became pending
+        self.pending = OrderedDict() if(overflow_policy == OverflowPolicy.Conflate) else deque()
+        self.running = True
+        self.enqueued = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.last_lag = 0.0
+        self.thread = threading.Thread(target=self.run, name=f"alice_blue_dispatcher_{index}")
+        self.thread.daemon = True
+
+    def put(self, key, message):
+        now = time.perf_counter()
+        with self.condition:
+            if(self.overflow_policy == OverflowPolicy.Conflate):
+                if(key in self.pending):
+                    # keep the enqueue time of the oldest frame so lag reflects staleness
+                    self.pending[key] = (self.pending[key][0], message)
+                    self.conflated += 1
+                    self.enqueued += 1
+                    return
+                # never blocks the websocket thread, pending is bounded by the number of instruments
+                self.pending[key] = (now, message)
+            else:
+                if(len(self.pending) >= self.queue_size):
+                    if(self.overflow_policy == OverflowPolicy.DropOldest):
+                        self.pending.popleft()
+                        self.dropped += 1
+                    else:
+                        while(len(self.pending) >= self.queue_size and self.running):
+                            self.condition.wait()
+                self.pending.append((now, message))
+            self.enqueued += 1
+            if(len(self.pending) > self.max_queue_depth):
+                self.max_queue_depth = len(self.pending)
+            self.condition.notify_all()
+
+    def get(self):
+        with self.condition:
+            while(len(self.pending) == 0 and self.running):
+                self.condition.wait()
+            if(len(self.pending) == 0):
+                return None
+            if(self.overflow_policy == OverflowPolicy.Conflate):
+                item = self.pending.popitem(last=False)[1]
+            else:
+                item = self.pending.popleft()
+            self.condition.notify_all()
+            return item
+
+    def run(self):
+        while True:
+            item = self.get()
+            if(item is None):
+                return
+            enqueued_at, message = item
+            lag = time.perf_counter() - enqueued_at
+            try:
+                self.callback(message)
+            except Exception as e:
+                self.errors += 1
+                logger.exception(f"subscribe callback raised exception in dispatcher worker {self.index}, {e}")
+            self.delivered += 1
+            self.last_lag = lag
+            self.lag_total += lag
+            if(lag > self.lag_max):
+                self.lag_max = lag
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def get_stats(self):
+        with self.condition:
+            return {"queue_depth"       : len(self.pending),
+                    "max_queue_depth"   : self.max_queue_depth,
+                    "enqueued"          : self.enqueued,
+                    "delivered"         : self.delivered,
+                    "dropped"           : self.dropped,
+                    "conflated"         : self.conflated,
+                    "errors"            : self.errors,
+                    "last_lag"          : self.last_lag,
+                    "max_lag"           : self.lag_max,
+                    "avg_lag"           : (self.lag_total / self.delivered) if(self.delivered) else 0.0}
+
+class FeedDispatcher:
+    """ Delivers feed messages to a callback from a pool of worker threads.
+        Messages of an instrument always go to the same worker, so they are delivered in order.
+    """
+
+    def __init__(self, callback, workers=4, queue_size=10000, overflow_policy=OverflowPolicy.Block):
+        if not callable(callback):
+            raise TypeError("Required parameter callback is not callable")
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError("Parameter workers should be a positive int")
+        if not isinstance(queue_size, int) or queue_size < 1:
+            raise ValueError("Parameter queue_size should be a positive int")
+        if(type(overflow_policy) is not OverflowPolicy):
+            raise TypeError("Parameter overflow_policy is not of type OverflowPolicy")
+        self.__workers = [_Worker(i, callback, queue_size, overflow_policy) for i in range(workers)]
+
+    def start(self):
+        """ Start worker threads """
+        for worker in self.__workers:
+            worker.thread.start()
+
+    def stop(self, timeout=None):
+        """ Stop worker threads, messages still queued are discarded """
+        for worker in self.__workers:
+            worker.stop()
+        for worker in self.__workers:
+            worker.thread.join(timeout)
+
+    def dispatch(self, key, message):
+        """ Queue a message, key identifies the instrument """
+        self.__workers[hash(key) % len(self.__workers)].put(key, message)
+
+    def get_stats(self):
+        """ Queue depth, lag (in seconds) and counters, totals and per worker """
+        per_worker = [worker.get_stats() for worker in self.__workers]
+        delivered = sum(w["delivered"] for w in per_worker)
+        return {"workers"           : len(per_worker),
+                "queue_depth"       : sum(w["queue_depth"] for w in per_worker),
+                "max_queue_depth"   : max(w["max_queue_depth"] for w in per_worker),
+                "enqueued"          : sum(w["enqueued"] for w in per_worker),
+                "delivered"         : delivered,
+                "dropped"           : sum(w["dropped"] for w in per_worker),
+                "conflated"         : sum(w["conflated"] for w in per_worker),
+                "errors"            : sum(w["errors"] for w in per_worker),
+                "max_lag"           : max(w["max_lag"] for w in per_worker),
+                "avg_lag"           : (sum(w["avg_lag"] * w["delivered"] for w in per_worker) / delivered) if(delivered) else 0.0,
+                "per_worker"        : per_worker}
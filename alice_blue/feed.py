@@ -0,0 +1,276 @@
+import datetime
+
+# Feed time & last traded time repeat across all the tokens ticking in the same second,
+# so the converted values are cached and reused
+_CONVERSION_CACHE_SIZE = 4096
+_datetime_cache = {}
+_time_cache = {}
+
+def _to_datetime(value):
+    dt = _datetime_cache.get(value)
+    if(dt is None):
+        if(len(_datetime_cache) >= _CONVERSION_CACHE_SIZE):
+            _datetime_cache.clear()
+        dt = _datetime_cache[value] = datetime.datetime.fromtimestamp(int(value))
+    return dt
+
+def _to_time(value):
+    t = _time_cache.get(value)
+    if(t is None):
+        if(len(_time_cache) >= _CONVERSION_CACHE_SIZE):
+            _time_cache.clear()
+        # equivalent of datetime.datetime.strptime(value, "%H:%M:%S").time(), without the strptime overhead
+        hour, minute, second = value.split(':')
+        t = _time_cache[value] = datetime.time(int(hour), int(minute), int(second))
+    return t
+
+class FeedSnapshot:
+    """ Latest merged tick & depth state of a single token """
+    __slots__ = ('instrument', 'ltp', 'percent_change', 'change_value', 'volume',
+                 'open', 'high', 'low', 'close', 'exchange_time_stamp', 'atp',
+                 'tick_increment', 'lot_size', 'price_precision', 'total_open_interest',
+                 'bid_prices', 'ask_prices', 'bid_quantities', 'ask_quantities',
+                 'buy_orders', 'sell_orders', 'open_interest', 'last_traded_quantity',
+                 'last_traded_time', 'total_buy_quantity', 'total_sell_quantity',
+                 'upper_circuit', 'lower_circuit')
+
+    def __init__(self, instrument):
+        self.instrument = instrument
+        self.ltp = 0
+        self.percent_change = 0
+        self.change_value = 0
+        self.volume = 0
+        self.open = 0
+        self.high = 0
+        self.low = 0
+        self.close = 0
+        self.exchange_time_stamp = None
+        self.atp = 0
+        self.tick_increment = 0
+        self.lot_size = 0
+        self.price_precision = 0
+        self.total_open_interest = 0
+        self.bid_prices = [None, None, None, None, None]
+        self.ask_prices = [None, None, None, None, None]
+        self.bid_quantities = [None, None, None, None, None]
+        self.ask_quantities = [None, None, None, None, None]
+        self.buy_orders = [None, None, None, None, None]
+        self.sell_orders = [None, None, None, None, None]
+        self.open_interest = 0
+        self.last_traded_quantity = 0
+        self.last_traded_time = None
+        self.total_buy_quantity = 0
+        self.total_sell_quantity = 0
+        self.upper_circuit = 0
+        self.lower_circuit = 0
+
+    def tick_dict(self):
+        """ Tick data in the format given to subscribe_callback """
+        return {"instrument"            : self.instrument,
+                "ltp"                   : self.ltp,
+                "percent_change"        : self.percent_change,
+                "change_value"          : self.change_value,
+                "volume"                : self.volume,
+                "open"                  : self.open,
+                "high"                  : self.high,
+                "low"                   : self.low,
+                "close"                 : self.close,
+                "exchange_time_stamp"   : self.exchange_time_stamp,
+                "atp"                   : self.atp,
+                "tick_increment"        : self.tick_increment,
+                "lot_size"              : self.lot_size,
+                "best_bid_price"        : self.bid_prices[0],
+                "best_ask_price"        : self.ask_prices[0],
+                "best_bid_quantity"     : self.bid_quantities[0],
+                "best_ask_quantity"     : self.ask_quantities[0],
+                "price_precision"       : self.price_precision,
+                "total_open_interest"   : self.total_open_interest}
+
+    def depth_dict(self):
+        """ Depth data in the format given to subscribe_callback """
+        data = self.tick_dict()
+        data["bid_prices"]              = self.bid_prices.copy()
+        data["ask_prices"]              = self.ask_prices.copy()
+        data["bid_quantities"]          = self.bid_quantities.copy()
+        data["ask_quantities"]          = self.ask_quantities.copy()
+        data["buy_orders"]              = self.buy_orders.copy()
+        data["sell_orders"]             = self.sell_orders.copy()
+        data["open_interest"]           = self.open_interest
+        data["last_traded_quantity"]    = self.last_traded_quantity
+        data["last_traded_time"]        = self.last_traded_time
+        data["total_buy_quantity"]      = self.total_buy_quantity
+        data["total_sell_quantity"]     = self.total_sell_quantity
+        data["upper_circuit"]           = self.upper_circuit
+        data["lower_circuit"]           = self.lower_circuit
+        return data
+
+    @property
+    def best_bid_price(self):
+        return self.bid_prices[0]
+
+    @property
+    def best_ask_price(self):
+        return self.ask_prices[0]
+
+    @property
+    def best_bid_quantity(self):
+        return self.bid_quantities[0]
+
+    @property
+    def best_ask_quantity(self):
+        return self.ask_quantities[0]
+
+    def __getitem__(self, key):
+        """ Fields by the keys of tick/depth dicts too, so snapshot['ltp'] works like tick['ltp'] """
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def copy(self):
+        """ Copy which isn't changed by later frames """
+        snapshot = FeedSnapshot.__new__(FeedSnapshot)
+        for attr in FeedSnapshot.__slots__:
+            value = getattr(self, attr)
+            setattr(snapshot, attr, value.copy() if(isinstance(value, list)) else value)
+        return snapshot
+
+# wire key, snapshot attribute, converter, depth level (None for scalar fields)
+FIELD_SPECS = [ ("lp",  "ltp",                  float,          None),     # Last Traded Price
+                ("pc",  "percent_change",       float,          None),     # percentage change
+                ("cv",  "change_value",         float,          None),     # change value (absolute change in price)
+                ("v",   "volume",               int,            None),     # Volume
+                ("o",   "open",                 float,          None),     # Open
+                ("h",   "high",                 float,          None),     # High
+                ("l",   "low",                  float,          None),     # Low
+                ("c",   "close",                float,          None),     # Close
+                ("ft",  "exchange_time_stamp",  _to_datetime,   None),     # Feed Time
+                ("ap",  "atp",                  float,          None),     # Average Price
+                ("ti",  "tick_increment",       float,          None),     # Tick Increment
+                ("ls",  "lot_size",             int,            None),     # Lot Size
+                ("pp",  "price_precision",      int,            None),     # Price Precision
+                ("toi", "total_open_interest",  int,            None),     # Total Open Interest
+                ("oi",  "open_interest",        int,            None),     # Open Interest
+                ("ltq", "last_traded_quantity", int,            None),     # Last Traded Quantity
+                ("ltt", "last_traded_time",     _to_time,       None),     # Last Traded Time
+                ("tbq", "total_buy_quantity",   int,            None),     # Total Buy Quantity
+                ("tsq", "total_sell_quantity",  int,            None),     # Total Sell Quantity
+                ("uc",  "upper_circuit",        float,          None),     # Upper Circuit
+                ("lc",  "lower_circuit",        float,          None)]     # Lower Circuit
+for _level in range(5):
+    FIELD_SPECS += [(f"bp{_level + 1}", "bid_prices",       float,  _level),    # Bid Prices
+                    (f"sp{_level + 1}", "ask_prices",       float,  _level),    # Ask Prices
+                    (f"bq{_level + 1}", "bid_quantities",   int,    _level),    # Bid Quantities
+                    (f"sq{_level + 1}", "ask_quantities",   int,    _level),    # Ask Quantities
+                    (f"bo{_level + 1}", "buy_orders",       int,    _level),    # Buy Orders
+                    (f"so{_level + 1}", "sell_orders",      int,    _level)]    # Sell Orders
+
+# Wire keys which are consumed by the decoder without being stored
+_IGNORED_KEYS = ("t", "e", "tk", "ts")
+_UNKNOWN = object()
+
+class FeedDecoder:
+    """ Decodes tick/depth frames into per token FeedSnapshot objects in a single pass """
+
+    def __init__(self, instrument_lookup):
+        """ instrument_lookup is called with (exchange, token) once per new token, & on every frame till it finds it """
+        self.__instrument_lookup = instrument_lookup
+        self.__snapshots = {}
+        self.__market_state = None
+        self.__rows = {}
+        # wire key -> (slot setter, slot getter, converter, depth level, attribute)
+        self.__specs = {}
+        for key, attr, converter, level in FIELD_SPECS:
+            slot = FeedSnapshot.__dict__[attr]
+            self.__specs[key] = (slot.__set__, slot.__get__, converter, level, attr)
+        for key in _IGNORED_KEYS:
+            self.__specs[key] = None
+
+    def get_snapshot(self, exchange, token):
+        """ Get the snapshot of a token, None if no frame is received for it yet """
+        return self.__snapshots.get((exchange, str(token)))
+
+    def get_all_snapshots(self):
+        """ Get all snapshots, keyed by (exchange, token) """
+        return self.__snapshots
+
+    def attach_market_state(self, market_state):
+        """ Write every decoded field into market_state columns as well, existing snapshots are loaded into it """
+        rows = {}
+        for key, snapshot in self.__snapshots.items():
+            rows[key] = market_state.add(key[0], key[1], snapshot.instrument)
+            market_state.load(rows[key], snapshot)
+        self.__rows = rows
+        self.__market_state = market_state
+
+    def update(self, data):
+        """ Merge a frame into its token's snapshot and return (snapshot, unknown keys of the frame) """
+        key = (data["e"], data["tk"])
+        snapshot = self.__snapshots.get(key)
+        if(snapshot is None):
+            snapshot = FeedSnapshot(self.__instrument_lookup(key[0], int(key[1])))
+            self.__snapshots[key] = snapshot
+        elif(snapshot.instrument is None):
+            # master contracts may not be loaded yet, looked up again till found
+            snapshot.instrument = self.__instrument_lookup(key[0], int(key[1]))
+            if(snapshot.instrument is not None and key in self.__rows):
+                self.__market_state.set_instrument(self.__rows[key], snapshot.instrument)
+        market_state = self.__market_state
+        if(market_state is None):
+            return snapshot, self.__merge(data, snapshot, None, None)
+        row = self.__rows.get(key)
+        if(row is None):
+            row = self.__rows[key] = market_state.add(key[0], key[1], snapshot.instrument)
+        # add() of another thread may reallocate the arrays, so columns are written holding its lock
+        with market_state.lock:
+            return snapshot, self.__merge(data, snapshot, market_state.columns, row)
+
+    def __merge(self, data, snapshot, columns, row):
+        """ Merge values of data into snapshot & its row of columns, returns unknown keys """
+        specs = self.__specs
+        extra = None
+        for name, value in data.items():
+            spec = specs.get(name, _UNKNOWN)
+            if(spec is None):
+                continue
+            if(spec is _UNKNOWN):
+                if(extra is None):
+                    extra = {}
+                extra[name] = value
+                continue
+            setter, getter, converter, level, attr = spec
+            value = converter(value)
+            if(level is None):
+                setter(snapshot, value)
+            else:
+                getter(snapshot)[level] = value
+            if(columns is not None):
+                column = columns.get(attr)
+                if(column is not None):
+                    if(level is None):
+                        column[row] = value
+                    else:
+                        column[row, level] = value
+        return extra
+
+    def decode_tick(self, data):
+        """ Decode a tick frame, returns dict in the format given to subscribe_callback """
+        snapshot, extra = self.update(data)
+        tick = snapshot.tick_dict()
+        if(extra is not None):
+            tick.update(extra)
+        return tick
+
+    def decode_depth(self, data):
+        """ Decode a depth frame, returns dict in the format given to subscribe_callback """
+        snapshot, extra = self.update(data)
+        depth = snapshot.depth_dict()
+        if(extra is not None):
+            depth.update(extra)
+        return depth
+
+    def decode(self, data):
+        """ Decode a tick or depth frame into its token's FeedSnapshot without creating a dict.
+            Keys of the frame which aren't snapshot fields are dropped.
+        """
+        return self.update(data)[0]
@@ -0,0 +1,283 @@
+import bisect
+import datetime
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+import pytz
+
+try:
+    import numpy as np
+except ImportError:            # numpy is an optional dependency, only needed for columnar output
+    np = None
+try:
+    import pandas as pd
+except ImportError:            # pandas is an optional dependency, only needed for DataFrame output
+    pd = None
+
+logger = logging.getLogger(__name__)
+
+# A bar on disk: time (epoch seconds), open, high, low, close, volume. Files are sorted by time
+_BAR = struct.Struct("<qddddq")
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+_IST = pytz.timezone("Asia/Kolkata")
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+_IST_OFFSET = 19800                         # seconds, IST has no daylight saving
+# Column names & numpy types, in the order of fields of a bar record
+COLUMNS = (("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"), ("volume", "<i8"))
+
+# Days of bars fetched in a single request, by resolution
+DEFAULT_CHUNK_DAYS = {"1" : 30, "1D" : 365}
+
+def get_default_cache_dir():
+    """ Directory of the historical bar cache when none is given """
+    return os.path.join(tempfile.gettempdir(), "alice_blue_history")
+
+def to_epoch(dt):
+    """ Epoch seconds of a datetime, naive datetimes are taken as local time like historical_data() does """
+    return int(dt.timestamp())
+
+def parse_bar(bar):
+    """ Bar record (time, open, high, low, close, volume) of a bar of chart history response, None if it has no time """
+    try:
+        dt = _IST.localize(datetime.datetime.strptime(bar["time"], _TIME_FORMAT))
+    except (KeyError, TypeError, ValueError):
+        return None
+    return (int((dt - _EPOCH).total_seconds()), float(bar.get("open") or 0), float(bar.get("high") or 0),
+            float(bar.get("low") or 0), float(bar.get("close") or 0), int(float(bar.get("volume") or 0)))
+
+def pack_records(records):
+    """ Bar records as bytes of the bars file format """
+    return b"".join(_BAR.pack(*r) for r in records)
+
+def format_bars(data):
+    """ Bars in the format of chart history response from bytes of bar records """
+    return [format_bar(r) for r in _BAR.iter_unpack(data)]
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for columnar historical data, install it with 'pip install numpy'")
+
+def get_columns(data):
+    """ Columns of bar records (dict of numpy arrays by COLUMNS name) from bytes of bar records, without creating bars """
+    _require_numpy()
+    records = np.frombuffer(data, dtype=np.dtype(list(COLUMNS)))
+    return {name : np.ascontiguousarray(records[name]) for name, dtype in COLUMNS}
+
+def parse_columns(bars):
+    """ Columns of bars of a chart history response, times are parsed by numpy """
+    _require_numpy()
+    columns = {"time" : np.array([b["time"] for b in bars], dtype="datetime64[s]").astype("<i8") - _IST_OFFSET}
+    for name, dtype in COLUMNS[1:]:
+        columns[name] = np.array([b.get(name) or 0 for b in bars], dtype="<f8").astype(dtype)
+    return columns
+
+def get_dataframe(columns):
+    """ pandas DataFrame of bar columns, indexed by time in IST """
+    if pd is None:
+        raise ImportError("pandas is required for DataFrame historical data, install it with 'pip install pandas'")
+    index = pd.DatetimeIndex(pd.to_datetime(columns["time"], unit="s", utc=True).tz_convert("Asia/Kolkata"), name="time")
+    return pd.DataFrame({name : columns[name] for name, dtype in COLUMNS[1:]}, index=index, copy=False)
+
+def get_panel(columns_by_instrument):
+    """ Bar columns of many instruments aligned on the union of their times.
+        Returns a dict of 'time' (int64 epoch seconds), 'instruments' (column order) & a 2-D array
+        (times x instruments) per field. Missing bars are NaN in prices & 0 in volume.
+    """
+    _require_numpy()
+    instruments = list(columns_by_instrument)
+    times = [columns_by_instrument[i]["time"] for i in instruments]
+    time = np.unique(np.concatenate(times)) if(len(times) > 0) else np.empty(0, dtype="<i8")
+    panel = {"time" : time, "instruments" : instruments}
+    for name, dtype in COLUMNS[1:]:
+        panel[name] = np.zeros((len(time), len(instruments)), dtype=dtype) if(name == "volume") else np.full((len(time), len(instruments)), np.nan)
+    for n, instrument in enumerate(instruments):
+        rows = np.searchsorted(time, times[n])
+        for name, dtype in COLUMNS[1:]:
+            panel[name][rows, n] = columns_by_instrument[instrument][name]
+    return panel
+
+def format_bar(record):
+    """ Bar in the format of chart history response from a bar record """
+    return {"volume"    : float(record[5]),
+            "high"      : record[2],
+            "low"       : record[3],
+            "time"      : datetime.datetime.fromtimestamp(record[0], _IST).strftime(_TIME_FORMAT),
+            "close"     : record[4],
+            "open"      : record[1]}
+
+def merge_ranges(ranges):
+    """ Sorted, non overlapping [start, end] ranges of epoch seconds, adjacent ranges are joined """
+    merged = []
+    for start, end in sorted(ranges):
+        if(len(merged) > 0 and start <= merged[-1][1] + 1):
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+def get_missing_ranges(covered, start, end):
+    """ Parts of [start, end] not in covered ranges """
+    missing = []
+    for c_start, c_end in merge_ranges(covered):
+        if(c_end < start or c_start > end):
+            continue
+        if(c_start > start):
+            missing.append([start, c_start - 1])
+        start = c_end + 1
+    if(start <= end):
+        missing.append([start, end])
+    return missing
+
+def split_range(start, end, seconds):
+    """ [start, end] split into ranges of at most seconds """
+    return [[s, min(s + seconds - 1, end)] for s in range(start, end + 1, seconds)]
+
+def merge_records(*record_lists):
+    """ Bar records sorted by time, a later list wins for the same time """
+    by_time = {}
+    for records in record_lists:
+        for record in records:
+            by_time[record[0]] = record
+    return [by_time[t] for t in sorted(by_time)]
+
+class BarCache:
+    """ Historical bars on disk, per (exchange, token, resolution) a file of bar records sorted by time
+        and a file of time ranges already downloaded, which may have no bars (holidays, weekends).
+    """
+
+    def __init__(self, directory=None):
+        self.__directory = get_default_cache_dir() if(directory is None) else directory
+        self.__locks = {}
+        self.__locks_lock = threading.Lock()
+
+    @property
+    def directory(self):
+        return self.__directory
+
+    def __path(self, exchange, token, resolution, extension):
+        return os.path.join(self.__directory, f"{exchange}_{int(token)}_{resolution}.{extension}")
+
+    def __lock(self, key):
+        with self.__locks_lock:
+            lock = self.__locks.get(key)
+            if(lock is None):
+                lock = self.__locks[key] = threading.Lock()
+            return lock
+
+    def get_path(self, exchange, token, resolution):
+        """ Path of the bars file of a key, it may not exist """
+        return self.__path(exchange, token, resolution, "bars")
+
+    def get_covered(self, exchange, token, resolution):
+        """ [start, end] ranges of epoch seconds already downloaded """
+        try:
+            with open(self.__path(exchange, token, resolution, "json"), "r") as fo:
+                return json.loads(fo.read())
+        except (OSError, ValueError):
+            return []
+
+    def read(self, exchange, token, resolution, start=None, end=None):
+        """ Bytes of bar records with time in [start, end], all if not given """
+        try:
+            with open(self.__path(exchange, token, resolution, "bars"), "rb") as fo:
+                data = fo.read()
+        except OSError:
+            return b""
+        count = len(data) // _BAR.size
+        times = _Times(data, count)
+        lo = 0 if(start is None) else bisect.bisect_left(times, start)
+        hi = count if(end is None) else bisect.bisect_right(times, end)
+        return data[lo * _BAR.size:hi * _BAR.size]
+
+    def write(self, exchange, token, resolution, records, covered):
+        """ Merge downloaded bar records & the ranges they were downloaded for into the cache """
+        with self.__lock((exchange, int(token), resolution)):
+            os.makedirs(self.__directory, exist_ok=True)
+            if(len(records) > 0):
+                records = merge_records(_BAR.iter_unpack(self.read(exchange, token, resolution)), records)
+                self.__replace(self.__path(exchange, token, resolution, "bars"), pack_records(records))
+            if(len(covered) > 0):
+                covered = merge_ranges(self.get_covered(exchange, token, resolution) + covered)
+                self.__replace(self.__path(exchange, token, resolution, "json"), json.dumps(covered).encode())
+
+    @staticmethod
+    def __replace(path, data):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fo:
+            fo.write(data)
+        os.replace(tmp, path)
+
+class _Times:
+    """ Times of bar records in a bars file as a sequence, for bisect """
+
+    def __init__(self, data, count):
+        self.__data = data
+        self.__count = count
+
+    def __len__(self):
+        return self.__count
+
+    def __getitem__(self, i):
+        return _BAR.unpack_from(self.__data, i * _BAR.size)[0]
+
+def get_chunks(cache, instruments, start, end, resolution, chunk_seconds):
+    """ (instrument, start, end) of every request needed for bars of instruments in [start, end],
+        ranges already in cache are left out
+    """
+    chunks = []
+    for instrument in instruments:
+        covered = [] if(cache is None) else cache.get_covered(instrument.exchange, instrument.token, resolution)
+        for gap_start, gap_end in get_missing_ranges(covered, start, end):
+            for chunk_start, chunk_end in split_range(gap_start, gap_end, chunk_seconds):
+                chunks.append((instrument, chunk_start, chunk_end))
+    return chunks
+
+def get_chunk_payload(instrument, start, end, resolution):
+    """ Chart history payload of a chunk """
+    return {"token"     : instrument.token,
+            "resolution": resolution,
+            "from"      : start * 1000,
+            "to"        : end * 1000,
+            "exchange"  : instrument.exchange}
+
+def get_chunk_bars(response):
+    """ Bars of a chart history response, no bars in the range is not an error """
+    if(isinstance(response, dict) and str(response.get("stat", "ok")).lower() != "ok"):
+        emsg = str(response.get("emsg") or response.get("message") or "")
+        if("no data" in emsg.lower()):
+            return []
+        raise Exception(emsg or str(response))
+    bars = response.get("result") if(isinstance(response, dict)) else response
+    return bars or []
+
+def store_chunks(cache, instruments, start, end, resolution, results):
+    """ Write bars of downloaded chunks (BulkResults of get_chunks() items) to cache.
+        Returns bytes of bar records by instrument, downloaded ones merged with cached ones if cache is used
+    """
+    # Ranges up to the start of today are complete, bars of today are downloaded again next time
+    today = int((_IST.localize(datetime.datetime.combine(datetime.datetime.now(_IST).date(), datetime.time())) - _EPOCH).total_seconds())
+    downloaded = {}
+    for result in results:
+        instrument, chunk_start, chunk_end = result.item
+        records, covered = downloaded.setdefault(instrument, ([], []))
+        if(result.error is None):
+            records += [r for r in (parse_bar(b) for b in result.response) if r is not None]
+            if(chunk_start < today):
+                covered.append([chunk_start, min(chunk_end, today - 1)])
+    bars = {}
+    for instrument in instruments:
+        records, covered = downloaded.get(instrument, ([], []))
+        if(cache is None):
+            bars[instrument] = pack_records(r for r in merge_records(records) if start <= r[0] <= end)
+            continue
+        try:
+            cache.write(instrument.exchange, instrument.token, resolution, records, covered)
+            bars[instrument] = cache.read(instrument.exchange, instrument.token, resolution, start, end)
+        except OSError as e:
+            logger.warning(f"Couldn't write historical bars of {instrument.symbol} to cache, {e}")
+            cached = _BAR.iter_unpack(cache.read(instrument.exchange, instrument.token, resolution, start, end))
+            bars[instrument] = pack_records(r for r in merge_records(cached, records) if start <= r[0] <= end)
+    return bars
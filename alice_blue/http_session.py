@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import logging
+import requests
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+def _is_connect_error(e):
+    """ True if a request failed without connecting, such failures are retried by urllib3 already """
+    if(isinstance(e, requests.ConnectTimeout)):
+        return True
+    reason = getattr(e.args[0], "reason", None) if(len(e.args) > 0) else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+class HttpSession:
+    """ Pooled HTTP session shared by REST calls, keeps TCP/TLS connections alive between calls.
+        Requests failing to connect are always retried as nothing reached the server.
+        Timeouts, dropped connections & 5xx responses are retried only for idempotent (read only) requests.
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=5.0, read_timeout=30.0, retries=2, backoff_factor=0.1):
+        self.__session = requests.Session()
+        self.__timeout = (connect_timeout, read_timeout)
+        self.__retries = retries
+        self.__backoff_factor = backoff_factor
+        self.__pool_size = pool_size
+        # urllib3 retries only connection failures, read retries are decided per request in request().
+        # Each failure is retried in one of the two places, so a connection failure is tried retries + 1 times
+        retry = Retry(total=retries, connect=retries, read=False, redirect=0, status=0, backoff_factor=backoff_factor)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.__session.mount("https://", adapter)
+        self.__session.mount("http://", adapter)
+
+    @property
+    def timeout(self):
+        """ (connect timeout, read timeout) in seconds """
+        return self.__timeout
+
+    def request(self, method, url, idempotent=False, **kwargs):
+        """ Make a request over pooled connections, idempotent requests are retried on failures """
+        kwargs.setdefault("timeout", self.__timeout)
+        attempt = 0
+        while True:
+            try:
+                r = self.__session.request(method, url, **kwargs)
+                if(idempotent == False or r.status_code not in (502, 503, 504) or attempt >= self.__retries):
+                    return r
+                logger.warning(f"{method} {url} returned {r.status_code}, retrying")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if(idempotent == False or attempt >= self.__retries or _is_connect_error(e)):
+                    raise
+                logger.warning(f"{method} {url} failed with {e}, retrying")
+            attempt += 1
+            time.sleep(self.__backoff_factor * (2 ** (attempt - 1)))
+
+    def get(self, url, idempotent=True, **kwargs):
+        return self.request("GET", url, idempotent=idempotent, **kwargs)
+
+    def post(self, url, idempotent=False, **kwargs):
+        return self.request("POST", url, idempotent=idempotent, **kwargs)
+
+    def put(self, url, idempotent=False, **kwargs):
+        return self.request("PUT", url, idempotent=idempotent, **kwargs)
+
+    def delete(self, url, idempotent=False, **kwargs):
+        return self.request("DELETE", url, idempotent=idempotent, **kwargs)
+
+    def warm_up(self, urls, connections=1):
+        """ Open `connections` connections to the host of every url, so that later calls skip TCP & TLS handshakes """
+        hosts = []
+        for url in urls:
+            u = urlparse(url)
+            if(u.scheme in ("http", "https") and f"{u.scheme}://{u.netloc}/" not in hosts):
+                hosts.append(f"{u.scheme}://{u.netloc}/")
+        connections = max(1, min(connections, self.__pool_size))
+        # Concurrent requests are needed to open more than one connection per host
+        barrier = threading.Barrier(connections)
+        def _open(host):
+            try:
+                barrier.wait(self.__timeout[0])
+            except threading.BrokenBarrierError:
+                pass
+            try:
+                self.__session.head(host, timeout=self.__timeout)
+            except requests.RequestException as e:
+                logger.warning(f"Couldn't warm up connection to {host}, {e}")
+        for host in hosts:
+            barrier.reset()
+            with ThreadPoolExecutor(connections) as executor:
+                list(executor.map(_open, [host] * connections))
+
+    def close(self):
+        """ Close all pooled connections """
+        self.__session.close()
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+def get_default_session():
+    """ HttpSession shared by all AliceBlue objects which are not given their own """
+    global _default_session
+    with _default_session_lock:
+        if(_default_session is None):
+            _default_session = HttpSession()
+        return _default_session
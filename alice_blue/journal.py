@@ -0,0 +1,140 @@
+import datetime
+import glob
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Segment file: header (magic, version, microseconds when created) followed by records of
+# receive time in epoch microseconds, length & the frame as utf-8 bytes. Records are only appended,
+# a record cut short by a crash ends the segment.
+_MAGIC = b"ABTJ"
+_VERSION = 1
+_HEADER = struct.Struct("<4sIq")
+_RECORD = struct.Struct("<qI")
+_EXTENSION = ".abtj"
+
+def _now_us():
+    return int(time.time() * 1000000)
+
+class TickJournal:
+    """ Append only binary journal of raw websocket frames in rotating segment files.
+        Writes are buffered, a frame costs an encode, a struct pack & a buffered file write on the caller's thread.
+    """
+
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, buffer_size=1024 * 1024):
+        self.__directory = directory
+        self.__segment_size = segment_size
+        self.__buffer_size = buffer_size
+        self.__lock = threading.Lock()
+        self.__file = None
+        self.__written = 0
+        self.__sequence = 0
+        self.__frames = 0
+        self.__segments = []
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def directory(self):
+        return self.__directory
+
+    def get_segments(self):
+        """ Paths of segments written by this journal """
+        return list(self.__segments)
+
+    def get_frames(self):
+        """ Number of frames written """
+        return self.__frames
+
+    def __open_segment(self):
+        created = _now_us()
+        name = datetime.datetime.fromtimestamp(created / 1000000).strftime("%Y%m%d_%H%M%S_%f")
+        self.__sequence += 1
+        path = os.path.join(self.__directory, f"journal_{name}_{self.__sequence:06d}{_EXTENSION}")
+        self.__file = open(path, "ab", buffering=self.__buffer_size)
+        self.__file.write(_HEADER.pack(_MAGIC, _VERSION, created))
+        self.__written = _HEADER.size
+        self.__segments.append(path)
+
+    def write(self, frame, received=None):
+        """ Append a frame (str or bytes) with its receive time in epoch microseconds, now if not given """
+        if(received is None):
+            received = _now_us()
+        data = frame.encode("utf-8") if(isinstance(frame, str)) else bytes(frame)
+        with self.__lock:
+            if(self.__file is None or self.__written >= self.__segment_size):
+                if(self.__file is not None):
+                    self.__file.close()
+                self.__open_segment()
+            self.__file.write(_RECORD.pack(received, len(data)))
+            self.__file.write(data)
+            self.__written += _RECORD.size + len(data)
+            self.__frames += 1
+
+    def flush(self):
+        """ Write buffered frames to the segment file """
+        with self.__lock:
+            if(self.__file is not None):
+                self.__file.flush()
+
+    def close(self):
+        """ Flush & close the current segment, the next write starts a new one """
+        with self.__lock:
+            if(self.__file is not None):
+                self.__file.close()
+                self.__file = None
+
+def get_journal_segments(path):
+    """ Segment files of a journal directory in the order they were written, or the given segment file """
+    if(os.path.isdir(path)):
+        return sorted(glob.glob(os.path.join(path, f"*{_EXTENSION}")))
+    return [path]
+
+def read_segment(path):
+    """ (receive time in epoch microseconds, frame) of every frame of a segment file, the file is memory mapped """
+    with open(path, "rb") as fo:
+        if(os.fstat(fo.fileno()).st_size < _HEADER.size):
+            return
+        with mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, created = _HEADER.unpack_from(mm, 0)
+            if(magic != _MAGIC or version != _VERSION):
+                raise ValueError(f"{path} is not a tick journal segment")
+            offset = _HEADER.size
+            size = len(mm)
+            while(offset + _RECORD.size <= size):
+                received, length = _RECORD.unpack_from(mm, offset)
+                offset += _RECORD.size
+                if(offset + length > size):
+                    logger.warning(f"Tick journal segment {path} ends with an incomplete frame")
+                    return
+                yield received, mm[offset:offset + length].decode("utf-8")
+                offset += length
+
+def read_journal(path):
+    """ (receive time in epoch microseconds, frame) of every frame of a journal directory or segment file """
+    for segment in get_journal_segments(path):
+        yield from read_segment(segment)
+
+def replay_journal(path, on_frame, speed=None):
+    """ Call on_frame with every frame of a journal. With speed, frames are paced by their receive times
+        (1.0 is wall-clock speed, 2.0 twice as fast), as fast as possible if speed is None.
+        Returns number of frames replayed.
+    """
+    frames = 0
+    first = None
+    start = None
+    for received, frame in read_journal(path):
+        if(speed is not None):
+            if(first is None):
+                first = received
+                start = time.perf_counter()
+            delay = (received - first) / 1000000 / speed - (time.perf_counter() - start)
+            if(delay > 0):
+                time.sleep(delay)
+        on_frame(frame)
+        frames += 1
+    return frames
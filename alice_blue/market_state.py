@@ -0,0 +1,134 @@
+import threading
+
+try:
+    import numpy as np
+except ImportError:            # numpy is an optional dependency, only needed for market state
+    np = None
+
+# snapshot attributes stored as one value per token
+SCALAR_COLUMNS = {  "ltp"                   : "float64",
+                    "percent_change"        : "float64",
+                    "change_value"          : "float64",
+                    "volume"                : "int64",
+                    "open"                  : "float64",
+                    "high"                  : "float64",
+                    "low"                   : "float64",
+                    "close"                 : "float64",
+                    "atp"                   : "float64",
+                    "total_open_interest"   : "int64",
+                    "open_interest"         : "int64",
+                    "last_traded_quantity"  : "int64",
+                    "total_buy_quantity"    : "int64",
+                    "total_sell_quantity"   : "int64",
+                    "upper_circuit"         : "float64",
+                    "lower_circuit"         : "float64"}
+
+# snapshot attributes stored as 5 levels per token, in the order of the depth matrix
+DEPTH_COLUMNS = ("bid_prices", "ask_prices", "bid_quantities", "ask_quantities", "buy_orders", "sell_orders")
+
+COLUMNS = tuple(SCALAR_COLUMNS) + DEPTH_COLUMNS
+
+class MarketState:
+    """ Live market state of all subscribed tokens in preallocated numpy arrays, one row per token.
+        Columns are accessed as attributes (eg. market_state.ltp, market_state.bid_prices) and
+        are zero-copy views of the first `len(market_state)` rows.
+    """
+
+    def __init__(self, capacity=1024):
+        if np is None:
+            raise ImportError("numpy is required for market state, install it with 'pip install numpy'")
+        self.__lock = threading.Lock()
+        self.__rows = {}
+        self.__instruments = []
+        self.__capacity = 0
+        self.__scalars = {}
+        self.__depth = np.empty((0, len(DEPTH_COLUMNS), 5))
+        self.__columns = {}
+        self.__allocate(max(int(capacity), 1))
+
+    def __allocate(self, capacity):
+        count = len(self.__instruments)
+        for name, dtype in SCALAR_COLUMNS.items():
+            column = np.zeros(capacity, dtype=dtype)
+            if(dtype == "float64"):
+                column.fill(np.nan)
+            if(name in self.__scalars):
+                column[:count] = self.__scalars[name][:count]
+            self.__scalars[name] = column
+        depth = np.full((capacity, len(DEPTH_COLUMNS), 5), np.nan)
+        depth[:count] = self.__depth[:count]
+        self.__depth = depth
+        columns = dict(self.__scalars)
+        for i, name in enumerate(DEPTH_COLUMNS):
+            columns[name] = depth[:, i, :]
+        # Swap in one go, writers always see a complete set of columns
+        self.__columns = columns
+        self.__capacity = capacity
+
+    def __len__(self):
+        return len(self.__instruments)
+
+    def __getattr__(self, name):
+        if name in COLUMNS:
+            return self.__columns[name][:len(self.__instruments)]
+        raise AttributeError(f"'MarketState' object has no attribute '{name}'")
+
+    @property
+    def capacity(self):
+        """ Number of rows allocated, arrays are reallocated (and old views go stale) when it is exceeded """
+        return self.__capacity
+
+    @property
+    def columns(self):
+        """ All columns with full capacity, keyed by snapshot attribute. Used by writers, holding lock. """
+        return self.__columns
+
+    @property
+    def lock(self):
+        """ Held while arrays are reallocated, writers hold it while writing into columns so no write is lost """
+        return self.__lock
+
+    @property
+    def instruments(self):
+        """ Instrument of each row """
+        return self.__instruments[:]
+
+    @property
+    def depth(self):
+        """ Depth matrix of all tokens, shape (tokens, 6, 5). Second axis is in the order of DEPTH_COLUMNS """
+        return self.__depth[:len(self.__instruments)]
+
+    def add(self, exchange, token, instrument=None):
+        """ Add a token and return its row, existing row is returned if already added """
+        key = (exchange, int(token))
+        row = self.__rows.get(key)
+        if(row is not None):
+            return row
+        with self.__lock:
+            row = self.__rows.get(key)
+            if(row is None):
+                row = len(self.__instruments)
+                if(row >= self.__capacity):
+                    self.__allocate(self.__capacity * 2)
+                self.__instruments.append(instrument)
+                self.__rows[key] = row
+        return row
+
+    def set_instrument(self, row, instrument):
+        """ Set the instrument of a row added without it """
+        self.__instruments[row] = instrument
+
+    def row(self, instrument):
+        """ Row of an instrument, None if it's not in market state """
+        return self.__rows.get((instrument.exchange, int(instrument.token)))
+
+    def load(self, row, snapshot):
+        """ Copy all values of a FeedSnapshot into a row """
+        with self.__lock:
+            columns = self.__columns
+            for name in SCALAR_COLUMNS:
+                value = getattr(snapshot, name)
+                if(value is not None):
+                    columns[name][row] = value
+            for name in DEPTH_COLUMNS:
+                columns[name][row] = [np.nan if v is None else v for v in getattr(snapshot, name)]
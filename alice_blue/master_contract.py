@@ -0,0 +1,333 @@
+from collections import namedtuple
+from collections.abc import Mapping, ValuesView
+import datetime
+import logging
+import os
+import pytz
+import re
+import tempfile
+import threading
+import time
+
+from . import codec
+from .option_chain import OptionChainIndex
+from .search_index import SearchIndex, SearchMatch
+
+Instrument = namedtuple('Instrument', ['exchange', 'token', 'symbol',
+                                       'name', 'expiry', 'lot_size'])
+logger = logging.getLogger(__name__)
+_RETRY_LOAD_AFTER = 30
+
+def get_master_contract_file(exchange):
+    """ Path of the local copy of an exchange's master contract """
+    return os.path.join(tempfile.gettempdir(), f"alice_blue_master_contract_{exchange}.json")
+
+def read_master_contract_file(exchange):
+    """ Get local copy of master contract if it's of today, else None """
+    tmp_file = get_master_contract_file(exchange)
+    if(os.path.isfile(tmp_file) == True):
+        with open(tmp_file, 'rb') as fo:
+            d = codec.loads(fo.read())
+            if(datetime.datetime.now(pytz.timezone("Asia/Kolkata")).date() == datetime.datetime.strptime(d["contract_date"], "%d-%m-%Y").date()):
+                logger.info(f'Took master contracts from local for exchange: {exchange}')
+                return d
+    return None
+
+def write_master_contract_file(exchange, body):
+    """ Store master contract locally for next time usage """
+    with open(get_master_contract_file(exchange), 'wb') as fo:
+        fo.write(codec.dumps_bytes(body))
+
+_contract_date_re = re.compile(rb'"contract_date"\s*:\s*"([0-9]{2}-[0-9]{2}-[0-9]{4})"')
+
+def read_master_contract_content(exchange):
+    """ Get local copy of master contract as unparsed bytes if it's of today, else None """
+    tmp_file = get_master_contract_file(exchange)
+    if(os.path.isfile(tmp_file) == True):
+        with open(tmp_file, 'rb') as fo:
+            content = fo.read()
+        # Date is checked without parsing the json, parsing is left to the worker processes
+        m = _contract_date_re.search(content)
+        if(m and datetime.datetime.now(pytz.timezone("Asia/Kolkata")).date() == datetime.datetime.strptime(m.group(1).decode(), "%d-%m-%Y").date()):
+            logger.info(f'Took master contracts from local for exchange: {exchange}')
+            return content
+    return None
+
+def write_master_contract_content(exchange, content):
+    """ Store master contract response as received, for next time usage """
+    with open(get_master_contract_file(exchange), 'wb') as fo:
+        fo.write(content)
+
+def parse_scrip(exch, scrip):
+    """ Instrument of a scrip in master contract response """
+    # convert token
+    token = int(scrip["token"])
+
+    # convert symbol to upper
+    if("trading_symbol" in scrip):
+        symbol = scrip["trading_symbol"]
+    else:
+        symbol = scrip["symbol"]
+
+    # convert expiry to none if it's non-existent
+    if("expiry_date" in scrip):
+        expiry = datetime.datetime.fromtimestamp(scrip['expiry_date']/1000, tz=pytz.utc).date()
+    else:
+        expiry = None
+
+    # convert lot size to int
+    lot_size = None
+    if("lot_size" in scrip):
+        lot_size = scrip["lot_size"]
+
+    # Name
+    name = None
+    if("formatted_ins_name" in scrip):
+        name = scrip["formatted_ins_name"]
+
+    return Instrument(exch, token, symbol, name, expiry, lot_size)
+
+def parse_master_contract(body):
+    """ Instruments of every exchange in a master contract response """
+    return {exch : [parse_scrip(exch, scrip) for scrip in body[exch]] for exch in body if exch != "contract_date"}
+
+def instruments_to_columns(instruments):
+    """ Instruments of every exchange as plain lists of tokens, symbols, names, expiry ordinals & lot sizes,
+        which are many times cheaper to pickle between processes than Instrument tuples
+    """
+    return {exch : ([i.token for i in exch_instruments],
+                    [i.symbol for i in exch_instruments],
+                    [i.name for i in exch_instruments],
+                    [i.expiry.toordinal() if i.expiry else 0 for i in exch_instruments],
+                    [i.lot_size for i in exch_instruments]) for exch, exch_instruments in instruments.items()}
+
+def instruments_from_columns(columns):
+    """ Reverse of instruments_to_columns() """
+    dates = {0 : None}
+    instruments = {}
+    for exch, (tokens, symbols, names, expiries, lot_sizes) in columns.items():
+        for e in expiries:
+            if(e not in dates):
+                dates[e] = datetime.date.fromordinal(e)
+        instruments[exch] = [Instrument(exch, token, symbol, name, dates[e], lot_size)
+                             for token, symbol, name, e, lot_size in zip(tokens, symbols, names, expiries, lot_sizes)]
+    return instruments
+
+class _MergedValues(ValuesView):
+    def __iter__(self):
+        return self._mapping.iter_values()
+
+class MergedContracts(Mapping):
+    """ Read only view of contracts of an exchange coming from more than one master contract,
+        like INDICES & the exchange itself. Later mappings take precedence, as with dict.update()
+    """
+
+    def __init__(self, mappings):
+        self.__mappings = []
+        for mapping in mappings:
+            if isinstance(mapping, MergedContracts):
+                self.__mappings += mapping.mappings
+            else:
+                self.__mappings.append(mapping)
+
+    @property
+    def mappings(self):
+        return self.__mappings[:]
+
+    def __getitem__(self, key):
+        for mapping in reversed(self.__mappings):
+            if key in mapping:
+                return mapping[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return any(key in mapping for mapping in self.__mappings)
+
+    def __iter__(self):
+        seen = set()
+        for mapping in self.__mappings:
+            for key in mapping:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def values(self):
+        return _MergedValues(self)
+
+    def iter_values(self):
+        for i, mapping in enumerate(self.__mappings):
+            later = self.__mappings[i + 1:]
+            for key, value in mapping.items():
+                if not any(key in m for m in later):
+                    yield value
+
+class MasterContracts:
+    """ Tradable instruments of all exchanges, indexed by token and by symbol.
+        If loader is given, loader(exchange) is called to load an exchange the first time it's looked up.
+        Search index of an exchange is built when it's loaded, so no search pays for it, except for memory mapped contracts
+        whose instruments are created only when accessed. Option chain index is built on first use.
+        Search index has a trigram index if ngram_index is True, see search_instruments().
+    """
+
+    def __init__(self, loader=None, ngram_index=False):
+        self.__master_contracts_by_token = {}
+        self.__master_contracts_by_symbol = {}
+        self.__search_indexes = {}
+        self.__option_chain_indexes = {}
+        self.__ngram_index = ngram_index
+        self.__loader = loader
+        self.__loaded = set()
+        self.__failed = {}
+        self.__lock = threading.RLock()
+
+    def ensure_loaded(self, exchange):
+        """ Load an exchange through loader if it's not loaded yet, other threads looking it up wait till it's loaded """
+        if(self.__loader is None or exchange in self.__loaded):
+            return
+        with self.__lock:
+            if(exchange in self.__loaded or time.monotonic() < self.__failed.get(exchange, 0)):
+                return
+            try:
+                self.__loader(exchange)
+            except Exception as e:
+                # Not marked as loaded, it's tried again on a look up after _RETRY_LOAD_AFTER seconds
+                logger.error(f"Couldn't load master contracts for exchange: {exchange}, {e}")
+                self.__failed[exchange] = time.monotonic() + _RETRY_LOAD_AFTER
+                return
+            self.__loaded.add(exchange)
+
+    def load(self, body):
+        """ Add all the contracts of a master contract response """
+        self.load_instruments(parse_master_contract(body))
+
+    def load_instruments(self, instruments):
+        """ Add instruments of every exchange, as given by parse_master_contract() """
+        for exch, exch_instruments in instruments.items():
+            self.__search_indexes.pop(exch, None)
+            self.__option_chain_indexes.pop(exch, None)
+            by_token = {i.token : i for i in exch_instruments}
+            by_symbol = {i.symbol : i for i in exch_instruments}
+            if(exch not in self.__master_contracts_by_token):
+                self.__master_contracts_by_token[exch] = by_token
+                self.__master_contracts_by_symbol[exch] = by_symbol
+            elif(isinstance(self.__master_contracts_by_token[exch], dict)):
+                self.__master_contracts_by_token[exch].update(by_token)
+                self.__master_contracts_by_symbol[exch].update(by_symbol)
+            else:
+                self.__master_contracts_by_token[exch] = MergedContracts([self.__master_contracts_by_token[exch], by_token])
+                self.__master_contracts_by_symbol[exch] = MergedContracts([self.__master_contracts_by_symbol[exch], by_symbol])
+                continue
+            self.__search_indexes[exch] = SearchIndex(self.__master_contracts_by_token[exch].values(), self.__ngram_index)
+
+    def load_binary(self, contract):
+        """ Add all the contracts of a memory mapped BinaryMasterContract, instruments are created only when accessed """
+        for exch, (by_token, by_symbol) in contract.sections.items():
+            self.__search_indexes.pop(exch, None)
+            self.__option_chain_indexes.pop(exch, None)
+            if(exch not in self.__master_contracts_by_token):
+                self.__master_contracts_by_token[exch] = by_token
+                self.__master_contracts_by_symbol[exch] = by_symbol
+            else:
+                self.__master_contracts_by_token[exch] = MergedContracts([self.__master_contracts_by_token[exch], by_token])
+                self.__master_contracts_by_symbol[exch] = MergedContracts([self.__master_contracts_by_symbol[exch], by_symbol])
+
+    def get_master_contract(self, exchange):
+        """ Get all contracts of an exchange keyed by symbol """
+        self.ensure_loaded(exchange)
+        return self.__master_contracts_by_symbol[exchange]
+
+    def get_instrument_by_symbol(self, exchange, symbol):
+        """ get instrument by providing symbol """
+        # get instrument given exchange and symbol
+        exchange = exchange.upper()
+        self.ensure_loaded(exchange)
+        # check if master contract exists
+        if exchange not in self.__master_contracts_by_symbol:
+            logger.warning(f"Cannot find exchange {exchange} in master contract. "
+                            "Please ensure if that exchange is enabled in your profile and downloaded the master contract for the same")
+            return None
+        master_contract = self.__master_contracts_by_symbol[exchange]
+        if symbol not in master_contract:
+            logger.warning(f"Cannot find symbol {symbol} in master contract {exchange}")
+            return None
+        return master_contract[symbol]
+
+    def get_instrument_for_fno(self, symbol, expiry_date, is_fut=False, strike=None, is_CE = False, exchange = 'NFO'):
+        """ get instrument for FNO """
+        index = self.get_option_chain_index(exchange)
+        if(index is None):
+            return
+        if(is_fut == True):
+            return index.get_future(symbol, expiry_date)
+        return index.get_option(symbol, expiry_date, strike, is_CE)
+
+    def get_option_chain(self, symbol, expiry_date, spot=None, strikes=None, exchange='NFO'):
+        """ Calls & puts of an underlying for an expiry sorted by strike, only the given number of strikes nearest to spot if given """
+        index = self.get_option_chain_index(exchange)
+        if(index is None):
+            return None
+        return index.get_chain(symbol, expiry_date, spot, strikes)
+
+    def get_expiries(self, symbol, exchange='NFO'):
+        """ Expiry dates of futures & options of an underlying """
+        index = self.get_option_chain_index(exchange)
+        if(index is None):
+            return None
+        return index.get_expiries(symbol)
+
+    def get_option_chain_index(self, exchange):
+        """ Option chain index of an exchange, built on first use. None if exchange is not loaded """
+        exchange = exchange.upper()
+        self.ensure_loaded(exchange)
+        if exchange not in self.__master_contracts_by_token:
+            logger.warning(f"Cannot find exchange {exchange} in master contract. "
+                "Please ensure if that exchange is enabled in your profile and downloaded the master contract for the same")
+            return None
+        index = self.__option_chain_indexes.get(exchange)
+        if(index is None):
+            index = OptionChainIndex(self.__master_contracts_by_token[exchange].values())
+            self.__option_chain_indexes[exchange] = index
+        return index
+
+    def search_instruments(self, exchange, symbol, match=SearchMatch.Contains):
+        """ Search instrument by symbol match. Exact & prefix matches take microseconds. Substring (Contains) matches
+            scan all symbols of the exchange, a few milliseconds on NFO, unless ngram_index is True, then those of
+            3 or more characters take well under a millisecond, at the cost of about 3 times the index build time & memory.
+        """
+        # search instrument given exchange and symbol
+        exchange = exchange.upper()
+        self.ensure_loaded(exchange)
+        # check if master contract exists
+        if exchange not in self.__master_contracts_by_token:
+            logger.warning(f"Cannot find exchange {exchange} in master contract. "
+                "Please ensure if that exchange is enabled in your profile and downloaded the master contract for the same")
+            return None
+        return self.get_search_index(exchange).search(symbol, match)
+
+    def get_search_index(self, exchange):
+        """ Search index of an exchange, built if it isn't built when the exchange was loaded """
+        index = self.__search_indexes.get(exchange)
+        if(index is None):
+            index = SearchIndex(self.__master_contracts_by_token[exchange].values(), self.__ngram_index)
+            self.__search_indexes[exchange] = index
+        return index
+
+    def get_instrument_by_token(self, exchange, token):
+        """ Get instrument by providing token """
+        # get instrument given exchange and token
+        exchange = exchange.upper()
+        self.ensure_loaded(exchange)
+        token = int(token)
+        # check if master contract exists
+        if exchange not in self.__master_contracts_by_symbol:
+            logger.warning(f"Cannot find exchange {exchange} in master contract. "
+                            "Please ensure if that exchange is enabled in your profile and downloaded the master contract for the same")
+            return None
+        master_contract = self.__master_contracts_by_token[exchange]
+        if token not in master_contract:
+            logger.warning(f"Cannot find symbol {exchange} {token} in master contract")
+            return None
+        return master_contract[token]
@@ -0,0 +1,231 @@
+from bisect import bisect_left as _bisect_left
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of histogram buckets in seconds, the R10 series of preferred numbers from 1 us to 100 s,
+# about 25% apart, so percentiles are within a bucket's width.
+_R10 = (1.0, 1.25, 1.6, 2.0, 2.5, 3.15, 4.0, 5.0, 6.3, 8.0)
+BUCKETS = tuple(round(m * 10 ** e, 12) for e in range(-6, 2) for m in _R10) + (100.0,)
+# Buckets written by PrometheusFileExporter, 1-2.5-5 of every decade
+_EXPORTED_BUCKETS = tuple(round(m * 10 ** e, 12) for e in range(-6, 2) for m in (1.0, 2.5, 5.0)) + (100.0,)
+# Names of the label of a metric in exported text, 'label' if not given
+_LABEL_NAMES = {"api_call"      : "endpoint",
+                "api_errors"    : "endpoint",
+                "extract"       : "kind",
+                "ws_send_wait"  : "type"}
+
+class Histogram:
+    """ Counts of observed durations (seconds) in fixed log spaced buckets, with count, sum, min & max.
+        Observing takes no lock, so an observation made by two threads at the same instant may rarely be lost,
+        which a latency distribution can afford.
+    """
+
+    def __init__(self):
+        self.__counts = [0] * (len(BUCKETS) + 1)
+        self.__sum = 0.0
+        self.__min = float("inf")
+        self.__max = 0.0
+
+    def observe(self, seconds):
+        """ Add a duration, negative durations (clocks of two machines) are counted as 0 """
+        if(seconds < 0):
+            seconds = 0.0
+        self.__counts[_bisect_left(BUCKETS, seconds)] += 1
+        self.__sum += seconds
+        if(seconds < self.__min):
+            self.__min = seconds
+        if(seconds > self.__max):
+            self.__max = seconds
+
+    @property
+    def count(self):
+        return sum(self.__counts)
+
+    def get_percentile(self, percent):
+        """ Estimate of a percentile, interpolated within its bucket. None if nothing is observed """
+        counts = list(self.__counts)
+        return self.__get_percentile(counts, sum(counts), percent)
+
+    def __get_percentile(self, counts, count, percent):
+        if(count == 0):
+            return None
+        rank = count * percent / 100
+        seen = 0
+        for i, n in enumerate(counts):
+            if(n > 0 and seen + n >= rank):
+                lower = BUCKETS[i - 1] if(i > 0) else 0.0
+                upper = BUCKETS[i] if(i < len(BUCKETS)) else self.__max
+                value = lower + (upper - lower) * max(0.0, rank - seen) / n
+                return min(max(value, self.__min), self.__max)
+            seen += n
+        return self.__max
+
+    def to_dict(self):
+        """ count, sum, min, max, mean & p50/p90/p99/p999 in seconds, and [upper bound, count] of non empty buckets """
+        counts = list(self.__counts)
+        count = sum(counts)
+        result = {"count"   : count,
+                  "sum"     : self.__sum,
+                  "min"     : self.__min if(count > 0) else None,
+                  "max"     : self.__max if(count > 0) else None,
+                  "mean"    : self.__sum / count if(count > 0) else None}
+        for name, percent in (("p50", 50), ("p90", 90), ("p99", 99), ("p999", 99.9)):
+            result[name] = self.__get_percentile(counts, count, percent)
+        result["buckets"] = [[BUCKETS[i] if(i < len(BUCKETS)) else None, n] for i, n in enumerate(counts) if n > 0]
+        return result
+
+    def get_cumulative_counts(self, bounds):
+        """ Observations <= each of bounds (which must be bucket bounds) & total count """
+        counts = list(self.__counts)
+        count = sum(counts)
+        cumulative = []
+        seen = 0
+        i = 0
+        for bound in bounds:
+            while(i < len(BUCKETS) and BUCKETS[i] <= bound):
+                seen += counts[i]
+                i += 1
+            cumulative.append(seen)
+        return cumulative, count
+
+class Metrics:
+    """ Latency histograms & counters by name & an optional label, eg. ("api_call", "placeOrder").
+        Exporters are callables given the Metrics object, called by export() or every interval seconds.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__histograms = {}
+        self.__counters = {}
+        self.__exporters = []
+        self.__export_stopped = None
+        self.__created = time.time()
+
+    def observe(self, name, seconds, label=None):
+        """ Add a duration in seconds to the histogram of name & label """
+        histogram = self.__histograms.get((name, label))
+        if(histogram is None):
+            with self.__lock:
+                histogram = self.__histograms.setdefault((name, label), Histogram())
+        histogram.observe(seconds)
+
+    def increment(self, name, value=1, label=None):
+        """ Add value to the counter of name & label """
+        with self.__lock:
+            self.__counters[(name, label)] = self.__counters.get((name, label), 0) + value
+
+    def get_histogram(self, name, label=None):
+        """ Histogram of name & label, None if nothing is observed yet """
+        return self.__histograms.get((name, label))
+
+    def get_histograms(self):
+        """ Histograms keyed by (name, label) """
+        with self.__lock:
+            return dict(self.__histograms)
+
+    def get_counters(self):
+        """ Counter values keyed by (name, label) """
+        with self.__lock:
+            return dict(self.__counters)
+
+    def snapshot(self):
+        """ All histograms (as Histogram.to_dict()) & counters, by name then label ('' if none), as plain dicts """
+        result = {"since" : self.__created, "time" : time.time(), "histograms" : {}, "counters" : {}}
+        for (name, label), histogram in self.get_histograms().items():
+            result["histograms"].setdefault(name, {})["" if(label is None) else str(label)] = histogram.to_dict()
+        for (name, label), value in self.get_counters().items():
+            result["counters"].setdefault(name, {})["" if(label is None) else str(label)] = value
+        return result
+
+    def reset(self):
+        """ Remove all histograms & counters """
+        with self.__lock:
+            self.__histograms = {}
+            self.__counters = {}
+            self.__created = time.time()
+
+    def add_exporter(self, exporter):
+        """ Add a callable which is given this object on every export """
+        self.__exporters.append(exporter)
+
+    def export(self):
+        """ Call all exporters, an exporter raising is logged & doesn't stop the others """
+        for exporter in list(self.__exporters):
+            try:
+                exporter(self)
+            except Exception as e:
+                logger.warning(f"Metrics exporter {exporter} ended in exception, {e}")
+
+    def start_exporting(self, interval):
+        """ Export every interval seconds from a background thread till stop_exporting() """
+        self.stop_exporting()
+        stopped = threading.Event()
+        self.__export_stopped = stopped
+        def _export_forever():
+            while(not stopped.wait(interval)):
+                self.export()
+        thread = threading.Thread(target=_export_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop_exporting(self):
+        if(self.__export_stopped is not None):
+            self.__export_stopped.set()
+            self.__export_stopped = None
+
+def _format_labels(name, label, extra=""):
+    labels = [] if(label is None) else [f'{_LABEL_NAMES.get(name, "label")}="{label}"']
+    if(len(extra) > 0):
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if(len(labels) > 0) else ""
+
+def format_prometheus(metrics, prefix="alice_blue"):
+    """ Histograms & counters of metrics in Prometheus text exposition format """
+    lines = []
+    histograms = {}
+    for (name, label), histogram in metrics.get_histograms().items():
+        histograms.setdefault(name, []).append((label, histogram))
+    for name in sorted(histograms):
+        metric = f"{prefix}_{name}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for label, histogram in sorted(histograms[name], key=lambda h: str(h[0])):
+            cumulative, count = histogram.get_cumulative_counts(_EXPORTED_BUCKETS)
+            for bound, n in zip(_EXPORTED_BUCKETS, cumulative):
+                le = f'le="{bound:g}"'
+                lines.append(f"{metric}_bucket{_format_labels(name, label, le)} {n}")
+            le = 'le="+Inf"'
+            lines.append(f"{metric}_bucket{_format_labels(name, label, le)} {count}")
+            lines.append(f"{metric}_sum{_format_labels(name, label)} {histogram.to_dict()['sum']}")
+            lines.append(f"{metric}_count{_format_labels(name, label)} {count}")
+    counters = {}
+    for (name, label), value in metrics.get_counters().items():
+        counters.setdefault(name, []).append((label, value))
+    for name in sorted(counters):
+        metric = f"{prefix}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for label, value in sorted(counters[name], key=lambda c: str(c[0])):
+            lines.append(f"{metric}{_format_labels(name, label)} {value}")
+    return "\n".join(lines) + "\n"
+
+class PrometheusFileExporter:
+    """ Exporter writing metrics in Prometheus text format to a file, eg. for node_exporter's textfile collector.
+        The file is replaced in one step, so readers never see a partly written file.
+    """
+
+    def __init__(self, path, prefix="alice_blue"):
+        self.__path = path
+        self.__prefix = prefix
+
+    @property
+    def path(self):
+        return self.__path
+
+    def __call__(self, metrics):
+        tmp = f"{self.__path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as fo:
+            fo.write(format_prometheus(metrics, self.__prefix))
+        os.replace(tmp, self.__path)
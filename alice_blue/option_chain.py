@@ -0,0 +1,68 @@
+from collections import namedtuple
+import bisect
+
+OptionChainRow = namedtuple('OptionChainRow', ['strike', 'call', 'put'])
+
+class OptionChainIndex:
+    """ Futures & options of an exchange by underlying, expiry, strike & option type.
+        Underlying, strike & option type come from the name of contracts, eg. 'NIFTY 27OCT26 24000 CE'.
+        When more than one contract has the same key, the first one in contract order is used.
+    """
+
+    def __init__(self, instruments):
+        self.__options = {}
+        self.__futures = {}
+        chains = {}
+        for i in instruments:
+            if(i.name is None or i.expiry is None):
+                continue
+            sp = i.name.split(' ')
+            underlying = sp[0]
+            if((sp[-1] == 'CE') or (sp[-1] == 'PE')):           # Only option scrips
+                try:
+                    strike = float(sp[-2])
+                except (ValueError, IndexError):
+                    continue
+                key = (underlying, i.expiry, strike, sp[-1])
+                if(key not in self.__options):
+                    self.__options[key] = i
+                    chain = chains.setdefault((underlying, i.expiry), {})
+                    row = chain.setdefault(strike, [None, None])
+                    row[0 if(sp[-1] == 'CE') else 1] = i
+            elif('FUT' in i.symbol):
+                self.__futures.setdefault((underlying, i.expiry), i)
+        # (underlying, expiry) -> (sorted strikes, rows in the same order)
+        self.__chains = {}
+        for key, chain in chains.items():
+            strikes = sorted(chain)
+            self.__chains[key] = (strikes, [OptionChainRow(s, chain[s][0], chain[s][1]) for s in strikes])
+        self.__expiries = {}
+        for underlying, expiry in list(self.__chains) + list(self.__futures):
+            self.__expiries.setdefault(underlying, set()).add(expiry)
+
+    def get_option(self, underlying, expiry, strike, is_CE):
+        """ Call or put option, None if there's no such contract """
+        return self.__options.get((underlying, expiry, float(strike), 'CE' if(is_CE == True) else 'PE'))
+
+    def get_future(self, underlying, expiry):
+        """ Future contract, None if there's no such contract """
+        return self.__futures.get((underlying, expiry))
+
+    def get_expiries(self, underlying):
+        """ Sorted expiry dates of all futures & options of an underlying """
+        return sorted(self.__expiries.get(underlying, ()))
+
+    def get_chain(self, underlying, expiry, spot=None, strikes=None):
+        """ OptionChainRow of every strike sorted by strike, or of only the given number of strikes nearest to spot """
+        strike_list, rows = self.__chains.get((underlying, expiry), ([], []))
+        if(spot is None or strikes is None or strikes >= len(rows)):
+            return list(rows)
+        # Grow a window around the spot, taking the nearer of the two strikes on either side each time
+        hi = bisect.bisect_left(strike_list, spot)
+        lo = hi
+        while(hi - lo < strikes):
+            if(lo > 0 and (hi == len(strike_list) or spot - strike_list[lo - 1] <= strike_list[hi] - spot)):
+                lo -= 1
+            else:
+                hi += 1
+        return rows[lo:hi]
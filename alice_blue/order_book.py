@@ -0,0 +1,254 @@
+import asyncio
+import threading
+import time
+
+# Order update fields of websocket order messages ("t":"om") -> fields of orders in fetchOrder response
+_ORDER_FIELDS = {   "norenordno"    : "Nstordno",
+                    "status"        : "Status",
+                    "reporttype"    : "reporttype",
+                    "exch"          : "Exchange",
+                    "tsym"          : "Trsym",
+                    "token"         : "token",
+                    "qty"           : "Qty",
+                    "prc"           : "Prc",
+                    "trgprc"        : "Trgprc",
+                    "prctyp"        : "Prctype",
+                    "trantype"      : "Trantype",
+                    "prd"           : "Pcode",
+                    "fillshares"    : "Fillshares",
+                    "avgprc"        : "Avgprc",
+                    "remarks"       : "remarks",
+                    "rejreason"     : "RejReason",
+                    "exchordid"     : "ExchOrdID"}
+
+# Websocket statuses which are spelt differently in fetchOrder response
+_STATUSES = {"canceled" : "cancelled"}
+
+def get_order_update(message):
+    """ Order of a websocket order message, with the fields & status of fetchOrder response """
+    order = {}
+    for key, field in _ORDER_FIELDS.items():
+        if(key in message):
+            order[field] = message[key]
+    if("Status" in order):
+        status = str(order["Status"]).lower()
+        order["Status"] = _STATUSES.get(status, status)
+    return order
+
+def get_trade_update(message):
+    """ Trade of a websocket order message with a fill, with the fields of fetchTrade response. None if it's not a fill """
+    if(message.get("flid") is None or message.get("flqty") is None):
+        return None
+    return {"Nstordno"  : message.get("norenordno"),
+            "FillId"    : message.get("flid"),
+            "Fillqty"   : message.get("flqty"),
+            "Price"     : message.get("flprc"),
+            "Filledqty" : message.get("fillshares"),
+            "AvgPrice"  : message.get("avgprc"),
+            "Filltime"  : message.get("fltm"),
+            "Exchange"  : message.get("exch"),
+            "Tsym"      : message.get("tsym"),
+            "Symbol"    : message.get("token"),
+            "Trantype"  : message.get("trantype"),
+            "Pcode"     : message.get("prd")}
+
+def is_open_status(status):
+    """ Whether an order with this status can still be filled, modified or cancelled """
+    status = str(status).lower()
+    return status != "complete" and not status.startswith("cancelled") and not status.startswith("rejected")
+
+def _status_matches(order, status):
+    if(status is None):
+        return not is_open_status(order.get("Status"))
+    current = str(order.get("Status")).lower()
+    return any(current.startswith(s.lower()) for s in (status if isinstance(status, (list, tuple, set)) else [status]))
+
+def _get_key(value):
+    return None if(value is None) else str(value)
+
+class OrderBook:
+    """ Local copy of the order book & trade book, seeded once from REST and kept up to date
+        by websocket order updates. Orders are dicts with the fields of get_order_history().
+        Orders are indexed by order id, order tag (remarks) & instrument (exchange, token).
+    """
+
+    def __init__(self):
+        self.__condition = threading.Condition()
+        self.__orders = {}
+        self.__trades = {}
+        self.__fill_ids = set()
+        self.__by_tag = {}
+        self.__by_instrument = {}
+        self.__async_waiters = []
+        # Updates received while seeding are applied after the REST snapshot
+        self.__pending = None
+
+    def __len__(self):
+        return len(self.__orders)
+
+    def begin_load(self):
+        """ Hold back websocket updates till load() is called, so that they are not overwritten by the REST snapshot """
+        with self.__condition:
+            self.__pending = []
+
+    def load(self, orders, trades):
+        """ Replace all orders & trades with fetchOrder & fetchTrade responses, then apply updates held back """
+        with self.__condition:
+            self.__orders = {}
+            self.__trades = {}
+            self.__fill_ids = set()
+            self.__by_tag = {}
+            self.__by_instrument = {}
+            for order in (orders if isinstance(orders, list) else []):
+                if(isinstance(order, dict) and order.get("Nstordno") is not None):
+                    self.__set_order(dict(order))
+            for trade in (trades if isinstance(trades, list) else []):
+                if(isinstance(trade, dict)):
+                    self.__add_trade(dict(trade))
+            pending = self.__pending or []
+            self.__pending = None
+            for message in pending:
+                self.__apply(message)
+            self.__notify()
+
+    def cancel_load(self):
+        """ Apply updates held back by begin_load() without loading a REST snapshot """
+        with self.__condition:
+            pending = self.__pending or []
+            self.__pending = None
+            for message in pending:
+                self.__apply(message)
+            self.__notify()
+
+    def update(self, message):
+        """ Apply a websocket order message, the order after the update is returned """
+        with self.__condition:
+            if(self.__pending is not None):
+                self.__pending.append(message)
+                return None
+            order = self.__apply(message)
+            self.__notify()
+            return order
+
+    def __apply(self, message):
+        update = get_order_update(message)
+        order_id = _get_key(update.get("Nstordno"))
+        if(order_id is None):
+            return None
+        order = dict(self.__orders.get(order_id, {}))
+        order.update(update)
+        order["Nstordno"] = order_id
+        self.__set_order(order)
+        trade = get_trade_update(message)
+        if(trade is not None):
+            self.__add_trade(trade)
+        return order
+
+    def __set_order(self, order):
+        order_id = _get_key(order["Nstordno"])
+        old = self.__orders.get(order_id)
+        self.__orders[order_id] = order
+        if(old is not None):
+            if(old.get("remarks") == order.get("remarks") and self.__instrument_key(old) == self.__instrument_key(order)):
+                return
+            self.__by_tag.get(_get_key(old.get("remarks")), {}).pop(order_id, None)
+            self.__by_instrument.get(self.__instrument_key(old), {}).pop(order_id, None)
+        # dicts are used as sets which keep the order in which orders were added
+        self.__by_tag.setdefault(_get_key(order.get("remarks")), {})[order_id] = None
+        self.__by_instrument.setdefault(self.__instrument_key(order), {})[order_id] = None
+
+    def __add_trade(self, trade):
+        fill_id = (_get_key(trade.get("Nstordno")), _get_key(trade.get("FillId")))
+        if(fill_id[1] is not None):
+            if(fill_id in self.__fill_ids):
+                return
+            self.__fill_ids.add(fill_id)
+        self.__trades.setdefault(fill_id[0], []).append(trade)
+
+    @staticmethod
+    def __instrument_key(order):
+        token = order.get("token")
+        try:
+            token = int(token)
+        except (TypeError, ValueError):
+            pass
+        return (order.get("Exchange"), token)
+
+    def __notify(self):
+        self.__condition.notify_all()
+        waiters = []
+        for waiter in self.__async_waiters:
+            loop, future, order_id, status = waiter
+            order = self.__orders.get(order_id)
+            if(order is not None and _status_matches(order, status)):
+                loop.call_soon_threadsafe(self.__set_result, future, dict(order))
+            else:
+                waiters.append(waiter)
+        self.__async_waiters = waiters
+
+    @staticmethod
+    def __set_result(future, order):
+        if(not future.done()):
+            future.set_result(order)
+
+    def get_order(self, order_id):
+        """ Order by order id, None if it's not known """
+        with self.__condition:
+            order = self.__orders.get(_get_key(order_id))
+            return None if(order is None) else dict(order)
+
+    def get_orders(self, order_tag=None, instrument=None, open_only=False):
+        """ Orders, optionally only of an order tag, of an instrument or which are still open """
+        with self.__condition:
+            order_ids = None
+            if(order_tag is not None):
+                order_ids = list(self.__by_tag.get(str(order_tag), ()))
+            if(instrument is not None):
+                by_instrument = self.__by_instrument.get((instrument.exchange, int(instrument.token)), {})
+                order_ids = list(by_instrument) if(order_ids is None) else [i for i in order_ids if i in by_instrument]
+            orders = self.__orders.values() if(order_ids is None) else [self.__orders[i] for i in order_ids]
+            return [dict(o) for o in orders if(open_only == False or is_open_status(o.get("Status")))]
+
+    def get_trades(self, order_id=None):
+        """ Trades of an order, or all trades """
+        with self.__condition:
+            if(order_id is not None):
+                return [dict(t) for t in self.__trades.get(_get_key(order_id), [])]
+            return [dict(t) for trades in self.__trades.values() for t in trades]
+
+    def wait_for_status(self, order_id, status=None, timeout=None):
+        """ Block till the status of an order starts with status (or any of a list of statuses),
+            or till the order is complete, cancelled or rejected if status is None.
+            The order is returned, None on timeout.
+        """
+        order_id = _get_key(order_id)
+        deadline = None if(timeout is None) else time.monotonic() + timeout
+        with self.__condition:
+            while True:
+                order = self.__orders.get(order_id)
+                if(order is not None and _status_matches(order, status)):
+                    return dict(order)
+                remaining = None if(deadline is None) else deadline - time.monotonic()
+                if(remaining is not None and remaining <= 0):
+                    return None
+                self.__condition.wait(remaining)
+
+    async def wait_for_status_async(self, order_id, status=None, timeout=None):
+        """ wait_for_status() for asyncio, the event loop is not blocked """
+        order_id = _get_key(order_id)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.__condition:
+            order = self.__orders.get(order_id)
+            if(order is not None and _status_matches(order, status)):
+                return dict(order)
+            waiter = (loop, future, order_id, status)
+            self.__async_waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self.__condition:
+                if(waiter in self.__async_waiters):
+                    self.__async_waiters.remove(waiter)
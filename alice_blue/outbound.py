@@ -0,0 +1,181 @@
+from collections import deque
+from concurrent.futures import Future
+import logging
+import threading
+import time
+
+from . import codec
+
+logger = logging.getLogger(__name__)
+
+class _Message:
+    """ A queued message with the Future given to its sender & the connection generation it's queued in """
+    __slots__ = ('data', 'future', 'queued', 'deadline', 'generation')
+
+    def __init__(self, data, future, queued, deadline, generation):
+        self.data = data
+        self.future = future
+        self.queued = queued
+        self.deadline = deadline
+        self.generation = generation
+
+class OutboundQueue:
+    """ Messages to a websocket, sent in order by a writer thread so that senders never wait for the connection
+        or the socket. The writer sleeps till the connection is opened & there is something to send.
+        Messages queued before the connection closes are dropped, even if the writer has taken them already,
+        as everything is sent again on the next connection after its connect message.
+        send(str) writes to the socket, on_sent(message type, seconds queued) is called for every message sent.
+    """
+
+    def __init__(self, send, on_sent=None, name="alice_blue_writer"):
+        self.__send = send
+        self.__on_sent = on_sent
+        self.__condition = threading.Condition()
+        # Held while sending & while the connection state changes, so no message of a closed connection
+        # is sent after the next one opens
+        self.__send_lock = threading.Lock()
+        self.__queue = deque()
+        self.__deadlines = 0            # queued messages with a timeout
+        self.__connected = False
+        self.__generation = 0           # incremented when the connection closes
+        self.__stopped = False
+        self.__queued = 0
+        self.__sent = 0
+        self.__dropped = 0
+        self.__timed_out = 0
+        self.__errors = 0
+        self.__max_queue_depth = 0
+        self.__thread = threading.Thread(target=self.__run_forever, name=name)
+        self.__thread.daemon = True
+
+    def start(self):
+        self.__thread.start()
+
+    def stop(self):
+        """ Stop the writer, messages not sent yet are dropped """
+        with self.__condition:
+            self.__stopped = True
+            dropped = self.__take_all()
+            self.__condition.notify_all()
+        self.__fail(dropped, ConnectionError("Websocket writer is stopped"))
+
+    def put(self, data, timeout=None):
+        """ Queue data to be sent, returns right away with a Future which is done when it's written to the socket.
+            The Future fails with TimeoutError if it couldn't be sent in timeout seconds, ConnectionError if
+            the connection closes before it's sent.
+        """
+        future = Future()
+        now = time.perf_counter()
+        with self.__condition:
+            if(self.__stopped):
+                future.set_exception(ConnectionError("Websocket writer is stopped"))
+                return future
+            self.__queue.append(_Message(data, future, now, None if(timeout is None) else now + timeout, self.__generation))
+            self.__queued += 1
+            if(timeout is not None):
+                self.__deadlines += 1
+            if(len(self.__queue) > self.__max_queue_depth):
+                self.__max_queue_depth = len(self.__queue)
+            self.__condition.notify()
+        return future
+
+    def set_connected(self, connected, first=None):
+        """ Messages are sent only while connected. On connection, first is sent before all queued messages """
+        dropped = []
+        with self.__send_lock:
+            with self.__condition:
+                self.__connected = connected
+                if(connected == False):
+                    self.__generation += 1
+                    dropped = self.__take_all()
+                elif(first is not None):
+                    self.__queue.appendleft(_Message(first, Future(), time.perf_counter(), None, self.__generation))
+                    self.__queued += 1
+                self.__condition.notify()
+        self.__fail(dropped, ConnectionError("Websocket closed before the message was sent"))
+
+    def get_stats(self):
+        """ Counters of messages queued, sent, dropped on disconnection, timed out & failed """
+        with self.__condition:
+            return {"connected"         : self.__connected,
+                    "queue_depth"       : len(self.__queue),
+                    "max_queue_depth"   : self.__max_queue_depth,
+                    "queued"            : self.__queued,
+                    "sent"              : self.__sent,
+                    "dropped"           : self.__dropped,
+                    "timed_out"         : self.__timed_out,
+                    "errors"            : self.__errors}
+
+    def __take_all(self):
+        messages = list(self.__queue)
+        self.__queue.clear()
+        self.__deadlines = 0
+        self.__dropped += len(messages)
+        return messages
+
+    def __fail(self, messages, error):
+        for message in messages:
+            message.future.set_exception(error)
+
+    def __expire(self, now):
+        """ Remove messages past their deadline, returns them & seconds till the next deadline (None if there is none) """
+        expired = []
+        wait = None
+        if(self.__deadlines == 0):
+            return expired, wait
+        queue = deque()
+        for message in self.__queue:
+            if(message.deadline is None):
+                queue.append(message)
+            elif(message.deadline <= now):
+                expired.append(message)
+            else:
+                queue.append(message)
+                wait = message.deadline - now if(wait is None) else min(wait, message.deadline - now)
+        self.__queue = queue
+        self.__deadlines -= len(expired)
+        self.__timed_out += len(expired)
+        return expired, wait
+
+    def __run_forever(self):
+        while True:
+            with self.__condition:
+                while True:
+                    if(self.__stopped):
+                        return
+                    expired, wait = self.__expire(time.perf_counter())
+                    if(len(expired) > 0):
+                        break
+                    if(self.__connected == True and len(self.__queue) > 0):
+                        break
+                    self.__condition.wait(wait)
+                messages = []
+                if(self.__connected == True):
+                    messages = list(self.__queue)
+                    self.__queue.clear()
+                    self.__deadlines = 0
+            self.__fail(expired, TimeoutError("Websocket message not sent in time"))
+            for message in messages:
+                self.__write(message)
+
+    def __write(self, message):
+        with self.__send_lock:
+            if(message.generation != self.__generation):
+                # queued before the connection closed, sent again after the connect message of the new one
+                with self.__condition:
+                    self.__dropped += 1
+                message.future.set_exception(ConnectionError("Websocket closed before the message was sent"))
+                return
+            try:
+                self.__send(codec.dumps(message.data))
+            except Exception as e:
+                logger.warning(f"Couldn't send to websocket, {e}")
+                with self.__condition:
+                    self.__errors += 1
+                message.future.set_exception(e)
+                return
+        with self.__condition:
+            self.__sent += 1
+        if(self.__on_sent is not None):
+            self.__on_sent(message.data.get('t'), time.perf_counter() - message.queued)
+        message.future.set_result(True)
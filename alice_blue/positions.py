@@ -0,0 +1,233 @@
+import threading
+
+# positionBook is fetched at most this many times while fills land between it & the trade books around it
+LOAD_ATTEMPTS = 3
+
+# Product codes of websocket order messages -> product codes of positionBook response
+_PRODUCTS = {"I" : "MIS", "C" : "CNC", "M" : "NRML"}
+
+def _to_float(value):
+    if(value is None or value == ""):
+        return 0.0
+    try:
+        return float(str(value).replace(',', ''))
+    except ValueError:
+        return 0.0
+
+def _to_token(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+def get_fill_ids(trades):
+    """ (order number, fill id) of all fills of a tradeBook response """
+    fill_ids = set()
+    for trade in (trades if isinstance(trades, list) else []):
+        if(isinstance(trade, dict) and trade.get("FillId") is not None):
+            fill_ids.add((str(trade.get("Nstordno")), str(trade["FillId"])))
+    return fill_ids
+
+class Position:
+    """ Net position of an instrument & product. MTM is (sell amount - buy amount) + net quantity x ltp """
+    __slots__ = ('exchange', 'token', 'symbol', 'product', 'buy_quantity', 'sell_quantity',
+                 'buy_amount', 'sell_amount', 'ltp', 'mtm')
+
+    def __init__(self, exchange, token, symbol, product):
+        self.exchange = exchange
+        self.token = token
+        self.symbol = symbol
+        self.product = product
+        self.buy_quantity = 0
+        self.sell_quantity = 0
+        self.buy_amount = 0.0
+        self.sell_amount = 0.0
+        self.ltp = 0.0
+        self.mtm = 0.0
+
+    @property
+    def net_quantity(self):
+        return self.buy_quantity - self.sell_quantity
+
+    def calculate_mtm(self):
+        return self.sell_amount - self.buy_amount + self.net_quantity * self.ltp
+
+    def to_dict(self):
+        """ Position as a dict, with realised & unrealised profit split by average price """
+        net_quantity = self.net_quantity
+        buy_average = self.buy_amount / self.buy_quantity if(self.buy_quantity) else 0.0
+        sell_average = self.sell_amount / self.sell_quantity if(self.sell_quantity) else 0.0
+        if(net_quantity > 0):
+            unrealised = net_quantity * (self.ltp - buy_average)
+        elif(net_quantity < 0):
+            unrealised = net_quantity * (self.ltp - sell_average)
+        else:
+            unrealised = 0.0
+        return {"exchange"      : self.exchange,
+                "token"         : self.token,
+                "symbol"        : self.symbol,
+                "product"       : self.product,
+                "net_quantity"  : net_quantity,
+                "buy_quantity"  : self.buy_quantity,
+                "sell_quantity" : self.sell_quantity,
+                "buy_amount"    : self.buy_amount,
+                "sell_amount"   : self.sell_amount,
+                "buy_average"   : buy_average,
+                "sell_average"  : sell_average,
+                "ltp"           : self.ltp,
+                "mtm"           : self.mtm,
+                "realised"      : self.mtm - unrealised,
+                "unrealised"    : unrealised}
+
+class PositionsEngine:
+    """ Net positions kept up to date locally. Loaded from positionBook, then fills of websocket order updates
+        change quantities & amounts and ticks change the ltp. MTM of a position & the total MTM are updated
+        by the change alone, so a tick costs a dict lookup when no position has its token.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__positions = {}
+        self.__by_token = {}
+        self.__fill_ids = set()
+        self.__mtm = 0.0
+        # Fills received while positionBook is being fetched are applied after it's loaded
+        self.__pending = None
+
+    def __len__(self):
+        return len(self.__positions)
+
+    def begin_load(self):
+        """ Hold back fills till load() is called, so that they are not overwritten by the REST snapshot """
+        with self.__lock:
+            self.__pending = []
+
+    def cancel_load(self):
+        """ Apply fills held back by begin_load() without loading a REST snapshot """
+        with self.__lock:
+            pending = self.__pending or []
+            self.__pending = None
+            for message in pending:
+                self.__apply_fill(message)
+
+    def load(self, positions, trades=None):
+        """ Replace all positions with a positionBook response, ltp of positions is kept.
+            Fills held back since begin_load() are applied after it, except those in trades, a tradeBook
+            response whose fills are all in positionBook already.
+        """
+        with self.__lock:
+            self.__fill_ids.update(get_fill_ids(trades))
+            ltps = {key: p.ltp for key, p in self.__positions.items()}
+            self.__positions = {}
+            self.__by_token = {}
+            for p in (positions if isinstance(positions, list) else []):
+                if(not isinstance(p, dict) or p.get("Token") is None):
+                    continue
+                position = self.__get_position(p.get("Exchange"), p.get("Token"), p.get("Tsym"), p.get("Pcode"))
+                position.buy_quantity = int(_to_float(p.get("netbuyqty")))
+                position.sell_quantity = int(_to_float(p.get("netsellqty")))
+                position.buy_amount = _to_float(p.get("netbuyamt"))
+                position.sell_amount = _to_float(p.get("netSellamt"))
+                carried = int(_to_float(p.get("Netqty"))) - position.net_quantity
+                if(carried != 0):
+                    # Day quantities don't add up to net quantity, carried forward quantity is added to them
+                    # at the price which gives the same MTM as positionBook
+                    if(carried > 0):
+                        position.buy_quantity += carried
+                    else:
+                        position.sell_quantity -= carried
+                    position.ltp = _to_float(p.get("LTP"))
+                    position.buy_amount += position.calculate_mtm() - _to_float(p.get("MtoM"))
+                key = (position.exchange, position.token, position.product)
+                position.ltp = ltps.get(key) or _to_float(p.get("LTP"))
+                position.mtm = position.calculate_mtm()
+            self.__mtm = sum(p.mtm for p in self.__positions.values())
+            pending = self.__pending or []
+            self.__pending = None
+            for message in pending:
+                self.__apply_fill(message)
+
+    def __get_position(self, exchange, token, symbol, product):
+        token = _to_token(token)
+        key = (exchange, token, product)
+        position = self.__positions.get(key)
+        if(position is None):
+            position = self.__positions[key] = Position(exchange, token, symbol, product)
+            self.__by_token.setdefault((exchange, token), []).append(position)
+        return position
+
+    def apply_fill(self, message):
+        """ Apply the fill of a websocket order message, returns the position, None if it isn't a fill """
+        with self.__lock:
+            if(self.__pending is not None):
+                self.__pending.append(message)
+                return None
+            return self.__apply_fill(message)
+
+    def __apply_fill(self, message):
+        if(message.get("flid") is None or message.get("flqty") is None or message.get("token") is None):
+            return None
+        fill_id = (str(message.get("norenordno")), str(message["flid"]))
+        if(fill_id in self.__fill_ids):
+            return None
+        self.__fill_ids.add(fill_id)
+        product = _PRODUCTS.get(message.get("prd"), message.get("prd"))
+        position = self.__get_position(message.get("exch"), message["token"], message.get("tsym"), product)
+        quantity = int(_to_float(message["flqty"]))
+        amount = quantity * _to_float(message.get("flprc"))
+        if(str(message.get("trantype")).upper().startswith("B")):
+            position.buy_quantity += quantity
+            position.buy_amount += amount
+        else:
+            position.sell_quantity += quantity
+            position.sell_amount += amount
+        if(position.ltp == 0.0):
+            position.ltp = _to_float(message.get("flprc"))
+        mtm = position.calculate_mtm()
+        self.__mtm += mtm - position.mtm
+        position.mtm = mtm
+        return position
+
+    def update_ltp(self, exchange, token, ltp):
+        """ Apply the ltp of a tick to positions of its token """
+        if(not ltp):
+            return
+        with self.__lock:
+            # load() replaces __by_token, read it holding the lock
+            positions = self.__by_token.get((exchange, token))
+            if(positions is None):
+                return
+            for position in positions:
+                change = position.net_quantity * (ltp - position.ltp)
+                position.ltp = ltp
+                position.mtm += change
+                self.__mtm += change
+
+    def get_mtm(self):
+        """ Total MTM of all positions """
+        return self.__mtm
+
+    def get_position(self, instrument, product=None):
+        """ Position of an instrument as a dict, of the first product if product isn't given. None if there's no position """
+        with self.__lock:
+            for position in self.__by_token.get((instrument.exchange, int(instrument.token)), ()):
+                if(product is None or position.product == product):
+                    return position.to_dict()
+        return None
+
+    def get_positions(self, open_only=False):
+        """ All positions as dicts, only those with non zero net quantity if open_only """
+        with self.__lock:
+            return [p.to_dict() for p in self.__positions.values() if(open_only == False or p.net_quantity != 0)]
+
+    def get_totals(self):
+        """ Total MTM, realised & unrealised profit of all positions """
+        with self.__lock:
+            unrealised = sum(p.to_dict()["unrealised"] for p in self.__positions.values())
+            mtm = self.__mtm
+        return {"mtm" : mtm, "realised" : mtm - unrealised, "unrealised" : unrealised}
+
+    def get_tokens(self):
+        """ (exchange, token) of all positions """
+        with self.__lock:
+            return list(self.__by_token)
@@ -0,0 +1,116 @@
+from array import array
+import bisect
+import enum
+
+class SearchMatch(enum.Enum):
+    Contains = 'contains'
+    Prefix = 'prefix'
+    Exact = 'exact'
+
+class SearchIndex:
+    """ Index of the contracts of an exchange for search_instruments().
+        Contracts are searched by the first word of their symbol in lower case, results are in contract order.
+        With ngram, a trigram index narrows down substring searches of 3 or more characters, at the cost of memory.
+    """
+
+    def __init__(self, instruments, ngram=False):
+        self.__instruments = list(instruments)
+        # normalized key -> positions of contracts, in contract order
+        groups = {}
+        for pos, instrument in enumerate(self.__instruments):
+            key = instrument.symbol.split(' ')[0].lower()
+            if(key in groups):
+                groups[key].append(pos)
+            else:
+                groups[key] = [pos]
+        # Keys are identified by their place in sorted order, positions of a range of keys are a single slice
+        self.__keys = sorted(groups)
+        self.__positions = []
+        self.__offsets = [0]
+        for key in self.__keys:
+            self.__positions += groups[key]
+            self.__offsets.append(len(self.__positions))
+        # All keys in a single string, so that substrings are found by str.find at C speed
+        self.__starts = []
+        start = 0
+        for key in self.__keys:
+            self.__starts.append(start)
+            start += len(key) + 1
+        self.__text = "\n".join(self.__keys)
+        self.__ngrams = None
+        if(ngram == True):
+            self.__ngrams = {}
+            for key_id, key in enumerate(self.__keys):
+                for gram in {key[i:i + 3] for i in range(len(key) - 2)}:
+                    postings = self.__ngrams.get(gram)
+                    if(postings is None):
+                        postings = self.__ngrams[gram] = array("I")
+                    postings.append(key_id)
+
+    def __len__(self):
+        return len(self.__instruments)
+
+    def __contains_key_ids(self, term):
+        if("\n" in term):
+            return []
+        if(term == ""):
+            return range(len(self.__keys))
+        if(self.__ngrams is not None and len(term) >= 3):
+            # Keys having the rarest trigram of the term are the only candidates
+            rarest = None
+            for i in range(len(term) - 2):
+                postings = self.__ngrams.get(term[i:i + 3])
+                if(postings is None):
+                    return []
+                if(rarest is None or len(postings) < len(rarest)):
+                    rarest = postings
+            keys = self.__keys
+            return [key_id for key_id in rarest if term in keys[key_id]]
+        key_ids = []
+        text = self.__text
+        starts = self.__starts
+        i = text.find(term)
+        while(i != -1):
+            key_id = bisect.bisect_right(starts, i) - 1
+            key_ids.append(key_id)
+            if(key_id + 1 == len(starts)):
+                break
+            # Rest of this key doesn't matter, it has matched already
+            i = text.find(term, starts[key_id + 1])
+        return key_ids
+
+    def positions(self, term, match=SearchMatch.Contains):
+        """ Positions of contracts matching a search term, in contract order """
+        term = term.lower()
+        if(match == SearchMatch.Contains):
+            key_ids = self.__contains_key_ids(term)
+            if(isinstance(key_ids, range)):
+                return list(range(len(self.__instruments)))
+            if(len(key_ids) == 1):
+                return self.__positions[self.__offsets[key_ids[0]]:self.__offsets[key_ids[0] + 1]]
+            positions = []
+            for key_id in key_ids:
+                positions += self.__positions[self.__offsets[key_id]:self.__offsets[key_id + 1]]
+            positions.sort()
+            return positions
+        lo = bisect.bisect_left(self.__keys, term)
+        if(match == SearchMatch.Exact):
+            hi = lo + 1 if(lo < len(self.__keys) and self.__keys[lo] == term) else lo
+        else:
+            hi = bisect.bisect_left(self.__keys, term + "\U0010ffff")
+        positions = self.__positions[self.__offsets[lo]:self.__offsets[hi]]
+        if(hi - lo > 1):
+            positions.sort()
+        return positions
+
+    def search(self, terms, match=SearchMatch.Contains):
+        """ Contracts matching a term or any of a list of terms.
+            As in a linear scan, a contract matching more than one term is repeated once per term.
+        """
+        if(not isinstance(terms, list)):
+            return [self.__instruments[pos] for pos in self.positions(terms, match)]
+        matches = []
+        for n, term in enumerate(terms):
+            matches += [(pos, n) for pos in self.positions(term, match)]
+        matches.sort()
+        return [self.__instruments[pos] for pos, n in matches]
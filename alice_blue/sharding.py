@@ -0,0 +1,270 @@
+from time import sleep
+import enum
+import logging
+import threading
+import time
+import websocket
+
+from .outbound import OutboundQueue
+from .subscriptions import DEFAULT_BATCH_SIZE, _unsubscribe_types, get_subscription_frames
+
+logger = logging.getLogger(__name__)
+
+class ShardBalance(enum.Enum):
+    Count = 'count'                 # same number of instruments on every connection
+    Rate = 'rate'                   # same number of frames per second on every connection
+
+# Instruments which didn't tick are weighed as this many frames/sec with ShardBalance.Rate,
+# so they are still spread by count
+_MIN_RATE = 0.1
+
+class _Shard:
+    """ One websocket connection with its own reader & writer threads, and the subscriptions it carries """
+
+    def __init__(self, index, url, feed, mutex, batch_size):
+        self.index = index
+        self.batch_size = batch_size
+        self.feed = feed
+        self.mutex = mutex
+        self.subscriptions = {}         # instrument -> subscribe message type, 't' or 'd'
+        self.connected = False
+        self.running = True
+        self.connections = 0
+        self.frames = 0
+        self.websocket = websocket.WebSocketApp(url,
+                                                on_data=self.on_data,
+                                                on_error=self.on_error,
+                                                on_close=self.on_close,
+                                                on_open=self.on_open)
+        self.thread = threading.Thread(target=self.run_forever, name=f"alice_blue_websocket_{index}")
+        self.thread.daemon = True
+        self.outbound = OutboundQueue(self.write, name=f"alice_blue_writer_{index}")
+
+    def start(self):
+        self.outbound.start()
+        self.thread.start()
+
+    def run_forever(self):
+        while(self.running):
+            try:
+                self.websocket.run_forever(ping_interval=3, ping_payload='{"t":"h"}')
+            except Exception as e:
+                logger.warning(f"websocket {self.index} run forever ended in exception, {e}")
+            sleep(0.1) # Sleep for 100ms between reconnection.
+
+    def on_data(self, ws=None, message=None, data_type=None, continue_flag=None):
+        if(type(ws) is not websocket.WebSocketApp): # compatibility with older versions of websocket_client
+            message = ws
+        self.frames += 1
+        self.feed.on_message(self, message)
+
+    def on_open(self, ws=None):
+        self.connected = True
+        self.connections += 1
+        self.feed.on_open(self)
+
+    def on_close(self, *arguments, **keywords):
+        self.connected = False
+        self.outbound.set_connected(False)
+        self.feed.on_close(self)
+
+    def on_error(self, ws=None, error=None):
+        if(type(ws) is not websocket.WebSocketApp): # compatibility with older versions of websocket_client
+            error = ws
+        self.feed.on_error(self, error)
+
+    def write(self, message):
+        with self.mutex:
+            self.websocket.send(message)
+
+    def send(self, data):
+        """ Queue a message to be sent by the writer, False if not connected. Subscriptions are sent again when it connects """
+        if(self.connected == False):
+            return False
+        self.outbound.put(data)
+        return True
+
+    def send_subscriptions(self, subscriptions):
+        types = {}
+        for instrument, message_type in subscriptions.items():
+            types.setdefault(message_type, []).append(instrument)
+        for message_type, instruments in types.items():
+            self.send_frames(instruments, message_type)
+
+    def send_frames(self, instruments, message_type):
+        for frame in get_subscription_frames(instruments, message_type, self.batch_size):
+            self.send(frame)
+
+    def stop(self):
+        self.running = False
+        self.outbound.stop()
+        self.websocket.close()
+
+class ShardedFeed:
+    """ Subscriptions spread over several websocket connections, each read by its own thread.
+        New instruments go to the connection with the least load, by instrument count or observed frame rate.
+        When a connection is opened again, subscriptions of it & of overloaded connections are balanced over all
+        connected ones. Frames of every connection are given to on_message(shard, message).
+        Shard 0 is the primary connection, meant for order updates.
+    """
+
+    def __init__(self, url, shards, connect_payload, on_message, on_open=None, on_close=None, on_error=None,
+                 balance=ShardBalance.Count, primary_mutex=None, batch_size=DEFAULT_BATCH_SIZE):
+        self.__connect_payload = connect_payload
+        self.__on_message = on_message
+        self.__on_open = on_open
+        self.__on_close = on_close
+        self.__on_error = on_error
+        self.__balance = balance
+        self.__lock = threading.Lock()
+        self.__owners = {}              # instrument -> shard carrying it
+        self.__frames = {}              # instrument -> frames in current rate window
+        self.__rates = {}               # instrument -> frames/sec in last rate window
+        self.__window_start = time.time()
+        self.__rebalances = 0
+        self.__moved = 0
+        self.__shards = [_Shard(i, url, self, primary_mutex if(i == 0 and primary_mutex is not None) else threading.Lock(),
+                                batch_size) for i in range(shards)]
+
+    def start(self):
+        for shard in self.__shards:
+            shard.start()
+
+    def stop(self):
+        for shard in self.__shards:
+            shard.stop()
+
+    def get_shard(self, index):
+        return self.__shards[index]
+
+    def on_message(self, shard, message):
+        self.__on_message(shard, message)
+
+    def on_open(self, shard):
+        # Connect message goes ahead of anything queued while the connection was closed
+        shard.outbound.set_connected(True, self.__connect_payload)
+        with self.__lock:
+            self.__rebalance(shard)
+        if(self.__on_open is not None):
+            self.__on_open(shard)
+
+    def on_close(self, shard):
+        if(self.__on_close is not None):
+            self.__on_close(shard)
+
+    def on_error(self, shard, error):
+        if(self.__on_error is not None):
+            self.__on_error(shard, error)
+
+    def count(self, instrument):
+        """ Count a frame of instrument, for ShardBalance.Rate. Called with frames of all shards serialized """
+        self.__frames[instrument] = self.__frames.get(instrument, 0) + 1
+
+    def subscribe(self, instruments, message_type):
+        """ Subscribe instruments ('t' tick or 'd' depth message type), new ones on the least loaded connections """
+        with self.__lock:
+            weight = self.__get_weight()
+            candidates = [s for s in self.__shards if s.connected] or self.__shards
+            loads = self.__get_loads(candidates, weight)
+            added = {}
+            for instrument in instruments:
+                shard = self.__owners.get(instrument)
+                if(shard is None):
+                    shard = min(candidates, key=lambda s: loads[s.index])
+                    loads[shard.index] += weight(instrument)
+                    self.__owners[instrument] = shard
+                shard.subscriptions[instrument] = message_type
+                added.setdefault(shard.index, {})[instrument] = message_type
+            for index, subscriptions in added.items():
+                self.__shards[index].send_subscriptions(subscriptions)
+
+    def unsubscribe(self, instruments, message_type):
+        """ Unsubscribe instruments ('u' tick or 'ud' depth message type) from connections carrying them """
+        with self.__lock:
+            removed = {}
+            for instrument in instruments:
+                shard = self.__owners.pop(instrument, None)
+                if(shard is None):
+                    continue
+                shard.subscriptions.pop(instrument, None)
+                self.__frames.pop(instrument, None)
+                self.__rates.pop(instrument, None)
+                removed.setdefault(shard.index, []).append(instrument)
+            for index, instruments in removed.items():
+                self.__shards[index].send_frames(instruments, message_type)
+
+    def get_stats(self):
+        """ Connection state, reconnections, instruments, frames & frames/sec of last rate window of every shard """
+        with self.__lock:
+            rates = self.__rates
+            shards = [{"index"          : s.index,
+                       "connected"      : s.connected,
+                       "connections"    : s.connections,
+                       "instruments"    : len(s.subscriptions),
+                       "frames"         : s.frames,
+                       "rate"           : sum(rates.get(i, 0.0) for i in s.subscriptions)} for s in self.__shards]
+            return {"shards" : shards, "rebalances" : self.__rebalances, "moved" : self.__moved}
+
+    def __update_rates(self):
+        now = time.time()
+        elapsed = now - self.__window_start
+        if(elapsed < 1 or len(self.__frames) == 0):
+            return
+        frames = self.__frames
+        self.__rates = {i : frames.get(i, 0) / elapsed for i in self.__owners}
+        self.__frames = {}
+        self.__window_start = now
+
+    def __get_weight(self):
+        """ Load of an instrument, 1 with ShardBalance.Count, its frames/sec with ShardBalance.Rate """
+        if(self.__balance == ShardBalance.Count):
+            return lambda instrument: 1
+        rates = self.__rates
+        # Instruments subscribed after the last rate window are taken as average ones
+        default = max(sum(rates.values()) / len(rates), _MIN_RATE) if(len(rates) > 0) else 1.0
+        return lambda instrument: max(rates.get(instrument, default), _MIN_RATE)
+
+    def __get_loads(self, shards, weight):
+        return {s.index : sum(weight(i) for i in s.subscriptions) for s in shards}
+
+    def __rebalance(self, shard):
+        """ shard is (re)connected, so all its subscriptions are to be sent anyway. Subscriptions above the
+            average load of the other connected shards are moved to it, its own go to the least loaded shards.
+        """
+        if(self.__balance == ShardBalance.Rate):
+            self.__update_rates()
+        weight = self.__get_weight()
+        connected = [s for s in self.__shards if s.connected]
+        loads = self.__get_loads(connected, weight)
+        target = sum(loads.values()) / len(connected)
+        pool = shard.subscriptions
+        shard.subscriptions = {}
+        loads[shard.index] = 0
+        for other in connected:
+            if(other is shard or loads[other.index] <= target):
+                continue
+            moved = {}
+            for instrument in sorted(other.subscriptions, key=weight, reverse=True):
+                if(loads[other.index] <= target):
+                    break
+                if(loads[other.index] - weight(instrument) >= target):
+                    moved[instrument] = other.subscriptions.pop(instrument)
+                    loads[other.index] -= weight(instrument)
+            if(len(moved) > 0):
+                for message_type in set(moved.values()):
+                    other.send_frames([i for i, t in moved.items() if t == message_type], _unsubscribe_types[message_type])
+                pool.update(moved)
+        added = {}
+        for instrument in sorted(pool, key=weight, reverse=True):
+            owner = min(connected, key=lambda s: loads[s.index])
+            loads[owner.index] += weight(instrument)
+            if(self.__owners.get(instrument) is not owner):
+                self.__moved += 1
+            owner.subscriptions[instrument] = pool[instrument]
+            self.__owners[instrument] = owner
+            if(owner is not shard):
+                added.setdefault(owner.index, {})[instrument] = pool[instrument]
+        shard.send_subscriptions(shard.subscriptions)
+        for index, subscriptions in added.items():
+            self.__shards[index].send_subscriptions(subscriptions)
+        self.__rebalances += 1
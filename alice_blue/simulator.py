@@ -0,0 +1,717 @@
+import argparse
+import base64
+import datetime
+import hashlib
+import itertools
+import json
+import logging
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytz
+
+from .alice_blue import _host, _urls, _get_urls
+
+logger = logging.getLogger(__name__)
+
+# Websocket (RFC 6455) framing, only what NorenWS clients use
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_OP_TEXT = 0x1
+_OP_CLOSE = 0x8
+_OP_PING = 0x9
+_OP_PONG = 0xA
+
+_IST = pytz.timezone("Asia/Kolkata")
+# Product codes of websocket order messages
+_PRODUCT_CODES = {"MIS" : "I", "CNC" : "C", "NRML" : "M"}
+_FIRST_TOKEN = 1001
+_INDEX_TOKEN = 26000
+
+def _encode_frame(payload, opcode=_OP_TEXT):
+    """ Unmasked websocket frame of a server """
+    length = len(payload)
+    if(length < 126):
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif(length < 65536):
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+def _unmask(payload, mask):
+    length = len(payload)
+    key = (mask * (length // 4 + 1))[:length]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+
+def _read_frame(rfile):
+    """ (fin, opcode, payload) of a frame sent by a client, None if the connection is closed """
+    header = rfile.read(2)
+    if(len(header) < 2):
+        return None
+    fin = header[0] & 0x80
+    opcode = header[0] & 0x0F
+    length = header[1] & 0x7F
+    if(length == 126):
+        length = struct.unpack("!H", rfile.read(2))[0]
+    elif(length == 127):
+        length = struct.unpack("!Q", rfile.read(8))[0]
+    mask = rfile.read(4) if(header[1] & 0x80) else None
+    payload = rfile.read(length)
+    if(len(payload) < length):
+        return None
+    if(mask is not None and length > 0):
+        payload = _unmask(payload, mask)
+    return fin, opcode, payload
+
+def _now_us():
+    return int(time.time() * 1000000)
+
+def _format_price(value):
+    return f"{value:.2f}"
+
+class _Quote:
+    """ Random walk of the price & volume of a token """
+    __slots__ = ('symbol', 'close', 'open', 'high', 'low', 'ltp', 'volume')
+
+    def __init__(self, symbol, price):
+        self.symbol = symbol
+        self.close = price
+        self.open = price
+        self.high = price
+        self.low = price
+        self.ltp = price
+        self.volume = 0
+
+    def step(self, rand):
+        self.ltp = max(0.05, round(self.ltp + rand.choice((-0.10, -0.05, 0.0, 0.05, 0.10)), 2))
+        self.high = max(self.high, self.ltp)
+        self.low = min(self.low, self.ltp)
+        self.volume += rand.randint(1, 50)
+
+class _Session:
+    """ A websocket client of the simulator """
+
+    def __init__(self, simulator, sock):
+        self.simulator = simulator
+        self.sock = sock
+        self.send_lock = threading.Lock()
+        self.closed = threading.Event()
+        self.connected = False
+        self.order_updates = False
+        # (exchange, token) -> True for depth, False for tick subscriptions, in subscription order
+        self.subscriptions = {}
+        self.frames_sent = 0
+
+    def send(self, messages):
+        """ Send text messages in a single write """
+        data = b"".join(_encode_frame(m.encode("utf-8")) for m in messages)
+        self.send_raw(data)
+        self.frames_sent += len(messages)
+
+    def send_raw(self, data):
+        with self.send_lock:
+            self.sock.sendall(data)
+
+    def close(self):
+        self.closed.set()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+class _Handler(BaseHTTPRequestHandler):
+    """ REST stub & websocket upgrade on the same port, with keep-alive connections """
+    protocol_version = "HTTP/1.1"
+    # Headers & body are separate writes, which would wait for delayed ACKs with Nagle's algorithm
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def do_GET(self):
+        if(self.headers.get("Upgrade", "").lower() == "websocket"):
+            self.__upgrade()
+        else:
+            self.__rest(None)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if(length > 0) else b""
+        try:
+            data = json.loads(body) if(len(body) > 0) else None
+        except ValueError:
+            self.__reply(400, {"stat" : "Not_Ok", "emsg" : "Invalid JSON"})
+            return
+        self.__rest(data)
+
+    do_PUT = do_POST
+    do_DELETE = do_POST
+
+    def __rest(self, data):
+        url = urlparse(self.path)
+        params = {k : v[0] for k, v in parse_qs(url.query).items()}
+        status, response = self.server.simulator.handle_rest(url.path, params, data)
+        self.__reply(status, response)
+
+    def __reply(self, status, response):
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def __upgrade(self):
+        key = self.headers.get("Sec-WebSocket-Key", "")
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.close_connection = True
+        simulator = self.server.simulator
+        session = _Session(simulator, self.request)
+        simulator.add_session(session)
+        try:
+            self.__read_frames(session)
+        except (OSError, struct.error) as e:
+            logger.debug(f"Websocket client {self.address_string()} dropped, {e}")
+        finally:
+            session.closed.set()
+            simulator.remove_session(session)
+
+    def __read_frames(self, session):
+        fragments = []
+        while(not session.closed.is_set()):
+            frame = _read_frame(self.rfile)
+            if(frame is None):
+                return
+            fin, opcode, payload = frame
+            if(opcode == _OP_CLOSE):
+                session.send_raw(_encode_frame(payload[:2], _OP_CLOSE))
+                return
+            if(opcode == _OP_PING):
+                session.send_raw(_encode_frame(payload, _OP_PONG))
+                continue
+            if(opcode == _OP_PONG):
+                continue
+            fragments.append(payload)
+            if(fin):
+                message = b"".join(fragments)
+                fragments = []
+                session.simulator.handle_message(session, message.decode("utf-8"))
+
+class _Server(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class Simulator:
+    """ Local stand-in of alice blue REST & websocket (NorenWS) servers, for load testing & benchmarks.
+
+        Master contracts have tokens NSE equities (SIM0-EQ, SIM1-EQ, ...), their NFO futures & an index. Every websocket connection
+        gets synthetic tf/df frames of its subscribed tokens at rate frames per second. Any session id is
+        accepted. Orders are filled at ltp when marketable, limit orders which aren't & stop loss orders stay
+        open till cancelled. Fills are pushed as websocket order messages & show up in order, trade & position books.
+
+        with Simulator(tokens=1000, rate=20000) as simulator:
+            alice = AliceBlue(username, "session", urls=simulator.urls)
+    """
+
+    def __init__(self, address="127.0.0.1", port=0, tokens=100, rate=1000, send_times=False, seed=None):
+        """ Frames carry 'st', their send time in epoch microseconds if send_times is True, which is given
+            to subscribe_callback as it is. With rate 0 only acknowledgements & order messages are sent.
+        """
+        if not isinstance(tokens, int) or tokens < 1:
+            raise TypeError("Optional parameter tokens not of type positive int")
+        self.__address = address
+        self.__port = port
+        self.__tokens = tokens
+        self.__rate = rate
+        self.__send_times = send_times
+        self.__rand = random.Random(seed)
+        self.__server = None
+        self.__thread = None
+        self.__lock = threading.Lock()
+        self.__sessions = []
+        self.__quotes = {}
+        self.__orders = {}
+        self.__order_histories = {}
+        self.__trades = []
+        self.__order_ids = itertools.count(int(datetime.datetime.now(_IST).strftime("%y%m%d")) * 1000000000 + 1)
+        self.__fill_ids = itertools.count(1)
+        self.__frames_sent = 0
+        self.__rest_calls = 0
+        self.__contracts = self.__get_contracts()
+        self.__handlers = {"profile"            : self.__profile,
+                           "master_contract"    : self.__master_contract,
+                           "createWsSession"    : self.__ok,
+                           "placeOrder"         : self.__place_order,
+                           "modifyOrder"        : self.__modify_order,
+                           "cancelOrder"        : self.__cancel_order,
+                           "exitBracketOrder"   : self.__cancel_order,
+                           "fetchOrder"         : self.__order_book,
+                           "orderHistory"       : self.__order_history,
+                           "fetchTrade"         : self.__trade_book,
+                           "positions"          : self.__positions,
+                           "sqrOfPosition"      : self.__square_off,
+                           "holdings"           : self.__holdings,
+                           "getRmsLimits"       : self.__limits,
+                           "scripDetails"       : self.__scrip_details,
+                           "history"            : self.__history}
+        self.__routes = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """ Start serving on a background thread """
+        self.__server = _Server((self.__address, self.__port), _Handler)
+        self.__server.simulator = self
+        self.__port = self.__server.server_address[1]
+        self.__routes = {urlparse(url).path : name for name, url in self.urls.items() if name != "ws"}
+        self.__thread = threading.Thread(target=self.__server.serve_forever, kwargs={"poll_interval" : 0.1})
+        self.__thread.daemon = True
+        self.__thread.start()
+        logger.info(f"Simulator serving on {self.host}")
+        return self
+
+    def stop(self):
+        """ Stop serving & close all websocket connections """
+        if(self.__server is None):
+            return
+        self.__server.shutdown()
+        with self.__lock:
+            sessions = list(self.__sessions)
+        for session in sessions:
+            session.close()
+        self.__server.server_close()
+        self.__server = None
+
+    def serve_forever(self):
+        """ Serve till interrupted """
+        if(self.__server is None):
+            self.start()
+        try:
+            while(True):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    @property
+    def host(self):
+        """ host to be given to AliceBlue for REST endpoints """
+        return f"http://{self.__address}:{self.__port}{urlparse(_host).path}"
+
+    @property
+    def urls(self):
+        """ URLs of all endpoints to be given to AliceBlue """
+        base = f"{self.__address}:{self.__port}"
+        return _get_urls(self.host, {"master_contract" : f"http://{base}{urlparse(_urls['master_contract']).path}?exch={{exchange}}",
+                                     "ws"              : f"ws://{base}{urlparse(_urls['ws']).path}"})
+
+    def set_rate(self, rate):
+        """ Change frames per second of every websocket connection """
+        self.__rate = rate
+
+    def get_stats(self):
+        """ Websocket connections, frames sent, REST calls & orders placed so far """
+        with self.__lock:
+            return {"connections"   : len(self.__sessions),
+                    "frames_sent"   : self.__frames_sent + sum(s.frames_sent for s in self.__sessions),
+                    "rest_calls"    : self.__rest_calls,
+                    "orders"        : len(self.__orders)}
+
+    # Websocket
+
+    def add_session(self, session):
+        with self.__lock:
+            self.__sessions.append(session)
+        thread = threading.Thread(target=self.__feed, args=(session,))
+        thread.daemon = True
+        thread.start()
+
+    def remove_session(self, session):
+        with self.__lock:
+            if(session in self.__sessions):
+                self.__sessions.remove(session)
+                self.__frames_sent += session.frames_sent
+
+    def handle_message(self, session, message):
+        try:
+            data = json.loads(message)
+        except ValueError:
+            logger.warning(f"Simulator received an invalid websocket message {message}")
+            return
+        t = data.get("t")
+        if(t == "c"):
+            session.connected = True
+            session.send([json.dumps({"t" : "ck", "s" : "OK", "uid" : data.get("uid")})])
+        elif(session.connected == False):
+            logger.warning(f"Simulator received {message} before connect message")
+        elif(t in ("t", "d")):
+            keys = self.__get_keys(data.get("k"))
+            with self.__lock:
+                acks = [self.__get_ack(key, t == "d") for key in keys]
+            for key in keys:
+                session.subscriptions[key] = (t == "d")
+            session.send(acks)
+        elif(t in ("u", "ud")):
+            for key in self.__get_keys(data.get("k")):
+                if(session.subscriptions.get(key) == (t == "ud")):
+                    del session.subscriptions[key]
+        elif(t == "o"):
+            session.order_updates = True
+            session.send([json.dumps({"t" : "ok"})])
+
+    @staticmethod
+    def __get_keys(subscribe_string):
+        keys = []
+        for item in str(subscribe_string or "").split("#"):
+            exchange, _, token = item.partition("|")
+            if(len(token) > 0):
+                keys.append((exchange, str(int(token))))
+        return keys
+
+    def __get_quote(self, key):
+        quote = self.__quotes.get(key)
+        if(quote is None):
+            contract = self.__contracts.get(key)
+            symbol = contract["trading_symbol"] if(contract is not None) else key[1]
+            quote = self.__quotes[key] = _Quote(symbol, 100.0 + int(key[1]) % 900)
+        return quote
+
+    def __get_ack(self, key, depth):
+        quote = self.__get_quote(key)
+        ack = {"t" : "dk" if(depth) else "tk", "pp" : "2", "ml" : "1", "e" : key[0], "tk" : key[1], "ts" : quote.symbol,
+               "ls" : "1", "ti" : "0.05", "c" : _format_price(quote.close), "lp" : _format_price(quote.ltp),
+               "pc" : f"{(quote.ltp - quote.close) / quote.close * 100:.2f}", "o" : _format_price(quote.open),
+               "h" : _format_price(quote.high), "l" : _format_price(quote.low), "toi" : "0",
+               "ft" : str(int(time.time())), "v" : str(quote.volume), "ap" : _format_price(quote.ltp)}
+        if(depth):
+            ack.update({"uc" : _format_price(quote.close * 1.1), "lc" : _format_price(quote.close * 0.9),
+                        "ltq" : "1", "ltt" : datetime.datetime.now(_IST).strftime("%H:%M:%S"), "tbq" : "0", "tsq" : "0"})
+        ack.update(self.__get_levels(quote, 5 if(depth) else 1))
+        return json.dumps(ack)
+
+    def __get_levels(self, quote, levels):
+        fields = {}
+        for n in range(1, levels + 1):
+            fields[f"bp{n}"] = _format_price(quote.ltp - 0.05 * n)
+            fields[f"sp{n}"] = _format_price(quote.ltp + 0.05 * n)
+            fields[f"bq{n}"] = str(self.__rand.randint(1, 500))
+            fields[f"sq{n}"] = str(self.__rand.randint(1, 500))
+            if(levels > 1):
+                fields[f"bo{n}"] = str(self.__rand.randint(1, 10))
+                fields[f"so{n}"] = str(self.__rand.randint(1, 10))
+        return fields
+
+    def __get_frame(self, key, depth):
+        quote = self.__get_quote(key)
+        quote.step(self.__rand)
+        frame = {"t" : "df" if(depth) else "tf", "e" : key[0], "tk" : key[1], "lp" : _format_price(quote.ltp),
+                 "ft" : str(int(time.time())), "v" : str(quote.volume)}
+        if(depth):
+            frame["ltt"] = datetime.datetime.now(_IST).strftime("%H:%M:%S")
+        frame.update(self.__get_levels(quote, 5 if(depth) else 1))
+        if(self.__send_times == True):
+            frame["st"] = str(_now_us())
+        return json.dumps(frame, separators=(",", ":"))
+
+    def __feed(self, session):
+        """ Send frames of subscribed tokens round robin, paced to rate frames per second """
+        sent = 0
+        start = time.perf_counter()
+        position = 0
+        rate = self.__rate
+        while(not session.closed.wait(0.001)):
+            if(self.__rate != rate):
+                rate = self.__rate
+                sent = 0
+                start = time.perf_counter()
+            subscriptions = list(session.subscriptions.items())
+            if(rate <= 0 or session.connected == False or len(subscriptions) == 0):
+                sent = 0
+                start = time.perf_counter()
+                continue
+            due = int((time.perf_counter() - start) * rate) - sent
+            if(due <= 0):
+                continue
+            frames = []
+            with self.__lock:
+                for n in range(due):
+                    key, depth = subscriptions[(position + n) % len(subscriptions)]
+                    frames.append(self.__get_frame(key, depth))
+            position = (position + due) % len(subscriptions)
+            sent += due
+            try:
+                session.send(frames)
+            except OSError:
+                return
+
+    def __push_order_update(self, message):
+        with self.__lock:
+            sessions = [s for s in self.__sessions if s.order_updates]
+        frame = json.dumps(message)
+        for session in sessions:
+            try:
+                session.send([frame])
+            except OSError:
+                pass
+
+    # REST
+
+    def handle_rest(self, path, params, data):
+        """ (HTTP status, response) of a REST call """
+        name = self.__routes.get(path)
+        handler = self.__handlers.get(name, self.__ok if(name is not None) else None)
+        if(handler is None):
+            return 404, {"stat" : "Not_Ok", "emsg" : f"Unknown endpoint {path}"}
+        with self.__lock:
+            self.__rest_calls += 1
+        try:
+            return 200, handler(params, data)
+        except (KeyError, TypeError, ValueError) as e:
+            return 200, {"stat" : "Not_Ok", "emsg" : f"Invalid request, {e}"}
+
+    def __ok(self, params, data):
+        return {"stat" : "Ok"}
+
+    def __profile(self, params, data):
+        return {"accountStatus" : "Activated", "accountId" : "SIMULATOR", "accountName" : "SIMULATOR",
+                "exchEnabled" : "nse_cm|nse_fo|", "emailAddr" : "", "cellAddr" : "", "dpType" : "CDSL"}
+
+    def __get_contracts(self):
+        today = datetime.datetime.now(_IST).date()
+        expiry = today + datetime.timedelta(days=(3 - today.weekday()) % 7)
+        expiry_ms = int(datetime.datetime(expiry.year, expiry.month, expiry.day, tzinfo=pytz.utc).timestamp() * 1000)
+        contracts = {("NSE", str(_INDEX_TOKEN)) : {"exchange" : "NSE", "token" : str(_INDEX_TOKEN), "symbol" : "SIM INDEX",
+                                                   "trading_symbol" : "SIM INDEX", "formatted_ins_name" : "SIM INDEX"}}
+        for n in range(self.__tokens):
+            token = str(_FIRST_TOKEN + n)
+            contracts[("NSE", token)] = {"exchange" : "NSE", "token" : token, "symbol" : f"SIM{n}",
+                                         "trading_symbol" : f"SIM{n}-EQ", "formatted_ins_name" : f"SIMULATED {n}",
+                                         "lot_size" : "1", "tick_size" : "0.05"}
+            token = str(_FIRST_TOKEN + self.__tokens + n)
+            symbol = f"SIM{n}{expiry.strftime('%y%b').upper()}FUT"
+            contracts[("NFO", token)] = {"exchange" : "NFO", "token" : token, "symbol" : f"SIM{n}",
+                                         "trading_symbol" : symbol, "formatted_ins_name" : f"SIM{n} {expiry.strftime('%b').upper()} FUT",
+                                         "lot_size" : "50", "tick_size" : "0.05", "expiry_date" : expiry_ms}
+        return contracts
+
+    def __master_contract(self, params, data):
+        exchange = params.get("exch", "").upper()
+        body = {"contract_date" : datetime.datetime.now(_IST).strftime("%d-%m-%Y")}
+        if(exchange == "INDICES"):
+            body["NSE"] = [self.__contracts[("NSE", str(_INDEX_TOKEN))]]
+        else:
+            body[exchange] = [c for k, c in self.__contracts.items() if k[0] == exchange and k[1] != str(_INDEX_TOKEN)]
+        return body
+
+    def __place_order(self, params, data):
+        orders = data if(isinstance(data, list)) else [data]
+        responses = []
+        messages = []
+        with self.__lock:
+            for order in orders:
+                order_id, order_messages = self.__new_order(order)
+                responses.append({"stat" : "Ok", "NOrdNo" : order_id})
+                messages += order_messages
+        for message in messages:
+            self.__push_order_update(message)
+        return responses
+
+    def __new_order(self, order):
+        key = (str(order["exch"]), str(int(order["symbol_id"])))
+        quote = self.__get_quote(key)
+        order_id = str(next(self.__order_ids))
+        price = float(order.get("price") or 0)
+        entry = {"Nstordno" : order_id, "Status" : "open", "Exchange" : key[0], "Trsym" : order.get("trading_symbol") or quote.symbol,
+                 "token" : key[1], "Qty" : int(order["qty"]), "Prc" : _format_price(price),
+                 "Trgprc" : _format_price(float(order.get("trigPrice") or 0)), "Prctype" : order["prctyp"],
+                 "Trantype" : "B" if(str(order["transtype"]).upper().startswith("B")) else "S", "Pcode" : order.get("pCode"),
+                 "Fillshares" : 0, "Avgprc" : "0.00", "remarks" : str(order.get("orderTag") or ""), "RejReason" : "",
+                 "ExchOrdID" : "", "OrderedTime" : datetime.datetime.now(_IST).strftime("%d/%m/%Y %H:%M:%S")}
+        self.__orders[order_id] = entry
+        self.__order_histories[order_id] = []
+        messages = [self.__record(entry, "New")]
+        if(entry["Prctype"] in ("SL", "SL-M")):
+            entry["Status"] = "trigger pending"
+            messages.append(self.__record(entry, "New"))
+        elif(entry["Prctype"] != "L" or (entry["Trantype"] == "B" and price >= quote.ltp) or (entry["Trantype"] == "S" and price <= quote.ltp)):
+            messages.append(self.__fill(entry, quote.ltp))
+        return order_id, messages
+
+    def __fill(self, entry, price):
+        fill_id = str(next(self.__fill_ids))
+        now = datetime.datetime.now(_IST).strftime("%d-%m-%Y %H:%M:%S")
+        entry["Status"] = "complete"
+        entry["Fillshares"] = entry["Qty"]
+        entry["Avgprc"] = _format_price(price)
+        entry["ExchOrdID"] = f"1{entry['Nstordno'][-9:]}"
+        self.__trades.append({"Nstordno" : entry["Nstordno"], "FillId" : fill_id, "Fillqty" : entry["Qty"],
+                              "Price" : _format_price(price), "Filledqty" : entry["Qty"], "AvgPrice" : _format_price(price),
+                              "Filltime" : now, "Exchange" : entry["Exchange"], "Tsym" : entry["Trsym"], "Symbol" : entry["token"],
+                              "Trantype" : entry["Trantype"], "Pcode" : entry["Pcode"]})
+        message = self.__record(entry, "Fill")
+        message.update({"flid" : fill_id, "flqty" : str(entry["Qty"]), "flprc" : _format_price(price), "fltm" : now})
+        return message
+
+    def __record(self, entry, report_type):
+        """ Websocket order message of the current state of an order, which is added to its history """
+        self.__order_histories[entry["Nstordno"]].append(dict(entry, reporttype=report_type))
+        return {"t" : "om", "norenordno" : entry["Nstordno"], "status" : entry["Status"], "reporttype" : report_type,
+                "exch" : entry["Exchange"], "tsym" : entry["Trsym"], "token" : entry["token"], "qty" : str(entry["Qty"]),
+                "prc" : entry["Prc"], "trgprc" : entry["Trgprc"], "prctyp" : entry["Prctype"], "trantype" : entry["Trantype"],
+                "prd" : _PRODUCT_CODES.get(entry["Pcode"], entry["Pcode"]), "fillshares" : str(entry["Fillshares"]),
+                "avgprc" : entry["Avgprc"], "remarks" : entry["remarks"], "exchordid" : entry["ExchOrdID"]}
+
+    def __change_order(self, data, change):
+        with self.__lock:
+            entry = self.__orders.get(str(data["nestOrderNumber"]))
+            if(entry is None):
+                return {"stat" : "Not_Ok", "emsg" : "Order not found"}
+            if(entry["Status"] not in ("open", "trigger pending")):
+                return {"stat" : "Not_Ok", "emsg" : f"Order is {entry['Status']}"}
+            message = change(entry)
+        self.__push_order_update(message)
+        return {"stat" : "Ok", "nestOrderNumber" : entry["Nstordno"]}
+
+    def __modify_order(self, params, data):
+        def modify(entry):
+            entry["Qty"] = int(data.get("qty") or entry["Qty"])
+            entry["Prc"] = _format_price(float(data.get("price") or entry["Prc"]))
+            entry["Trgprc"] = _format_price(float(data.get("trigPrice") or entry["Trgprc"]))
+            entry["Prctype"] = data.get("prctyp") or entry["Prctype"]
+            return self.__record(entry, "Replaced")
+        return self.__change_order(data, modify)
+
+    def __cancel_order(self, params, data):
+        def cancel(entry):
+            entry["Status"] = "cancelled"
+            return self.__record(entry, "Canceled")
+        return self.__change_order(data, cancel)
+
+    def __order_book(self, params, data):
+        with self.__lock:
+            if(len(self.__orders) == 0):
+                return {"stat" : "Not_Ok", "emsg" : "No Data"}
+            return [dict(o, stat="Ok") for o in reversed(list(self.__orders.values()))]
+
+    def __order_history(self, params, data):
+        with self.__lock:
+            history = self.__order_histories.get(str(data["nestOrderNumber"]))
+            if(history is None):
+                return {"stat" : "Not_Ok", "emsg" : "Order not found"}
+            return [dict(h, stat="Ok") for h in reversed(history)]
+
+    def __trade_book(self, params, data):
+        with self.__lock:
+            if(len(self.__trades) == 0):
+                return {"stat" : "Not_Ok", "emsg" : "No Data"}
+            return [dict(t, stat="Ok") for t in self.__trades]
+
+    def __get_positions(self):
+        positions = {}
+        for trade in self.__trades:
+            key = (trade["Exchange"], trade["Symbol"], trade["Pcode"])
+            position = positions.setdefault(key, {"Tsym" : trade["Tsym"], "buy_qty" : 0, "sell_qty" : 0, "buy_amt" : 0.0, "sell_amt" : 0.0})
+            amount = trade["Fillqty"] * float(trade["Price"])
+            if(trade["Trantype"] == "B"):
+                position["buy_qty"] += trade["Fillqty"]
+                position["buy_amt"] += amount
+            else:
+                position["sell_qty"] += trade["Fillqty"]
+                position["sell_amt"] += amount
+        return positions
+
+    def __positions(self, params, data):
+        result = []
+        with self.__lock:
+            for (exchange, token, product), p in self.__get_positions().items():
+                ltp = self.__get_quote((exchange, token)).ltp
+                net = p["buy_qty"] - p["sell_qty"]
+                mtm = p["sell_amt"] - p["buy_amt"] + net * ltp
+                result.append({"Exchange" : exchange, "Token" : token, "Tsym" : p["Tsym"], "Pcode" : product,
+                               "Netqty" : str(net), "netbuyqty" : str(p["buy_qty"]), "netsellqty" : str(p["sell_qty"]),
+                               "netbuyamt" : _format_price(p["buy_amt"]), "netSellamt" : _format_price(p["sell_amt"]),
+                               "LTP" : _format_price(ltp), "MtoM" : _format_price(mtm), "stat" : "Ok"})
+        if(len(result) == 0):
+            return {"stat" : "Not_Ok", "emsg" : "No Data"}
+        return result
+
+    def __square_off(self, params, data):
+        with self.__lock:
+            key = (str(data["exchSeg"]), str(int(data["tockenNo"])), data.get("pCode"))
+            position = self.__get_positions().get(key)
+            net = 0 if(position is None) else position["buy_qty"] - position["sell_qty"]
+        if(net == 0):
+            return {"stat" : "Not_Ok", "emsg" : "No open position"}
+        order = {"exch" : key[0], "symbol_id" : key[1], "trading_symbol" : data.get("symbol"), "qty" : abs(net),
+                 "prctyp" : "MKT", "transtype" : "SELL" if(net > 0) else "BUY", "pCode" : key[2]}
+        return self.__place_order(params, [order])[0]
+
+    def __holdings(self, params, data):
+        return {"stat" : "Not_Ok", "emsg" : "No Data", "HoldingVal" : []}
+
+    def __limits(self, params, data):
+        return [{"stat" : "Ok", "segment" : "ALL", "net" : "1000000.00", "cashmarginavailable" : "1000000.00",
+                 "debits" : "0.00", "credits" : "1000000.00"}]
+
+    def __scrip_details(self, params, data):
+        with self.__lock:
+            quote = self.__get_quote((str(data["exch"]), str(int(data["symbol"]))))
+            return {"stat" : "Ok", "LTP" : _format_price(quote.ltp), "Ltp" : _format_price(quote.ltp), "TSymbl" : quote.symbol,
+                    "openPrice" : _format_price(quote.open), "High" : _format_price(quote.high), "Low" : _format_price(quote.low),
+                    "PrvClose" : _format_price(quote.close), "TradeVolume" : str(quote.volume)}
+
+    def __history(self, params, data):
+        """ Synthetic minute bars from 09:15 to 15:29 IST of week days, or day bars, in [from, to] """
+        start = int(data["from"]) // 1000
+        end = int(data["to"]) // 1000
+        daily = (str(data["resolution"]).upper() in ("D", "1D"))
+        token = int(data["token"])
+        bars = []
+        day = datetime.datetime.fromtimestamp(start, _IST).date()
+        while(_IST.localize(datetime.datetime.combine(day, datetime.time())).timestamp() <= end):
+            if(day.weekday() < 5):
+                opening = int(_IST.localize(datetime.datetime.combine(day, datetime.time(9, 15))).timestamp())
+                times = [opening] if(daily) else range(opening, opening + 375 * 60, 60)
+                for t in times:
+                    if(start <= t <= end):
+                        price = 100.0 + token % 900 + (t // 60) % 97 * 0.05
+                        bars.append({"volume" : float(1000 + (t // 60) % 500), "high" : round(price + 0.5, 2), "low" : round(price - 0.5, 2),
+                                     "time" : datetime.datetime.fromtimestamp(t, _IST).strftime("%Y-%m-%d %H:%M:%S"),
+                                     "close" : round(price + 0.2, 2), "open" : round(price, 2)})
+            day += datetime.timedelta(days=1)
+        if(len(bars) == 0):
+            return {"stat" : "Not_Ok", "emsg" : "No data available"}
+        return {"stat" : "Ok", "result" : bars}
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in of alice blue REST & websocket servers")
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tokens", type=int, default=100, help="NSE tokens in master contract")
+    parser.add_argument("--rate", type=int, default=1000, help="frames per second of every websocket connection")
+    parser.add_argument("--send-times", action="store_true", help="add send time 'st' to frames")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    simulator = Simulator(args.address, args.port, args.tokens, args.rate, args.send_times).start()
+    print(f"urls = {json.dumps(simulator.urls, indent=4)}")
+    simulator.serve_forever()
+
+if __name__ == "__main__":
+    main()
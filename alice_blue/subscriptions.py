@@ -0,0 +1,320 @@
+from concurrent.futures import Future
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Instruments in one subscribe/unsubscribe frame
+DEFAULT_BATCH_SIZE = 500
+# Seconds to wait for the tk/dk acknowledgment of a subscription before sending it again
+_ACK_TIMEOUT = 5
+_MAX_ATTEMPTS = 3
+# Unsubscribe message type of a subscribe message type
+_unsubscribe_types = {'t' : 'u', 'd' : 'ud'}
+
+def get_subscription_frames(instruments, message_type, batch_size=DEFAULT_BATCH_SIZE):
+    """ Subscribe/unsubscribe messages of instruments, batch_size instruments in each """
+    frames = []
+    for i in range(0, len(instruments), batch_size):
+        frames.append({'k' : "#".join([f"{instrument.exchange}|{int(instrument.token)}" for instrument in instruments[i:i + batch_size]]),
+                       't' : message_type})
+    return frames
+
+class _Waiter:
+    """ Future of the acknowledgment of subscriptions & the instruments not acknowledged yet """
+
+    def __init__(self, instruments, remaining, deadline):
+        self.future = Future()
+        self.instruments = instruments
+        self.remaining = remaining
+        self.deadline = deadline
+        self.error = None
+
+class SubscriptionManager:
+    """ Desired subscriptions ('t' tick or 'd' depth of every instrument) reconciled with those sent to the server
+        & acknowledged by it. Only the differences are sent, with send(message_type, instruments) of up to
+        batch_size instruments, 'u'/'ud' for unsubscribe. Changes are sent right away, or debounce seconds after
+        the first of them, so subscribing & unsubscribing an instrument in between sends nothing. Changing the type
+        of an instrument unsubscribes the old one first. Subscriptions not acknowledged in time are sent again.
+        subscribe() can give a Future of the acknowledgment of its instruments.
+    """
+
+    def __init__(self, send, batch_size=DEFAULT_BATCH_SIZE, debounce=0, ack_timeout=_ACK_TIMEOUT):
+        self.__send = send
+        self.__batch_size = batch_size
+        self.__debounce = debounce
+        self.__ack_timeout = ack_timeout
+        self.__condition = threading.Condition()
+        # Flushes are serialized, so frames are sent in the order their changes were made
+        self.__flush_lock = threading.Lock()
+        self.__desired = {}             # instrument -> message type wanted
+        self.__active = {}              # instrument -> message type sent & not unsubscribed since
+        self.__pending = {}             # instrument -> (time sent, attempts, (exchange, token)), not acknowledged yet
+        self.__keys = {}                # (exchange, token) -> instrument, of pending
+        self.__acknowledged = set()
+        self.__dirty = set()            # instruments changed since last flush
+        self.__dirty_since = None
+        self.__waiters = {}             # instrument -> waiters of its acknowledgment
+        self.__waiting = []
+        self.__done = []                # waiters to be resolved out of the lock
+        self.__connected = True
+        self.__thread = None
+        self.__stopped = False
+        self.__frames = 0
+        self.__sent = 0
+        self.__flushes = 0
+        self.__resent = 0
+        self.__unacknowledged = 0
+
+    def subscribe(self, instruments, message_type, acknowledgment=False, timeout=None):
+        """ Want instruments in message type 't' or 'd'. With acknowledgment, returns a Future which is done with
+            instruments when all of them are acknowledged (or unsubscribed or subscribed with another type in between).
+            It fails with TimeoutError if they aren't acknowledged in timeout seconds or after all attempts.
+        """
+        waiter = None
+        with self.__condition:
+            desired = self.__desired
+            if(len(self.__waiters) > 0):
+                for instrument in instruments:
+                    # waiters of an instrument are of its desired type
+                    if(instrument in self.__waiters and desired.get(instrument) != message_type):
+                        self.__settle(instrument)
+            if(acknowledgment == True):
+                active = self.__active
+                acknowledged = self.__acknowledged
+                remaining = set(i for i in instruments if i not in acknowledged or active.get(i) != message_type)
+                waiter = _Waiter(instruments, remaining, None if(timeout is None) else time.time() + timeout)
+                if(len(remaining) == 0):
+                    self.__done.append(waiter)
+                else:
+                    for instrument in remaining:
+                        self.__waiters.setdefault(instrument, []).append(waiter)
+                    self.__waiting.append(waiter)
+            for instrument in instruments:
+                desired[instrument] = message_type
+            self.__changed(instruments)
+        self.__resolve()
+        self.__flush_now()
+        return None if(waiter is None) else waiter.future
+
+    def unsubscribe(self, instruments):
+        """ Don't want instruments any more """
+        with self.__condition:
+            for instrument in instruments:
+                self.__desired.pop(instrument, None)
+                if(instrument in self.__waiters):
+                    self.__settle(instrument)
+            self.__changed(instruments)
+        self.__resolve()
+        self.__flush_now()
+
+    def acknowledge(self, exchange, token, message_type):
+        """ Record the tk ('t') or dk ('d') acknowledgment of a subscription """
+        with self.__condition:
+            instrument = self.__keys.get((exchange, token))
+            if(instrument is None or self.__active.get(instrument) != message_type):
+                return
+            del self.__keys[(exchange, token)]
+            self.__pending.pop(instrument, None)
+            self.__acknowledged.add(instrument)
+            if(instrument in self.__waiters):
+                self.__settle(instrument)
+        self.__resolve()
+
+    def set_connected(self, connected):
+        """ While not connected changes are only recorded. On connection everything desired is sent again,
+            as the server forgets subscriptions of a closed connection
+        """
+        with self.__condition:
+            self.__connected = connected
+            if(connected == True):
+                self.__active = {}
+                self.__pending = {}
+                self.__keys = {}
+                self.__acknowledged = set()
+                self.__changed(list(self.__desired))
+        if(connected == True):
+            self.flush()
+
+    def flush(self):
+        """ Send the differences between desired & sent subscriptions now """
+        with self.__flush_lock:
+            with self.__condition:
+                if(self.__connected == False or len(self.__dirty) == 0):
+                    return
+                batches = self.__get_changes()
+            self.__resolve()
+            for message_type, instruments in batches:
+                self.__send(message_type, instruments)
+                with self.__condition:
+                    self.__frames += 1
+                    self.__sent += len(instruments)
+
+    def stop(self):
+        """ Stop resending, Futures of acknowledgments not received yet are cancelled """
+        with self.__condition:
+            self.__stopped = True
+            waiting = self.__waiting
+            self.__waiters = {}
+            self.__waiting = []
+            self.__condition.notify_all()
+        for waiter in waiting:
+            waiter.future.cancel()
+
+    def get_desired(self):
+        """ instrument -> 't' or 'd' of all wanted subscriptions """
+        with self.__condition:
+            return dict(self.__desired)
+
+    def get_stats(self):
+        """ Number of desired, sent (active), acknowledged & pending subscriptions and counters of what is sent """
+        with self.__condition:
+            return {"desired"       : len(self.__desired),
+                    "active"        : len(self.__active),
+                    "acknowledged"  : len(self.__acknowledged),
+                    "pending"       : len(self.__pending),
+                    "dirty"         : len(self.__dirty),
+                    "flushes"       : self.__flushes,
+                    "messages"      : self.__frames,
+                    "instruments"   : self.__sent,
+                    "resent"        : self.__resent,
+                    "unacknowledged": self.__unacknowledged,
+                    "waiting"       : len(self.__waiting)}
+
+    def __changed(self, instruments):
+        if(len(self.__dirty) == 0):
+            self.__dirty_since = time.time()
+        self.__dirty.update(instruments)
+        self.__condition.notify_all()
+
+    def __flush_now(self):
+        self.__start()
+        if(self.__debounce == 0):
+            self.flush()
+
+    def __get_changes(self):
+        """ (message type, instruments) to send for dirty instruments, state is updated as if they are sent """
+        adds = {}
+        removes = {}
+        now = time.time()
+        desired = self.__desired
+        active = self.__active
+        pending = self.__pending
+        for instrument in self.__dirty:
+            wanted = desired.get(instrument)
+            current = active.get(instrument)
+            if(wanted is None):
+                if(current is not None):
+                    removes.setdefault(_unsubscribe_types[current], []).append(instrument)
+                    del active[instrument]
+                    self.__forget(instrument)
+                continue
+            if(wanted == current):
+                if(instrument not in pending):
+                    continue            # subscribed & acknowledged, or subscribed & unsubscribed in between
+                sent, attempts, key = pending[instrument]
+                if(now - sent < self.__ack_timeout):
+                    continue
+                if(attempts >= _MAX_ATTEMPTS):
+                    logger.warning(f"No acknowledgment of subscription of {instrument} after {attempts} attempts")
+                    self.__forget(instrument)
+                    self.__unacknowledged += 1
+                    if(instrument in self.__waiters):
+                        self.__settle(instrument, TimeoutError(f"No acknowledgment of subscription of {instrument}"))
+                    continue
+                self.__resent += 1
+            else:
+                attempts = 0
+                if(current is not None):
+                    # the old type is unsubscribed first, the feed keeps sending it otherwise
+                    removes.setdefault(_unsubscribe_types[current], []).append(instrument)
+                    self.__forget(instrument)
+                key = (instrument.exchange, str(int(instrument.token)))
+            adds.setdefault(wanted, []).append(instrument)
+            active[instrument] = wanted
+            pending[instrument] = (now, attempts + 1, key)
+            self.__keys[key] = instrument
+        self.__dirty = set()
+        self.__dirty_since = None
+        self.__flushes += 1
+        batches = []
+        for changes in (removes, adds):
+            for message_type, instruments in changes.items():
+                for i in range(0, len(instruments), self.__batch_size):
+                    batches.append((message_type, instruments[i:i + self.__batch_size]))
+        return batches
+
+    def __settle(self, instrument, error=None):
+        """ instrument isn't awaited any more by its waiters, those with nothing else to wait for are done """
+        for waiter in self.__waiters.pop(instrument):
+            waiter.remaining.discard(instrument)
+            if(error is not None):
+                waiter.error = error
+            if(len(waiter.remaining) == 0):
+                self.__waiting.remove(waiter)
+                self.__done.append(waiter)
+
+    def __expire(self, now):
+        for waiter in [w for w in self.__waiting if w.deadline is not None and w.deadline <= now]:
+            for instrument in waiter.remaining:
+                waiters = self.__waiters[instrument]
+                waiters.remove(waiter)
+                if(len(waiters) == 0):
+                    del self.__waiters[instrument]
+            waiter.error = TimeoutError(f"{len(waiter.remaining)} of {len(waiter.instruments)} subscriptions not acknowledged in time")
+            self.__waiting.remove(waiter)
+            self.__done.append(waiter)
+
+    def __resolve(self):
+        """ Set results of done waiters, out of the lock as callbacks of Futures run in it """
+        with self.__condition:
+            if(len(self.__done) == 0):
+                return
+            done = self.__done
+            self.__done = []
+        for waiter in done:
+            if(waiter.error is None):
+                waiter.future.set_result(waiter.instruments)
+            else:
+                waiter.future.set_exception(waiter.error)
+
+    def __forget(self, instrument):
+        state = self.__pending.pop(instrument, None)
+        if(state is not None):
+            self.__keys.pop(state[2], None)
+        self.__acknowledged.discard(instrument)
+
+    def __start(self):
+        if(self.__thread is None):
+            self.__thread = threading.Thread(target=self.__run_forever, name="alice_blue_subscriptions")
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def __run_forever(self):
+        """ Flushes debounce seconds after the first change & sends again subscriptions not acknowledged in time """
+        # The thread is started by the first subscribe/unsubscribe
+        while True:
+            with self.__condition:
+                while(not self.__stopped):
+                    now = time.time()
+                    deadlines = []
+                    if(self.__connected == False):
+                        pass                # everything is sent again on connection
+                    elif(self.__dirty_since is not None):
+                        deadlines.append(self.__dirty_since + self.__debounce)
+                    if(self.__connected == True and len(self.__pending) > 0):
+                        deadlines.append(min(state[0] for state in self.__pending.values()) + self.__ack_timeout)
+                    deadlines.extend(w.deadline for w in self.__waiting if w.deadline is not None)
+                    if(len(deadlines) > 0 and min(deadlines) <= now):
+                        break
+                    self.__condition.wait(min(deadlines) - now if(len(deadlines) > 0) else None)
+                if(self.__stopped):
+                    return
+                self.__expire(now)
+                # pending ones past their timeout are checked again by the flush
+                for instrument, state in self.__pending.items():
+                    if(now - state[0] >= self.__ack_timeout):
+                        self.__changed([instrument])
+            self.__resolve()
+            self.flush()
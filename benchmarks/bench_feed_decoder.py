@@ -0,0 +1,263 @@
+""" Frames/sec of the websocket tick/depth decoder, before and after the table driven FeedDecoder
+
+    python benchmarks/bench_feed_decoder.py
+"""
+import datetime
+import json
+import os
+import sys
+import timeit
+from collections import namedtuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from alice_blue.feed import FeedDecoder
+
+Instrument = namedtuple('Instrument', ['exchange', 'token', 'symbol',
+                                       'name', 'expiry', 'lot_size'])
+INFY = Instrument('NSE', 1594, 'INFY-EQ', 'INFOSYS LIMITED', None, 1)
+
+# Sample messages from AliceBlue.__on_data_callback
+MESSAGES = {
+    "tk" : '{"t":"tk","pp":"2","ml":"1","e":"NSE","tk":"1594","ts":"INFY-EQ","ls":"1","ti":"0.05","c":"1492.95","lp":"1464.55","pc":"-1.90","o":"1460.05","h":"1468.10","l":"1451.05","toi":"59451300","ft":"1662025323","v":"7397051","bp1":"1464.50","sp1":"1464.90","bq1":"22","sq1":"285","ap":"1460.13"}',
+    "dk" : '{"t":"dk","pp":"2","ml":"1","e":"NSE","tk":"1594","ts":"INFY-EQ","ls":"1","ti":"0.05","c":"1492.95","lp":"1464.55","pc":"-1.90","o":"1460.05","h":"1468.10","l":"1451.05","uc":"1642.20","lc":"1343.70","toi":"59451300","ft":"1662025323","ltq":"47","ltt":"15:12:02","v":"7397051","tbq":"512544","tsq":"2368667","bp1":"1464.50","sp1":"1464.90","bp2":"1464.35","sp2":"1464.95","bp3":"1464.25","sp3":"1465.00","bp4":"1464.20","sp4":"1465.05","bp5":"1464.15","sp5":"1465.10","bq1":"22","sq1":"285","bq2":"88","sq2":"299","bq3":"460","sq3":"4173","bq4":"50","sq4":"300","bq5":"317","sq5":"242","bo1":"1","so1":"4","bo2":"1","so2":"6","bo3":"1","so3":"43","bo4":"1","so4":"1","bo5":"2","so5":"2","ap":"1460.13"}',
+    "tf" : '{"t":"tf","e":"NSE","tk":"1594","ft":"1662025326","v":"7399482","bp1":"1464.25","sp1":"1464.35","bq1":"460","sq1":"11"}',
+    "df" : '{"t":"df","e":"NSE","tk":"1594","ft":"1662025327","v":"7400196","ltt":"15:12:07","tbq":"510593","tsq":"2364472","bp1":"1464.55","sp1":"1464.90","bp2":"1464.30","sp2":"1464.95","bp3":"1464.25","sp3":"1465.00","bp4":"1464.20","sp4":"1465.05","bp5":"1464.15","sp5":"1465.10","bq1":"1","sq1":"301","bq2":"598","sq2":"61","bq3":"83","sq3":"3573","bq4":"175","sq4":"300","bq5":"482","sq5":"51","bo2":"5","so2":"4","bo3":"2","so3":"42","bo4":"3","so4":"1","bo5":"5","so5":"2"}',
+}
+
+MASTER_CONTRACTS_BY_TOKEN = {'NSE' : {1594 : INFY}}
+
+def lookup(exchange, token):
+    """ same work as AliceBlue.get_instrument_by_token """
+    exchange = exchange.upper()
+    token = int(token)
+    if exchange not in MASTER_CONTRACTS_BY_TOKEN:
+        return None
+    master_contract = MASTER_CONTRACTS_BY_TOKEN[exchange]
+    if token not in master_contract:
+        return None
+    return master_contract[token]
+
+class LegacyDecoder:
+    """ The per key if-chain decoder which was used before FeedDecoder """
+
+    def __init__(self, instrument_lookup):
+        self.__instrument_lookup = instrument_lookup
+        self.__tick_data = {}
+        self.__depth_data = {}
+
+    def extract_tick_data(self, data):
+        if("tk" in data):               # Token
+            data["instrument"] = self.__instrument_lookup(data.pop("e"), int(data.pop("tk")))
+        if("ts" in data):               # Symbol
+            data.pop("ts")
+        if(data["instrument"].symbol not in self.__tick_data):
+            self.__tick_data[data["instrument"].symbol] = {}
+            self.__tick_data[data["instrument"].symbol]["ltp"] = 0
+            self.__tick_data[data["instrument"].symbol]["percent_change"] = 0
+            self.__tick_data[data["instrument"].symbol]["change_value"] = 0
+            self.__tick_data[data["instrument"].symbol]["volume"] = 0
+            self.__tick_data[data["instrument"].symbol]["open"] = 0
+            self.__tick_data[data["instrument"].symbol]["high"] = 0
+            self.__tick_data[data["instrument"].symbol]["low"] = 0
+            self.__tick_data[data["instrument"].symbol]["close"] = 0
+            self.__tick_data[data["instrument"].symbol]["exchange_time_stamp"] = None
+            self.__tick_data[data["instrument"].symbol]["atp"] = 0
+            self.__tick_data[data["instrument"].symbol]["tick_increment"] = 0
+            self.__tick_data[data["instrument"].symbol]["lot_size"] = 0
+            self.__tick_data[data["instrument"].symbol]["price_precision"] = 0
+            self.__tick_data[data["instrument"].symbol]["total_open_interest"] = 0
+        if("lp" in data):               # Last Traded Price
+            self.__tick_data[data["instrument"].symbol]["ltp"] = float(data.pop("lp"))
+        if("pc" in data):               # percentage change
+            self.__tick_data[data["instrument"].symbol]["percent_change"] = float(data.pop("pc"))
+        if("cv" in data):               # change value (absolute change in price)
+            self.__tick_data[data["instrument"].symbol]["change_value"] = float(data.pop("cv"))
+        if("v" in data):                # Volume
+            self.__tick_data[data["instrument"].symbol]["volume"] = int(data.pop("v"))
+        if("o" in data):                # Open
+            self.__tick_data[data["instrument"].symbol]["open"] = float(data.pop("o"))
+        if("h" in data):                # High
+            self.__tick_data[data["instrument"].symbol]["high"] = float(data.pop("h"))
+        if("l" in data):                # Low
+            self.__tick_data[data["instrument"].symbol]["low"] = float(data.pop("l"))
+        if("c" in data):                # Close
+            self.__tick_data[data["instrument"].symbol]["close"] = float(data.pop("c"))
+        if("ft" in data):               # Feed Time
+            self.__tick_data[data["instrument"].symbol]["exchange_time_stamp"] = datetime.datetime.fromtimestamp(int(data.pop("ft")))
+        if("ap" in data):               # Average Price
+            self.__tick_data[data["instrument"].symbol]["atp"] = float(data.pop("ap"))
+        if("ti" in data):               # Tick Increment
+            self.__tick_data[data["instrument"].symbol]["tick_increment"] = float(data.pop("ti"))
+        if("ls" in data):               # Lot Size
+            self.__tick_data[data["instrument"].symbol]["lot_size"] = int(data.pop("ls"))
+        if(data["instrument"].symbol not in self.__depth_data):                # Initialize depth data
+            self.__depth_data[data["instrument"].symbol] = {}
+            self.__depth_data[data["instrument"].symbol]["bid_prices"]          = [None, None, None, None, None]
+            self.__depth_data[data["instrument"].symbol]["ask_prices"]          = [None, None, None, None, None]
+            self.__depth_data[data["instrument"].symbol]["bid_quantities"]      = [None, None, None, None, None]
+            self.__depth_data[data["instrument"].symbol]["ask_quantities"]      = [None, None, None, None, None]
+            self.__depth_data[data["instrument"].symbol]["buy_orders"]          = [None, None, None, None, None]
+            self.__depth_data[data["instrument"].symbol]["sell_orders"]         = [None, None, None, None, None]
+            self.__depth_data[data["instrument"].symbol]["open_interest"]       = 0
+            self.__depth_data[data["instrument"].symbol]["last_traded_quantity"]= 0
+            self.__depth_data[data["instrument"].symbol]["last_traded_time"]    = None
+            self.__depth_data[data["instrument"].symbol]["total_buy_quantity"]  = 0
+            self.__depth_data[data["instrument"].symbol]["total_sell_quantity"] = 0
+            self.__depth_data[data["instrument"].symbol]["upper_circuit"]       = 0
+            self.__depth_data[data["instrument"].symbol]["lower_circuit"]       = 0
+
+        if("bp1" in data):               # Best Bid
+            self.__depth_data[data["instrument"].symbol]["bid_prices"][0] = float(data.pop("bp1"))
+        if("sp1" in data):               # Best Ask
+            self.__depth_data[data["instrument"].symbol]["ask_prices"][0] = float(data.pop("sp1"))
+        if("bq1" in data):               # Best Bid Quantity
+            self.__depth_data[data["instrument"].symbol]["bid_quantities"][0] = int(data.pop("bq1"))
+        if("sq1" in data):               # Best Ask Quantity
+            self.__depth_data[data["instrument"].symbol]["ask_quantities"][0] = int(data.pop("sq1"))
+        if("pp" in data):                # Price Precision
+            self.__tick_data[data["instrument"].symbol]["price_precision"] = int(data.pop("pp"))
+        if("toi" in data):               # Total Open Interest
+            self.__tick_data[data["instrument"].symbol]["total_open_interest"] = int(data.pop("toi"))
+        data["ltp"]                 = self.__tick_data[data["instrument"].symbol]["ltp"]
+        data["percent_change"]      = self.__tick_data[data["instrument"].symbol]["percent_change"]
+        data["change_value"]        = self.__tick_data[data["instrument"].symbol]["change_value"]
+        data["volume"]              = self.__tick_data[data["instrument"].symbol]["volume"]
+        data["open"]                = self.__tick_data[data["instrument"].symbol]["open"]
+        data["high"]                = self.__tick_data[data["instrument"].symbol]["high"]
+        data["low"]                 = self.__tick_data[data["instrument"].symbol]["low"]
+        data["close"]               = self.__tick_data[data["instrument"].symbol]["close"]
+        data["exchange_time_stamp"] = self.__tick_data[data["instrument"].symbol]["exchange_time_stamp"]
+        data["atp"]                 = self.__tick_data[data["instrument"].symbol]["atp"]
+        data["tick_increment"]      = self.__tick_data[data["instrument"].symbol]["tick_increment"]
+        data["lot_size"]            = self.__tick_data[data["instrument"].symbol]["lot_size"]
+        data["best_bid_price"]      = self.__depth_data[data["instrument"].symbol]["bid_prices"][0]
+        data["best_ask_price"]      = self.__depth_data[data["instrument"].symbol]["ask_prices"][0]
+        data["best_bid_quantity"]   = self.__depth_data[data["instrument"].symbol]["bid_quantities"][0]
+        data["best_ask_quantity"]   = self.__depth_data[data["instrument"].symbol]["ask_quantities"][0]
+        data["price_precision"]     = self.__tick_data[data["instrument"].symbol]["price_precision"]
+        data["total_open_interest"] = self.__tick_data[data["instrument"].symbol]["total_open_interest"]
+        return data
+    
+    def extract_depth_data(self, data):
+        # Extract tick data first
+        data = self.extract_tick_data(data)
+
+        # Bid Prices
+        if("bp2" in data):
+            self.__depth_data[data["instrument"].symbol]["bid_prices"][1] = float(data.pop("bp2"))
+        if("bp3" in data):
+            self.__depth_data[data["instrument"].symbol]["bid_prices"][2] = float(data.pop("bp3"))
+        if("bp4" in data):
+            self.__depth_data[data["instrument"].symbol]["bid_prices"][3] = float(data.pop("bp4"))
+        if("bp5" in data):
+            self.__depth_data[data["instrument"].symbol]["bid_prices"][4] = float(data.pop("bp5"))
+
+        # Ask Prices
+        if("sp2" in data):
+            self.__depth_data[data["instrument"].symbol]["ask_prices"][1] = float(data.pop("sp2"))
+        if("sp3" in data):
+            self.__depth_data[data["instrument"].symbol]["ask_prices"][2] = float(data.pop("sp3"))
+        if("sp4" in data):
+            self.__depth_data[data["instrument"].symbol]["ask_prices"][3] = float(data.pop("sp4"))
+        if("sp5" in data):
+            self.__depth_data[data["instrument"].symbol]["ask_prices"][4] = float(data.pop("sp5"))
+
+        # Bid Quantities
+        if("bq2" in data):
+            self.__depth_data[data["instrument"].symbol]["bid_quantities"][1] = int(data.pop("bq2"))
+        if("bq3" in data):
+            self.__depth_data[data["instrument"].symbol]["bid_quantities"][2] = int(data.pop("bq3"))
+        if("bq4" in data):
+            self.__depth_data[data["instrument"].symbol]["bid_quantities"][3] = int(data.pop("bq4"))
+        if("bq5" in data):
+            self.__depth_data[data["instrument"].symbol]["bid_quantities"][4] = int(data.pop("bq5"))
+
+        # Ask Quantities
+        if("sq2" in data):
+            self.__depth_data[data["instrument"].symbol]["ask_quantities"][1] = int(data.pop("sq2"))
+        if("sq3" in data):
+            self.__depth_data[data["instrument"].symbol]["ask_quantities"][2] = int(data.pop("sq3"))
+        if("sq4" in data):
+            self.__depth_data[data["instrument"].symbol]["ask_quantities"][3] = int(data.pop("sq4"))
+        if("sq5" in data):
+            self.__depth_data[data["instrument"].symbol]["ask_quantities"][4] = int(data.pop("sq5"))
+
+        # Buy Orders
+        if("bo1" in data):
+            self.__depth_data[data["instrument"].symbol]["buy_orders"][1] = int(data.pop("bo1"))
+        if("bo2" in data):
+            self.__depth_data[data["instrument"].symbol]["buy_orders"][1] = int(data.pop("bo2"))
+        if("bo3" in data):
+            self.__depth_data[data["instrument"].symbol]["buy_orders"][2] = int(data.pop("bo3"))
+        if("bo4" in data):
+            self.__depth_data[data["instrument"].symbol]["buy_orders"][3] = int(data.pop("bo4"))
+        if("bo5" in data):
+            self.__depth_data[data["instrument"].symbol]["buy_orders"][4] = int(data.pop("bo5"))
+
+        # Sell Orders
+        if("so1" in data):
+            self.__depth_data[data["instrument"].symbol]["sell_orders"][1] = int(data.pop("so1"))
+        if("so2" in data):
+            self.__depth_data[data["instrument"].symbol]["sell_orders"][1] = int(data.pop("so2"))
+        if("so3" in data):
+            self.__depth_data[data["instrument"].symbol]["sell_orders"][2] = int(data.pop("so3"))
+        if("so4" in data):
+            self.__depth_data[data["instrument"].symbol]["sell_orders"][3] = int(data.pop("so4"))
+        if("so5" in data):
+            self.__depth_data[data["instrument"].symbol]["sell_orders"][4] = int(data.pop("so5"))
+
+        # Update depth data in dict
+        data["bid_prices"] = self.__depth_data[data["instrument"].symbol]["bid_prices"].copy()
+        data["ask_prices"] = self.__depth_data[data["instrument"].symbol]["ask_prices"].copy()
+        data["bid_quantities"] = self.__depth_data[data["instrument"].symbol]["bid_quantities"].copy()
+        data["ask_quantities"] = self.__depth_data[data["instrument"].symbol]["ask_quantities"].copy()
+        data["buy_orders"] = self.__depth_data[data["instrument"].symbol]["buy_orders"].copy()
+        data["sell_orders"] = self.__depth_data[data["instrument"].symbol]["sell_orders"].copy()
+
+        if("oi" in data):               # Open Interest
+            self.__depth_data[data["instrument"].symbol]["open_interest"] = int(data.pop("oi"))
+        if("ltq" in data):               # Last Traded Quantity
+            self.__depth_data[data["instrument"].symbol]["last_traded_quantity"] = int(data.pop("ltq"))
+        if("ltt" in data):               # Last Traded Time
+            self.__depth_data[data["instrument"].symbol]["last_traded_time"] = datetime.datetime.strptime(data.pop("ltt"), "%H:%M:%S").time()
+        if("tbq" in data):               # Total Buy Quantity
+            self.__depth_data[data["instrument"].symbol]["total_buy_quantity"] = int(data.pop("tbq"))
+        if("tsq" in data):               # Total Sell Quantity
+            self.__depth_data[data["instrument"].symbol]["total_sell_quantity"] = int(data.pop("tsq"))
+        if("uc" in data):               # Upper Circuit
+            self.__depth_data[data["instrument"].symbol]["upper_circuit"] = float(data.pop("uc"))
+        if("lc" in data):               # Lower Circuit
+            self.__depth_data[data["instrument"].symbol]["lower_circuit"] = float(data.pop("lc"))
+
+        data["open_interest"]           = self.__depth_data[data["instrument"].symbol]["open_interest"]
+        data["last_traded_quantity"]    = self.__depth_data[data["instrument"].symbol]["last_traded_quantity"]
+        data["last_traded_time"]        = self.__depth_data[data["instrument"].symbol]["last_traded_time"] 
+        data["total_buy_quantity"]      = self.__depth_data[data["instrument"].symbol]["total_buy_quantity"]
+        data["total_sell_quantity"]     = self.__depth_data[data["instrument"].symbol]["total_sell_quantity"]
+        data["upper_circuit"]           = self.__depth_data[data["instrument"].symbol]["upper_circuit"]
+        data["lower_circuit"]           = self.__depth_data[data["instrument"].symbol]["lower_circuit"]
+        return data
+
+def frames_per_sec(decode, frame, number, repeat=5):
+    """ decode is given a fresh copy of the frame each time, as json.loads would give """
+    seconds = min(timeit.repeat(lambda: decode(dict(frame)), number=number, repeat=repeat))
+    copy_seconds = min(timeit.repeat(lambda: dict(frame), number=number, repeat=repeat))
+    return number / max(seconds - copy_seconds, 1e-9)
+
+def main(number=100000):
+    legacy = LegacyDecoder(lookup)
+    decoder = FeedDecoder(lookup)
+    print(f"{'frame':<6}{'legacy frames/sec':>20}{'FeedDecoder frames/sec':>25}{'speedup':>10}")
+    for t, message in MESSAGES.items():
+        frame = json.loads(message)
+        frame.pop("t")
+        if(t in ("tk", "tf")):
+            before = frames_per_sec(legacy.extract_tick_data, frame, number)
+            after = frames_per_sec(decoder.decode_tick, frame, number)
+        else:
+            before = frames_per_sec(legacy.extract_depth_data, frame, number)
+            after = frames_per_sec(decoder.decode_depth, frame, number)
+        print(f"{t:<6}{before:>20,.0f}{after:>25,.0f}{after / before:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
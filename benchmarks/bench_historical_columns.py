@@ -0,0 +1,48 @@
+""" Turning a year of minute bars into arrays: looping over historical_data() dicts vs columnar output
+
+    python benchmarks/bench_historical_columns.py
+"""
+import datetime
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from alice_blue.historical import get_columns, pack_records, parse_bar, parse_columns
+
+def chart_history(days):
+    """ 'result' of a chart history response with 375 minute bars per day """
+    bars = []
+    start = datetime.datetime(2025, 1, 1, 9, 15)
+    for day in range(days):
+        for minute in range(375):
+            price = 1000.0 + (day * 375 + minute) % 97
+            bars.append({"volume" : float(1000 + minute), "high" : price + 1.5, "low" : price - 1.5,
+                         "time" : (start + datetime.timedelta(days=day, minutes=minute)).strftime("%Y-%m-%d %H:%M:%S"),
+                         "close" : price + 0.5, "open" : price})
+    return bars
+
+def legacy_columns(bars):
+    """ What callers do with historical_data() result """
+    columns = {"time" : [], "open" : [], "high" : [], "low" : [], "close" : [], "volume" : []}
+    for bar in bars:
+        columns["time"].append(datetime.datetime.strptime(bar["time"], "%Y-%m-%d %H:%M:%S"))
+        for name in ("open", "high", "low", "close", "volume"):
+            columns[name].append(bar[name])
+    return {name : np.array(values) for name, values in columns.items()}
+
+def main():
+    bars = chart_history(250)
+    data = pack_records(parse_bar(b) for b in bars)
+    assert (parse_columns(bars)["time"] == get_columns(data)["time"]).all()
+    print(f"{len(bars):,} bars")
+    for name, fn, number in (("loop over dicts", lambda: legacy_columns(bars), 1),
+                             ("parse_columns of response", lambda: parse_columns(bars), 3),
+                             ("get_columns of cached bars", lambda: get_columns(data), 100)):
+        seconds = min(timeit.repeat(fn, number=number, repeat=3)) / number
+        print(f"{name:<30}{seconds * 1000:>10,.2f} ms")
+
+if __name__ == "__main__":
+    main()
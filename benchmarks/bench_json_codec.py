@@ -0,0 +1,42 @@
+""" Per frame cost of parsing & decoding websocket frames with each installed JSON codec,
+    into dicts (FeedFormat.Dict) and into FeedSnapshot structs (FeedFormat.Struct)
+
+    python benchmarks/bench_json_codec.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from alice_blue import codec
+from alice_blue.feed import FeedDecoder
+from bench_feed_decoder import MESSAGES, lookup
+
+def us_per_call(function, number, repeat=5):
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e6
+
+def bench(message, t, decoder, number):
+    """ us per frame of (loads, loads + decode into dict, loads + decode into struct) with the codec in use """
+    loads = codec.loads
+    decode_dict = decoder.decode_tick if(t in ("tk", "tf")) else decoder.decode_depth
+    return (us_per_call(lambda: loads(message), number),
+            us_per_call(lambda: decode_dict(loads(message)), number),
+            us_per_call(lambda: decoder.decode(loads(message)), number))
+
+def main(number=100000):
+    names = codec.get_available_codecs()
+    print(f"JSON codecs installed: {', '.join(names)}")
+    print(f"{'frame':<6}{'codec':<9}{'loads us':>10}{'dict us':>10}{'struct us':>11}{'dict vs stdlib':>16}{'struct vs stdlib':>18}")
+    for t, message in MESSAGES.items():
+        baseline = None
+        for name in reversed(names):            # stdlib json first
+            codec.set_codec(name)
+            loads, to_dict, to_struct = bench(message, t, FeedDecoder(lookup), number)
+            if(baseline is None):
+                baseline = to_dict
+            print(f"{t:<6}{name:<9}{loads:>10.2f}{to_dict:>10.2f}{to_struct:>11.2f}"
+                  f"{baseline / to_dict:>15.2f}x{baseline / to_struct:>17.2f}x")
+    codec.set_codec()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+""" Startup time & memory of loading master contracts, from the json copy and from the memory mapped binary copy
+
+    python benchmarks/bench_master_contract_cache.py
+"""
+import datetime
+import json
+import os
+import pytz
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from alice_blue.contract_cache import get_binary_master_contract_file, open_binary_master_contract, write_binary_master_contract
+from alice_blue.master_contract import MasterContracts
+
+EXCHANGE = "BENCH"
+
+def master_contract_body(n):
+    """ NFO like master contract response with n option contracts """
+    today = datetime.datetime.now(pytz.timezone("Asia/Kolkata")).date()
+    scrips = []
+    for i in range(n):
+        expiry = today + datetime.timedelta(days=7 * (i % 12))
+        strike = 1000 + 50 * (i // 24 % 400)
+        option_type = "CE" if(i % 2 == 0) else "PE"
+        underlying = f"SYM{i // 9600}"
+        scrips.append({"token"              : str(30000 + i),
+                       "trading_symbol"     : f"{underlying}{expiry:%d%b%y}{option_type[0]}{strike}{i}".upper(),
+                       "symbol"             : underlying,
+                       "formatted_ins_name" : f"{underlying} {expiry:%d%b%y} {strike} {option_type}".upper(),
+                       "expiry_date"        : int(datetime.datetime(expiry.year, expiry.month, expiry.day).timestamp() * 1000),
+                       "lot_size"           : "50",
+                       "exch"               : "NFO"})
+    return {"NFO" : scrips, "contract_date" : today.strftime("%d-%m-%Y")}
+
+def measure(load, tokens):
+    """ seconds to load, seconds for looking up tokens & peak python memory """
+    tracemalloc.start()
+    start = time.perf_counter()
+    master_contracts = load()
+    loaded = time.perf_counter()
+    for token in tokens:
+        master_contracts.get_instrument_by_token("NFO", token)
+    looked_up = time.perf_counter()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return loaded - start, looked_up - loaded, peak
+
+def main(n=150000, lookups=1000):
+    body = master_contract_body(n)
+    text = json.dumps(body)
+    write_binary_master_contract(EXCHANGE, body)
+    tokens = random.sample(range(30000, 30000 + n), lookups)
+    del body
+
+    def load_json():
+        master_contracts = MasterContracts()
+        master_contracts.load(json.loads(text))
+        return master_contracts
+
+    def load_binary():
+        master_contracts = MasterContracts()
+        master_contracts.load_binary(open_binary_master_contract(EXCHANGE))
+        return master_contracts
+
+    print(f"{n:,} contracts, {lookups:,} token lookups")
+    print(f"{'format':<8}{'load ms':>12}{'lookups ms':>14}{'peak MB':>10}")
+    for name, load in (("json", load_json), ("binary", load_binary)):
+        load_seconds, lookup_seconds, peak = measure(load, tokens)
+        print(f"{name:<8}{load_seconds * 1000:>12.1f}{lookup_seconds * 1000:>14.1f}{peak / 2 ** 20:>10.1f}")
+    os.remove(get_binary_master_contract_file(EXCHANGE))
+
+if __name__ == "__main__":
+    main()
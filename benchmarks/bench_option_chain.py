@@ -0,0 +1,56 @@
+""" Resolving option contracts with get_instrument_for_fno before & after OptionChainIndex, on a synthetic 200k contract master
+
+    python benchmarks/bench_option_chain.py
+"""
+import datetime
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from alice_blue.option_chain import OptionChainIndex
+from bench_search_instruments import linear_search, master_contract
+
+def legacy_get_instrument_for_fno(master_contract, symbol, expiry_date, is_fut=False, strike=None, is_CE = False):
+    """ get_instrument_for_fno before OptionChainIndex """
+    res = linear_search(master_contract, symbol)
+    matches = []
+    for i in res:
+        sp = i.name.split(' ')
+        if(sp[0] == symbol):
+            if(i.expiry == expiry_date):
+                matches.append(i)
+    for i in matches:
+        if(is_fut == True):
+            if('FUT' in i.symbol):
+                return i
+        else:
+            sp = i.name.split(' ')
+            if((sp[-1] == 'CE') or (sp[-1] == 'PE')):           # Only option scrips
+                if(float(sp[-2]) == float(strike)):
+                    if(is_CE == True):
+                        if(sp[-1] == 'CE'):
+                            return i
+                    else:
+                        if(sp[-1] == 'PE'):
+                            return i
+
+def main():
+    contracts = master_contract()
+    expiry = datetime.date(2026, 10, 29)
+    start = time.perf_counter()
+    index = OptionChainIndex(contracts.values())
+    print(f"{len(contracts):,} contracts, option chain index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+    strikes = [row.strike for row in index.get_chain("NIFTY", expiry, spot=12500, strikes=40)]
+    for strike in strikes[:2]:
+        assert index.get_option("NIFTY", expiry, strike, True) == legacy_get_instrument_for_fno(contracts, "NIFTY", expiry, strike=strike, is_CE=True)
+    legacy = min(timeit.repeat(lambda: legacy_get_instrument_for_fno(contracts, "NIFTY", expiry, strike=strikes[0], is_CE=True), number=1, repeat=3))
+    single = min(timeit.repeat(lambda: index.get_option("NIFTY", expiry, strikes[0], True), number=10000, repeat=3)) / 10000
+    chain = min(timeit.repeat(lambda: index.get_chain("NIFTY", expiry, spot=12500, strikes=40), number=1000, repeat=3)) / 1000
+    print(f"{'query':<34}{'legacy us':>14}{'index us':>12}")
+    print(f"{'one contract':<34}{legacy * 1e6:>14,.0f}{single * 1e6:>12,.2f}")
+    print(f"{'40 strikes chain, calls & puts':<34}{legacy * 80 * 1e6:>14,.0f}{chain * 1e6:>12,.2f}")
+
+if __name__ == "__main__":
+    main()
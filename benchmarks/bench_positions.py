@@ -0,0 +1,46 @@
+""" Cost of getting MTM of all positions by polling positionBook vs the tick driven PositionsEngine
+
+    python benchmarks/bench_positions.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from alice_blue.positions import PositionsEngine
+
+def position_book(count):
+    """ positionBook response with count open positions, with the fields of README sample response """
+    positions = []
+    for i in range(count):
+        positions.append({"Exchange" : "NFO", "Token" : str(40000 + i), "Tsym" : f"NIFTY27OCT26C{24000 + i * 50}",
+                          "Pcode" : "NRML", "Netqty" : "75", "netbuyqty" : "75", "netsellqty" : "0",
+                          "netbuyamt" : "9,375.00", "netSellamt" : "0.00", "LTP" : "130.00", "MtoM" : "375.00",
+                          "realisedprofitloss" : "0.00", "unrealisedprofitloss" : "375.00", "stat" : "Ok"})
+    return json.dumps(positions)
+
+def poll(body):
+    """ What a caller does with every get_netwise_positions() response, REST round trip not included """
+    return sum(float(p["MtoM"].replace(',', '')) for p in json.loads(body))
+
+def main():
+    print(f"{'positions':>10}{'parse poll us':>16}{'tick us':>10}{'read mtm us':>14}")
+    for count in (10, 100, 1000):
+        body = position_book(count)
+        engine = PositionsEngine()
+        engine.load(json.loads(body))
+        assert abs(engine.get_mtm() - poll(body)) < 1e-6
+        parse = min(timeit.repeat(lambda: poll(body), number=100, repeat=3)) / 100
+        ltps = [130.0 + (i % 20) * 0.05 for i in range(1000)]
+        tokens = [40000 + (i % count) for i in range(1000)]
+        def ticks():
+            for token, ltp in zip(tokens, ltps):
+                engine.update_ltp("NFO", token, ltp)
+        tick = min(timeit.repeat(ticks, number=10, repeat=3)) / 10000
+        read = min(timeit.repeat(engine.get_mtm, number=10000, repeat=3)) / 10000
+        print(f"{count:>10}{parse * 1e6:>16,.1f}{tick * 1e6:>10,.2f}{read * 1e6:>14,.3f}")
+    print("A poll also costs a REST round trip & a request of the rate limit, ticks & reads cost none")
+
+if __name__ == "__main__":
+    main()
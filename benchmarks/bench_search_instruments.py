@@ -0,0 +1,78 @@
+""" Latency of search_instruments with a linear scan & with SearchIndex, on a synthetic 200k contract master
+
+    python benchmarks/bench_search_instruments.py
+"""
+import datetime
+import os
+import sys
+import time
+import timeit
+from collections import namedtuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from alice_blue.search_index import SearchIndex, SearchMatch
+
+Instrument = namedtuple('Instrument', ['exchange', 'token', 'symbol',
+                                       'name', 'expiry', 'lot_size'])
+
+UNDERLYINGS = ["NIFTY", "BANKNIFTY", "FINNIFTY", "MIDCPNIFTY", "RELIANCE", "INFY", "TCS", "HDFCBANK", "ICICIBANK", "SBIN"]
+
+def master_contract(n=200000):
+    """ token -> Instrument of n NFO like option contracts """
+    contracts = {}
+    expiry = datetime.date(2026, 10, 29)
+    for i in range(n):
+        underlying = UNDERLYINGS[i % len(UNDERLYINGS)] if(i % 4) else f"STOCK{i % 2000}"
+        strike = 100 + 5 * (i // 40 % 5000)
+        option_type = "CE" if(i % 2 == 0) else "PE"
+        symbol = f"{underlying}{expiry:%d%b%y}{option_type[0]}{strike}".upper() + (f"X{i}" if(i % 3 == 0) else "")
+        contracts[30000 + i] = Instrument("NFO", 30000 + i, symbol, f"{underlying} {expiry:%d%b%y} {strike} {option_type}".upper(), expiry, "50")
+    return contracts
+
+def linear_search(master_contract, symbol):
+    """ search_instruments before SearchIndex """
+    matches = []
+    for contract in master_contract:
+        if (isinstance(symbol, list)):
+            for sym in symbol:
+                if sym.lower() in master_contract[contract].symbol.split(' ')[0].lower():
+                    matches.append(master_contract[contract])
+        else:
+            if symbol.lower() in master_contract[contract].symbol.split(' ')[0].lower():
+                matches.append(master_contract[contract])
+    return matches
+
+def microseconds(f, number):
+    return min(timeit.repeat(f, number=number, repeat=3)) / number * 1e6
+
+def main():
+    contracts = master_contract()
+    start = time.perf_counter()
+    index = SearchIndex(contracts.values())
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    ngram_index = SearchIndex(contracts.values(), ngram=True)
+    ngram_build = time.perf_counter() - start
+    print(f"{len(contracts):,} contracts, index built in {build * 1000:.0f} ms, with trigrams in {ngram_build * 1000:.0f} ms")
+    some = contracts[30001].symbol
+    queries = [("exact", some, SearchMatch.Exact),
+               ("prefix", some[:-2], SearchMatch.Prefix),
+               ("substring, rare", some[3:-1], SearchMatch.Contains),
+               ("substring, none", "zzqq", SearchMatch.Contains),
+               ("substring, list", ["stock1999", "stock77"], SearchMatch.Contains)]
+    print(f"{'query':<18}{'matches':>9}{'linear us':>14}{'index us':>12}{'trigram us':>12}")
+    for name, query, match in queries:
+        expected = linear_search(contracts, query)
+        if(match == SearchMatch.Exact):
+            expected = [i for i in expected if i.symbol.split(' ')[0].lower() == query.lower()]
+        elif(match == SearchMatch.Prefix):
+            expected = [i for i in expected if i.symbol.split(' ')[0].lower().startswith(query.lower())]
+        assert index.search(query, match) == expected
+        assert ngram_index.search(query, match) == expected
+        linear = microseconds(lambda: linear_search(contracts, query), 1)
+        indexed = microseconds(lambda: index.search(query, match), 200)
+        trigram = microseconds(lambda: ngram_index.search(query, match), 200)
+        print(f"{name:<18}{len(expected):>9,}{linear:>14,.0f}{indexed:>12,.1f}{trigram:>12,.1f}")
+
+if __name__ == "__main__":
+    main()
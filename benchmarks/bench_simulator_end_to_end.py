@@ -0,0 +1,79 @@
+""" End to end feed throughput & latency, and place_order round trip, of AliceBlue against the local Simulator
+    running in another process. Frames carry their send time, latency is send to subscribe_callback.
+
+    python benchmarks/bench_simulator_end_to_end.py
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from alice_blue import AliceBlue, LiveFeedType, OrderType, ProductType, TransactionType
+from alice_blue.simulator import Simulator
+
+TOKENS = 1000
+RATES = (1000, 5000, 10000, 20000, 40000)
+SECONDS = 3
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_simulator(port, rate):
+    process = subprocess.Popen([sys.executable, "-m", "alice_blue.simulator", "--port", str(port), "--tokens", str(TOKENS),
+                                "--rate", str(rate), "--send-times"], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while(time.time() < deadline):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise Exception("Simulator didn't start")
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if(len(values) > 0) else float("nan")
+
+def run(rate):
+    port = free_port()
+    process = start_simulator(port, rate)
+    try:
+        # Simulator() is only used for the URLs, it is never started
+        urls = Simulator(port=port).urls
+        alice = AliceBlue("BENCH", "session", master_contracts_to_download=["NSE"], urls=urls)
+        received = []
+        def on_tick(tick):
+            received.append(time.time() * 1000000 - int(tick["st"]))
+        alice.start_websocket(subscribe_callback=on_tick)
+        alice.subscribe([alice.get_instrument_by_token("NSE", 1001 + i) for i in range(TOKENS)], LiveFeedType.TICK_DATA)
+        time.sleep(1)
+        start = len(received)
+        time.sleep(SECONDS)
+        latencies = received[start:]
+        instrument = alice.get_instrument_by_token("NSE", 1001)
+        round_trips = []
+        for n in range(200):
+            begin = time.perf_counter()
+            alice.place_order(TransactionType.Buy, instrument, 1, OrderType.Market, ProductType.Intraday)
+            round_trips.append((time.perf_counter() - begin) * 1000000)
+        return len(latencies) / SECONDS, latencies, round_trips
+    finally:
+        process.kill()
+        process.wait()
+
+def main():
+    print(f"{TOKENS} tokens subscribed, {SECONDS}s per rate")
+    print(f"{'sent/s':>8}{'received/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'order p50 us':>14}")
+    for rate in RATES:
+        throughput, latencies, round_trips = run(rate)
+        print(f"{rate:>8,}{throughput:>12,.0f}{percentile(latencies, 50) / 1000:>10,.1f}"
+              f"{percentile(latencies, 99) / 1000:>10,.1f}{percentile(round_trips, 50):>14,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+""" Per frame cost of recording websocket frames: JSON lines through logging vs TickJournal, and replay read speed
+
+    python benchmarks/bench_tick_journal.py
+"""
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from alice_blue.journal import TickJournal, read_journal
+from bench_feed_decoder import MESSAGES
+
+FRAMES = 200000
+
+def frames():
+    keys = list(MESSAGES)
+    return [MESSAGES[keys[i % len(keys)]] for i in range(FRAMES)]
+
+def bench_logging(directory, messages):
+    """ A JSON line with receive time per frame through a logging FileHandler """
+    logger = logging.getLogger("bench_tick_journal")
+    logger.propagate = False
+    handler = logging.FileHandler(os.path.join(directory, "frames.log"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    start = time.perf_counter()
+    for message in messages:
+        logger.info(json.dumps({"received" : time.time(), "frame" : json.loads(message)}))
+    seconds = time.perf_counter() - start
+    handler.close()
+    logger.removeHandler(handler)
+    return seconds
+
+def bench_journal(directory, messages):
+    journal = TickJournal(os.path.join(directory, "journal"), segment_size=16 * 1024 * 1024)
+    start = time.perf_counter()
+    for message in messages:
+        journal.write(message)
+    journal.close()
+    return time.perf_counter() - start, len(journal.get_segments())
+
+def main():
+    messages = frames()
+    directory = tempfile.mkdtemp()
+    try:
+        logging_seconds = bench_logging(directory, messages)
+        journal_seconds, segments = bench_journal(directory, messages)
+        start = time.perf_counter()
+        replayed = sum(1 for _ in read_journal(os.path.join(directory, "journal")))
+        read_seconds = time.perf_counter() - start
+        assert replayed == FRAMES
+        print(f"{FRAMES:,} frames, {segments} journal segments")
+        print(f"{'json lines via logging':<28}{logging_seconds / FRAMES * 1e6:>8.2f} us/frame")
+        print(f"{'TickJournal.write':<28}{journal_seconds / FRAMES * 1e6:>8.2f} us/frame")
+        print(f"{'read_journal (mmap)':<28}{read_seconds / FRAMES * 1e6:>8.2f} us/frame")
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
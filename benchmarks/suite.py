@@ -0,0 +1,364 @@
+""" Offline benchmark suite of AliceBlue hot paths on synthetic data, with machine-readable results.
+    Every benchmark drives a real AliceBlue object, REST calls are answered in-process & websocket frames are
+    fed straight into its message handler, so nothing goes to the network & runs can be compared across versions.
+
+    python benchmarks/suite.py [--quick] [--only feed,subscribe] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from alice_blue import AliceBlue, LiveFeedType, OrderType, ProductType, SearchMatch, TransactionType
+from alice_blue.alice_blue import _get_place_order_payload, _get_urls
+from alice_blue.outbound import OutboundQueue
+from alice_blue.subscriptions import SubscriptionManager
+from bench_feed_decoder import MESSAGES
+
+# Endpoints of an offline host, which are only answered by OfflineSession
+HOST = "offline://rest"
+URLS = {"master_contract" : "offline://contract_master?exch={exchange}", "ws" : "offline://ws"}
+UNDERLYINGS = ["NIFTY", "BANKNIFTY", "FINNIFTY", "MIDCPNIFTY", "RELIANCE", "INFY", "TCS", "HDFCBANK", "ICICIBANK", "SBIN"]
+EQUITIES = 5000
+FEED_TOKENS = 500
+
+class OfflineResponse:
+    def __init__(self, body):
+        self.status_code = 200
+        self.content = body if(isinstance(body, bytes)) else json.dumps(body).encode()
+        self.text = self.content.decode()
+
+    def json(self):
+        return json.loads(self.content)
+
+class OfflineSession:
+    """ Answers REST calls of AliceBlue like HttpSession would, from synthetic responses """
+
+    def __init__(self, master_contracts):
+        self.master_contracts = master_contracts
+        self.names = {url.split('?')[0] : name for name, url in _get_urls(HOST, URLS).items()}
+        self.requests = 0
+
+    def request(self, method, url, idempotent=False, **kwargs):
+        self.requests += 1
+        name = self.names.get(url.split('?')[0])
+        if(name == "profile"):
+            return OfflineResponse({"accountId" : "BENCH", "exchEnabled" : "nse_cm|nse_fo|"})
+        if(name == "master_contract"):
+            return OfflineResponse(self.master_contracts[url.split("exch=")[1]])
+        if(name == "placeOrder"):
+            return OfflineResponse([{"stat" : "Ok", "NOrdNo" : str(self.requests)}])
+        return OfflineResponse({"stat" : "Ok"})
+
+    def get(self, url, idempotent=True, **kwargs):
+        return self.request("GET", url, idempotent, **kwargs)
+
+    def post(self, url, idempotent=False, **kwargs):
+        return self.request("POST", url, idempotent, **kwargs)
+
+    def put(self, url, idempotent=False, **kwargs):
+        return self.request("PUT", url, idempotent, **kwargs)
+
+    def delete(self, url, idempotent=False, **kwargs):
+        return self.request("DELETE", url, idempotent, **kwargs)
+
+class OfflineWebSocket:
+    """ Stands in for the websocket connection, counts what is sent """
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    def send(self, data):
+        self.frames += 1
+        self.bytes += len(data)
+
+def get_expiries():
+    today = datetime.date.today()
+    first = today + datetime.timedelta(days=(3 - today.weekday()) % 7)
+    return [first + datetime.timedelta(days=7 * n) for n in range(4)]
+
+def equity_body(n):
+    """ NSE master contract response with n equities """
+    return {"NSE" : [{"token" : str(1000 + i), "trading_symbol" : f"SYM{i}-EQ", "symbol" : f"SYM{i}",
+                      "formatted_ins_name" : f"SYMBOL {i} LTD", "lot_size" : "1", "exch" : "NSE"} for i in range(n)],
+            "contract_date" : datetime.date.today().strftime("%d-%m-%Y")}
+
+def fno_body(n):
+    """ NFO master contract response with n futures & options of UNDERLYINGS over 4 weekly expiries """
+    scrips = []
+    expiries = get_expiries()
+    for i in range(n):
+        underlying = UNDERLYINGS[i % len(UNDERLYINGS)]
+        expiry = expiries[i // len(UNDERLYINGS) % len(expiries)]
+        position = i // (len(UNDERLYINGS) * len(expiries))
+        expiry_ms = int(datetime.datetime(expiry.year, expiry.month, expiry.day, tzinfo=datetime.timezone.utc).timestamp() * 1000)
+        if(position == 0):
+            symbol, name = f"{underlying}{expiry:%y%b}FUT".upper(), f"{underlying} {expiry:%d%b%y} FUT".upper()
+        else:
+            strike = 10000 + 50 * ((position - 1) // 2)
+            option_type = "CE" if(position % 2) else "PE"
+            symbol = f"{underlying}{expiry:%d%b%y}{option_type[0]}{strike}".upper()
+            name = f"{underlying} {expiry:%d%b%y} {strike} {option_type}".upper()
+        scrips.append({"token" : str(100000 + i), "trading_symbol" : symbol, "symbol" : underlying, "formatted_ins_name" : name,
+                       "expiry_date" : expiry_ms, "lot_size" : "50", "exch" : "NFO"})
+    return {"NFO" : scrips, "contract_date" : datetime.date.today().strftime("%d-%m-%Y")}
+
+def indices_body():
+    return {"NSE" : [{"token" : "26000", "symbol" : "NIFTY 50", "exch" : "NSE"}]}
+
+def create(master_contracts, exchanges):
+    """ AliceBlue loaded with synthetic master contracts of exchanges """
+    session = OfflineSession(master_contracts)
+    alice = AliceBlue("BENCH", "session", master_contracts_to_download=exchanges, http_session=session, host=HOST, urls=URLS)
+    websocket = OfflineWebSocket()
+    alice._AliceBlue__websocket = websocket
+    alice._AliceBlue__websocket_connected = True
+    outbound = OutboundQueue(alice._AliceBlue__ws_write)
+    outbound.start()
+    outbound.set_connected(True)
+    alice._AliceBlue__outbound = outbound
+    alice._AliceBlue__subscriptions = SubscriptionManager(alice._AliceBlue__send_subscriptions)
+    return alice, websocket
+
+def summarize(samples, **extra):
+    """ Percentile latencies in microseconds & throughput of nanosecond samples of single operations """
+    samples = sorted(samples)
+    count = len(samples)
+    total = sum(samples)
+    def percentile(p):
+        return samples[min(count - 1, int(count * p / 100))] / 1000
+    result = {"count"       : count,
+              "ops_per_sec" : count / (total / 1e9) if(total > 0) else None,
+              "mean_us"     : total / count / 1000,
+              "p50_us"      : percentile(50),
+              "p90_us"      : percentile(90),
+              "p99_us"      : percentile(99),
+              "max_us"      : samples[-1] / 1000}
+    result.update(extra)
+    return result
+
+def time_each(fn, items):
+    """ Nanoseconds of fn(item) of every item """
+    samples = []
+    perf_counter_ns = time.perf_counter_ns
+    gc.disable()
+    try:
+        for item in items:
+            start = perf_counter_ns()
+            fn(item)
+            samples.append(perf_counter_ns() - start)
+    finally:
+        gc.enable()
+    return samples
+
+def feed_frames(kind, count):
+    """ count frames of a kind of MESSAGES cycling over FEED_TOKENS NSE tokens with changing prices & volume """
+    template = json.loads(MESSAGES[kind])
+    frames = []
+    for i in range(count):
+        frame = dict(template)
+        frame["tk"] = str(1000 + i % FEED_TOKENS)
+        frame["lp"] = f"{1400 + i % 200 * 0.05:.2f}"
+        frame["v"] = str(7000000 + i)
+        frames.append(json.dumps(frame))
+    return frames
+
+def bench_feed(context, quick):
+    alice = context["alice"]
+    alice._AliceBlue__subscribe_callback = lambda data: None
+    on_data = alice._AliceBlue__on_data_callback
+    results = {}
+    count = 50000 if(quick) else 200000
+    for kind in ("tk", "dk"):
+        frames = feed_frames(kind, count)
+        on_data(frames[0])
+        results[f"feed.on_data.{kind}"] = summarize(time_each(on_data, frames), unit="frame")
+    # FeedFormat.Struct, snapshots instead of a dict per frame. Dict & struct runs alternate on the same frames,
+    # the run with least total time is kept, so the comparison isn't skewed by which one runs first
+    for kind in ("tf", "df"):
+        frames = feed_frames(kind, count)
+        on_data(frames[0])
+        runs = {False : [], True : []}
+        for i in range(3):
+            for structs in (False, True):
+                alice._AliceBlue__feed_structs = structs
+                runs[structs].append(time_each(on_data, frames))
+        alice._AliceBlue__feed_structs = False
+        results[f"feed.on_data.{kind}"] = summarize(min(runs[False], key=sum), unit="frame")
+        results[f"feed.on_data.{kind}.struct"] = summarize(min(runs[True], key=sum), unit="frame")
+    # Cost of latency instrumentation, the runs above are with it off
+    alice.metrics()
+    for kind in ("tf", "df"):
+        frames = feed_frames(kind, count)
+        results[f"feed.on_data.{kind}.metrics"] = summarize(time_each(on_data, frames), unit="frame")
+    alice.disable_metrics()
+    return results
+
+def bench_master_contracts(context, quick):
+    results = {}
+    for size in ((10000, 50000) if(quick) else (10000, 50000, 150000)):
+        body = json.dumps(fno_body(size)).encode()
+        master_contracts = {"INDICES" : json.dumps(indices_body()).encode(), "NFO" : body}
+        samples = []
+        timings = None
+        for n in range(3 if(quick) else 5):
+            gc.collect()
+            start = time.perf_counter_ns()
+            alice, websocket = create(master_contracts, ["NFO"])
+            samples.append(time.perf_counter_ns() - start)
+            timings = alice.get_master_contract_timings()["NFO"]
+            del alice
+        gc.collect()
+        tracemalloc.start()
+        alice, websocket = create(master_contracts, ["NFO"])
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del alice
+        results[f"master_contract.load.nfo_{size}"] = summarize(samples, unit="load", contracts=size, bytes=len(body),
+                                                                 parse_ms=timings.get("parse", 0) * 1000,
+                                                                 index_ms=timings.get("index", 0) * 1000,
+                                                                 peak_mb=peak / 2 ** 20, retained_mb=retained / 2 ** 20)
+    return results
+
+def bench_search(context, quick):
+    alice = context["alice"]
+    count = 2000 if(quick) else 10000
+    symbols = [i.symbol for i in (alice.get_instrument_by_token("NFO", 100000 + n * 37 % context["fno_size"]) for n in range(count))]
+    results = {}
+    for name, exchange, queries, match in (("exact", "NFO", symbols, SearchMatch.Exact),
+                                           ("prefix", "NFO", [s[:-3] for s in symbols], SearchMatch.Prefix),
+                                           ("contains", "NSE", [f"SYM{n % EQUITIES}-" for n in range(count // 10)], SearchMatch.Contains),
+                                           ("list", "NSE", [[f"SYM{n % EQUITIES}-", f"SYM{(n + 7) % EQUITIES}-"] for n in range(count // 10)], SearchMatch.Contains)):
+        alice.search_instruments(exchange, queries[0], match)
+        results[f"search_instruments.{name}"] = summarize(time_each(lambda q: alice.search_instruments(exchange, q, match), queries),
+                                                          unit="search", exchange=exchange)
+    return results
+
+def bench_fno(context, quick):
+    alice = context["alice"]
+    count = 10000 if(quick) else 50000
+    expiries = get_expiries()
+    options = [(UNDERLYINGS[n % len(UNDERLYINGS)], expiries[n % len(expiries)], 10000 + 50 * (n % 100), n % 2 == 0) for n in range(count)]
+    alice.get_instrument_for_fno(*options[0][:2], strike=options[0][2], is_CE=options[0][3])
+    assert alice.get_instrument_for_fno(*options[1][:2], strike=options[1][2], is_CE=options[1][3]) is not None
+    results = {"get_instrument_for_fno.option" : summarize(time_each(lambda o: alice.get_instrument_for_fno(o[0], o[1], strike=o[2], is_CE=o[3]), options), unit="lookup"),
+               "get_instrument_for_fno.future" : summarize(time_each(lambda o: alice.get_instrument_for_fno(o[0], o[1], is_fut=True), options), unit="lookup")}
+    return results
+
+def wait_sent(alice):
+    """ Wait till the writer sent everything queued """
+    while True:
+        stats = alice.get_outbound_stats()
+        if(stats["sent"] + stats["dropped"] + stats["errors"] >= stats["queued"]):
+            return
+        time.sleep(0.001)
+
+def bench_subscribe(context, quick):
+    alice = context["alice"]
+    websocket = context["websocket"]
+    instruments = [alice.get_instrument_by_token("NSE", 1000 + n) for n in range(EQUITIES)]
+    results = {}
+    for size in (100, 1000, 5000):
+        calls = 20 if(quick) else 100
+        batch = instruments[:size]
+        frames, sent = websocket.frames, websocket.bytes
+        def subscribe_new(n):
+            # unsubscribed after each call, so every call sends all of them
+            alice.subscribe(batch, LiveFeedType.DEPTH_DATA)
+            if(n < calls - 1):
+                alice.unsubscribe(batch, LiveFeedType.DEPTH_DATA)
+        samples = time_each(subscribe_new, range(calls))
+        wait_sent(alice)
+        subscribe_frames = (websocket.frames - frames + 1) // 2
+        results[f"subscribe.instruments_{size}"] = summarize(samples, unit="call", instruments=size,
+                                                             frame_bytes=(websocket.bytes - sent) // (websocket.frames - frames),
+                                                             frames_per_call=subscribe_frames / calls)
+        # Already subscribed, nothing is sent
+        samples = time_each(lambda b: alice.subscribe(b, LiveFeedType.DEPTH_DATA), [batch] * calls)
+        results[f"subscribe.repeat_{size}"] = summarize(samples, unit="call", instruments=size)
+        alice.unsubscribe(batch, LiveFeedType.DEPTH_DATA)
+        wait_sent(alice)
+    return results
+
+def bench_place_order(context, quick):
+    alice = context["alice"]
+    count = 20000 if(quick) else 100000
+    instruments = [alice.get_instrument_by_token("NSE", 1000 + n % EQUITIES) for n in range(count)]
+    def payload(instrument):
+        _get_place_order_payload(TransactionType.Buy, instrument, 10, OrderType.Limit, ProductType.Intraday,
+                                 1500.0, None, None, None, None, None, "bench")
+    def place(instrument):
+        alice.place_order(TransactionType.Buy, instrument, 10, OrderType.Limit, ProductType.Intraday, price=1500.0)
+    return {"place_order.payload" : summarize(time_each(payload, instruments), unit="order"),
+            "place_order.offline" : summarize(time_each(place, instruments[:count // 10]), unit="order")}
+
+BENCHMARKS = {"feed"            : bench_feed,
+              "master_contract" : bench_master_contracts,
+              "search"          : bench_search,
+              "fno"             : bench_fno,
+              "subscribe"       : bench_subscribe,
+              "place_order"     : bench_place_order}
+
+def get_environment(quick):
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"created"   : datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit"    : commit,
+            "python"    : platform.python_version(),
+            "platform"  : platform.platform(),
+            "processor" : platform.machine(),
+            "cpus"      : os.cpu_count(),
+            "quick"     : quick}
+
+def print_results(results, baseline=None):
+    header = f"{'benchmark':<40}{'ops/s':>12}{'p50 us':>13}{'p90 us':>13}{'p99 us':>13}"
+    print(header + (f"{'p50 vs base':>13}" if(baseline is not None) else ""))
+    for name, r in results.items():
+        line = f"{name:<40}{r['ops_per_sec']:>12,.1f}{r['p50_us']:>13,.2f}{r['p90_us']:>13,.2f}{r['p99_us']:>13,.2f}"
+        if(baseline is not None):
+            base = baseline.get(name)
+            line += f"{r['p50_us'] / base['p50_us']:>12.2f}x" if(base is not None and base['p50_us'] > 0) else f"{'-':>13}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="fewer iterations & smaller master contracts")
+    parser.add_argument("--only", help=f"comma separated benchmarks of {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare p50 latencies with")
+    args = parser.parse_args()
+    selected = list(BENCHMARKS) if(args.only is None) else [b.strip() for b in args.only.split(",")]
+    unknown = [b for b in selected if b not in BENCHMARKS]
+    if(len(unknown) > 0):
+        parser.error(f"unknown benchmarks {unknown}")
+    fno_size = 50000 if(args.quick) else 150000
+    master_contracts = {"INDICES" : json.dumps(indices_body()).encode(), "NSE" : json.dumps(equity_body(EQUITIES)).encode(),
+                        "NFO" : json.dumps(fno_body(fno_size)).encode()}
+    alice, websocket = create(master_contracts, ["NSE", "NFO"])
+    context = {"alice" : alice, "websocket" : websocket, "fno_size" : fno_size}
+    results = {}
+    for name in selected:
+        results.update(BENCHMARKS[name](context, args.quick))
+    report = {"environment" : get_environment(args.quick), "results" : results}
+    baseline = None
+    if(args.compare is not None):
+        with open(args.compare, "r") as fo:
+            baseline = json.loads(fo.read())["results"]
+    print_results(results, baseline)
+    if(args.output is not None):
+        with open(args.output, "w") as fo:
+            fo.write(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -14,14 +14,15 @@ setuptools.setup(
     author_email = 'krishnajvelu@gmail.com',
     url = 'https://github.com/krishnavelu/alice_blue',
     install_requires=['cryptography', 'pytz', 'requests', 'websocket_client'],
+    extras_require={'numpy': ['numpy'], 'pandas': ['numpy', 'pandas'], 'async': ['aiohttp']},
     keywords = ['alice', 'alice-blue', 'python', 'sdk', 'trading', 'stock markets'],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
     classifiers=[
       'Intended Audience :: Developers',
       'Natural Language :: English',
       'Operating System :: OS Independent',
       'Programming Language :: Python',
-      'Programming Language :: Python :: 3.6',
+      'Programming Language :: Python :: 3.7',
       'Programming Language :: Python :: Implementation :: PyPy',
       'Topic :: Software Development :: Libraries :: Python Modules'
     ],
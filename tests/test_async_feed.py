@@ -0,0 +1,25 @@
+import asyncio
+
+from alice_blue import AsyncAliceBlue, LiveFeedType, OrderType, ProductType, TransactionType
+from alice_blue.simulator import Simulator
+
+async def _order_updates_without_feed_reader(simulator):
+    async with AsyncAliceBlue("TEST", "session", master_contracts_to_download=['NSE'], feed_queue_size=5,
+                              urls=simulator.urls) as alice:
+        order_book = await alice.order_book()
+        await alice.start_websocket()
+        instrument = alice.get_instrument_by_symbol('NSE', "SIM0-EQ")
+        await alice.subscribe(instrument, LiveFeedType.TICK_DATA)
+        # feed() is never read, ticks fill its queue
+        while(alice.get_feed_stats()["dropped"] == 0):
+            await asyncio.sleep(0.05)
+        response = await alice.place_order(TransactionType.Buy, instrument, 1, OrderType.Market, ProductType.Intraday)
+        order = await order_book.wait_for_status_async(response[0]["NOrdNo"], "complete", timeout=5)
+        stats = alice.get_feed_stats()
+    return order, stats
+
+def test_order_updates_keep_coming_when_feed_is_not_read():
+    with Simulator(tokens=5, rate=1000) as simulator:
+        order, stats = asyncio.run(_order_updates_without_feed_reader(simulator))
+    assert order is not None
+    assert stats["queue_depth"] == 5 and stats["dropped"] > 0
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+import requests
+
+from alice_blue import AliceBlue, AsyncAliceBlue
+from alice_blue.simulator import Simulator
+
+def _urls(simulator):
+    """ URLs of the simulator with the trade book endpoint missing, so that it fails """
+    return dict(simulator.urls, fetchTrade=simulator.host + "/missing")
+
+def _check_api_metrics(metrics):
+    assert metrics.get_histogram("api_call", "positions").count == 1
+    assert metrics.get_histogram("api_call", "fetchTrade") is None
+    assert metrics.get_counters() == {("api_errors", "fetchTrade") : 1}
+
+def test_api_call_latency_is_of_successful_calls_only():
+    with Simulator(tokens=5, rate=0) as simulator:
+        alice = AliceBlue("TEST", "session", master_contracts_to_download=['NSE'], urls=_urls(simulator))
+        metrics = alice.metrics()
+        alice.get_netwise_positions()
+        with pytest.raises(requests.HTTPError):
+            alice.get_trade_book()
+    _check_api_metrics(metrics)
+
+async def _async_api_calls(simulator):
+    async with AsyncAliceBlue("TEST", "session", master_contracts_to_download=['NSE'], urls=_urls(simulator)) as alice:
+        metrics = alice.metrics()
+        await alice.get_netwise_positions()
+        with pytest.raises(requests.HTTPError):
+            await alice.get_trade_book()
+    return metrics
+
+def test_async_api_call_latency_is_of_successful_calls_only():
+    with Simulator(tokens=5, rate=0) as simulator:
+        metrics = asyncio.run(_async_api_calls(simulator))
+    _check_api_metrics(metrics)
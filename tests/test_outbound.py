@@ -0,0 +1,76 @@
+import pytest
+
+from alice_blue import codec
+from alice_blue.outbound import OutboundQueue
+
+class FakeSocket:
+    """ send(str) of OutboundQueue, records decoded messages """
+
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, message):
+        self.sent.append(codec.loads(message))
+
+def test_put_resolves_future_when_sent():
+    socket = FakeSocket()
+    outbound = OutboundQueue(socket)
+    outbound.start()
+    outbound.set_connected(True)
+    assert outbound.put({'t' : 'h'}).result(1) == True
+    assert socket.sent == [{'t' : 'h'}]
+    assert outbound.get_stats()["sent"] == 1
+    outbound.stop()
+
+def test_messages_wait_for_connection_after_connect_message():
+    socket = FakeSocket()
+    outbound = OutboundQueue(socket)
+    outbound.start()
+    futures = [outbound.put({'t' : 't', 'k' : f"NSE|{i}"}) for i in range(3)]
+    assert not any(future.done() for future in futures)
+    outbound.set_connected(True, {'t' : 'c'})
+    for future in futures:
+        future.result(1)
+    assert socket.sent == [{'t' : 'c'}] + [{'t' : 't', 'k' : f"NSE|{i}"} for i in range(3)]
+    outbound.stop()
+
+def test_put_timeout_raises_timeout_error():
+    outbound = OutboundQueue(FakeSocket())
+    outbound.start()
+    future = outbound.put({'t' : 'h'}, timeout=0.1)
+    with pytest.raises(TimeoutError):
+        future.result(1)
+    assert outbound.get_stats()["timed_out"] == 1
+    outbound.stop()
+
+def test_close_fails_queued_messages():
+    outbound = OutboundQueue(FakeSocket())
+    outbound.start()
+    future = outbound.put({'t' : 'h'})
+    outbound.set_connected(False)
+    with pytest.raises(ConnectionError):
+        future.result(1)
+    assert outbound.get_stats()["dropped"] == 1
+    outbound.stop()
+
+def test_message_of_closed_connection_is_not_sent_after_next_connect_message():
+    socket = FakeSocket()
+    reconnected = []
+    def on_sent(message_type, seconds):
+        # connection closes & opens again after the first message, while the writer still holds the second one
+        if(len(reconnected) == 0):
+            reconnected.append(True)
+            outbound.set_connected(False)
+            outbound.set_connected(True, {'t' : 'c'})
+    outbound = OutboundQueue(socket, on_sent)
+    outbound.start()
+    # queued before the connection so the writer takes both at once
+    first = outbound.put({'t' : 't', 'k' : "NSE|1"})
+    stale = outbound.put({'t' : 't', 'k' : "NSE|2"})
+    outbound.set_connected(True)
+    first.result(1)
+    with pytest.raises(ConnectionError):
+        stale.result(1)
+    outbound.put({'t' : 'h'}).result(1)
+    assert socket.sent == [{'t' : 't', 'k' : "NSE|1"}, {'t' : 'c'}, {'t' : 'h'}]
+    outbound.stop()
@@ -0,0 +1,42 @@
+from alice_blue import AliceBlue, OrderType, ProductType, TransactionType
+from alice_blue.positions import PositionsEngine
+from alice_blue.simulator import Simulator
+
+def _fill_message(trade):
+    """ Websocket order message of a fill of a tradeBook response """
+    return {"t" : "om", "norenordno" : trade["Nstordno"], "flid" : trade["FillId"], "flqty" : str(trade["Fillqty"]),
+            "flprc" : trade["Price"], "exch" : trade["Exchange"], "tsym" : trade["Tsym"], "token" : trade["Symbol"],
+            "prd" : "I", "trantype" : trade["Trantype"]}
+
+class FillWhileLoading(AliceBlue):
+    """ A fill lands on the server just before positionBook is fetched & its websocket message arrives while loading """
+
+    fills = 0
+
+    def get_netwise_positions(self):
+        if(self.fills > 0):
+            self.fills -= 1
+            instrument = self.get_instrument_by_symbol('NSE', "SIM0-EQ")
+            self.place_order(TransactionType.Buy, instrument, 10, OrderType.Market, ProductType.Intraday)
+            self.live_positions().apply_fill(_fill_message(self.get_trade_book()[-1]))
+        return super().get_netwise_positions()
+
+def test_fill_between_trade_book_and_positions_is_counted_once():
+    with Simulator(tokens=5, rate=0) as simulator:
+        alice = FillWhileLoading("TEST", "session", master_contracts_to_download=['NSE'], urls=simulator.urls)
+        alice.fills = 1
+        engine = alice.live_positions()
+        assert [(p["symbol"], p["buy_quantity"]) for p in engine.get_positions()] == [("SIM0-EQ", 10)]
+        # on reconciling too
+        alice.fills = 1
+        alice.reconcile_positions()
+        assert [(p["symbol"], p["buy_quantity"]) for p in engine.get_positions()] == [("SIM0-EQ", 20)]
+
+def test_fill_held_back_is_applied_when_not_in_positions():
+    engine = PositionsEngine()
+    engine.begin_load()
+    engine.apply_fill({"norenordno" : "1", "flid" : "1", "flqty" : "5", "flprc" : "100.00", "exch" : 'NSE',
+                       "tsym" : "SIM0-EQ", "token" : "1001", "prd" : "I", "trantype" : 'B'})
+    engine.load([], [])
+    position = engine.get_positions()[0]
+    assert position["buy_quantity"] == 5 and position["buy_amount"] == 500.0
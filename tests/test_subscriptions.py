@@ -0,0 +1,127 @@
+import time
+
+import pytest
+
+from alice_blue import codec
+from alice_blue.master_contract import Instrument
+from alice_blue.outbound import OutboundQueue
+from alice_blue.subscriptions import SubscriptionManager, get_subscription_frames
+
+def _instrument(token):
+    return Instrument('NSE', token, f"SYM{token}-EQ", f"SYMBOL {token}", None, 1)
+
+class FakeSend:
+    """ send(message type, instruments) of SubscriptionManager, records what is sent """
+
+    def __init__(self):
+        self.sent = []
+
+    def __call__(self, message_type, instruments):
+        self.sent.append((message_type, [i.token for i in instruments]))
+
+def test_subscribe_sends_only_new_instruments_in_batches():
+    send = FakeSend()
+    manager = SubscriptionManager(send, batch_size=2)
+    manager.subscribe([_instrument(1), _instrument(2), _instrument(3)], 't')
+    manager.subscribe([_instrument(1), _instrument(2)], 't')
+    assert sorted(token for t, tokens in send.sent for token in tokens) == [1, 2, 3]
+    assert [len(tokens) for t, tokens in send.sent] == [2, 1]
+    manager.stop()
+
+def test_subscribe_then_unsubscribe_within_debounce_sends_nothing():
+    send = FakeSend()
+    manager = SubscriptionManager(send, debounce=0.2)
+    manager.subscribe([_instrument(1)], 't')
+    manager.unsubscribe([_instrument(1)])
+    time.sleep(0.4)
+    assert send.sent == []
+    assert manager.get_stats()["flushes"] == 1
+    manager.stop()
+
+def test_type_change_unsubscribes_then_subscribes():
+    send = FakeSend()
+    manager = SubscriptionManager(send)
+    manager.subscribe([_instrument(1)], 't')
+    manager.subscribe([_instrument(1)], 'd')
+    assert send.sent == [('t', [1]), ('u', [1]), ('d', [1])]
+    manager.unsubscribe([_instrument(1)])
+    assert send.sent[-1] == ('ud', [1])
+    manager.stop()
+
+def test_acknowledgment_resolves_future():
+    send = FakeSend()
+    manager = SubscriptionManager(send)
+    instruments = [_instrument(1), _instrument(2)]
+    future = manager.subscribe(instruments, 't', acknowledgment=True)
+    manager.acknowledge('NSE', '1', 't')
+    assert not future.done()
+    manager.acknowledge('NSE', '2', 't')
+    assert future.result(1) == instruments
+    # already acknowledged ones are done right away
+    assert manager.subscribe(instruments, 't', acknowledgment=True).done()
+    manager.stop()
+
+def test_acknowledgment_of_another_type_is_ignored():
+    manager = SubscriptionManager(FakeSend())
+    future = manager.subscribe([_instrument(1)], 'd', acknowledgment=True, timeout=0.2)
+    manager.acknowledge('NSE', '1', 't')
+    with pytest.raises(TimeoutError):
+        future.result(1)
+    manager.stop()
+
+def test_acknowledgment_timeout_raises_timeout_error():
+    manager = SubscriptionManager(FakeSend())
+    future = manager.subscribe([_instrument(1), _instrument(2)], 't', acknowledgment=True, timeout=0.1)
+    manager.acknowledge('NSE', '1', 't')
+    with pytest.raises(TimeoutError):
+        future.result(1)
+    assert manager.get_stats()["waiting"] == 0
+    manager.stop()
+
+def test_unacknowledged_subscription_is_sent_again_then_given_up():
+    send = FakeSend()
+    manager = SubscriptionManager(send, ack_timeout=0.1)
+    future = manager.subscribe([_instrument(1)], 't', acknowledgment=True)
+    with pytest.raises(TimeoutError):
+        future.result(2)
+    assert send.sent == [('t', [1])] * 3
+    stats = manager.get_stats()
+    assert stats["resent"] == 2 and stats["unacknowledged"] == 1
+    manager.stop()
+
+def test_changes_while_disconnected_are_sent_on_connection():
+    send = FakeSend()
+    manager = SubscriptionManager(send)
+    manager.set_connected(False)
+    manager.subscribe([_instrument(1), _instrument(2)], 't')
+    manager.unsubscribe([_instrument(2)])
+    assert send.sent == []
+    manager.set_connected(True)
+    assert send.sent == [('t', [1])]
+    manager.stop()
+
+def test_reconnect_resends_desired_state_after_connect_message():
+    frames = []
+    outbound = OutboundQueue(lambda message: frames.append(codec.loads(message)))
+    outbound.start()
+    def send(message_type, instruments):
+        for frame in get_subscription_frames(instruments, message_type):
+            outbound.put(frame)
+    manager = SubscriptionManager(send)
+    outbound.set_connected(True, {'t' : 'c'})
+    manager.set_connected(True)
+    manager.subscribe([_instrument(1), _instrument(2)], 't')
+    manager.subscribe([_instrument(3)], 'd')
+    manager.unsubscribe([_instrument(2)])
+    # connection closes & opens again, as in AliceBlue's websocket callbacks
+    outbound.set_connected(False)
+    manager.set_connected(False)
+    del frames[:]
+    outbound.set_connected(True, {'t' : 'c'})
+    manager.set_connected(True)
+    last = outbound.put({'t' : 'h'})
+    last.result(1)
+    assert frames[0] == {'t' : 'c'}
+    assert sorted(frames[1:-1], key=lambda f: f['t']) == [{'k' : 'NSE|3', 't' : 'd'}, {'k' : 'NSE|1', 't' : 't'}]
+    manager.stop()
+    outbound.stop()